@@ -0,0 +1,25 @@
+# Account Helpers for Driving School Platform
+# Importable without the app, e.g. by the benchmark dataset
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Algerian States (58 wilayas)
+ALGERIAN_STATES = [
+    "Adrar", "Chlef", "Laghouat", "Oum El Bouaghi", "Batna", "Béjaïa", "Biskra", 
+    "Béchar", "Blida", "Bouira", "Tamanrasset", "Tébessa", "Tlemcen", "Tiaret", 
+    "Tizi Ouzou", "Alger", "Djelfa", "Jijel", "Sétif", "Saïda", "Skikda", 
+    "Sidi Bel Abbès", "Annaba", "Guelma", "Constantine", "Médéa", "Mostaganem", 
+    "M'Sila", "Mascara", "Ouargla", "Oran", "El Bayadh", "Illizi", 
+    "Bordj Bou Arréridj", "Boumerdès", "El Tarf", "Tindouf", "Tissemsilt", 
+    "El Oued", "Khenchela", "Souk Ahras", "Tipaza", "Mila", "Aïn Defla", 
+    "Naâma", "Aïn Témouchent", "Ghardaïa", "Relizane", "Timimoun", 
+    "Bordj Badji Mokhtar", "Ouled Djellal", "Béni Abbès", "In Salah", 
+    "In Guezzam", "Touggourt", "Djanet", "El M'Ghair", "El Meniaa"
+]
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
@@ -0,0 +1,288 @@
+# Teacher Availability Bitmaps for Driving School Platform
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Tuple
+from pymongo import ASCENDING, DeleteMany, ReplaceOne, UpdateOne
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WORD_BITS = SLOTS_PER_DAY // 2  # Two 48-bit words per day fit in Mongo Int64
+WORD_MASK = (1 << WORD_BITS) - 1
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Algerian working week
+DEFAULT_WORKING_HOURS = {
+    day: [["08:00", "17:00"]] for day in ["sunday", "monday", "tuesday", "wednesday", "thursday"]
+}
+
+class AvailabilityService:
+    """Per-teacher, per-day booked-slot bitmaps in 15 minute slots"""
+
+    def __init__(self, db_client):
+        self.db = db_client.driving_school_platform
+
+    async def ensure_indexes(self):
+        await self.db.teacher_availability.create_index([("teacher_id", ASCENDING), ("day", ASCENDING)])
+
+    @staticmethod
+    def _day(value: datetime) -> datetime:
+        return datetime(value.year, value.month, value.day)
+
+    @staticmethod
+    def _doc_id(teacher_id: str, day: datetime) -> str:
+        return f"{teacher_id}:{day.strftime('%Y-%m-%d')}"
+
+    @staticmethod
+    def _parse_time(value: str) -> int:
+        hours, minutes = value.split(":")
+        return int(hours) * 60 + int(minutes)
+
+    @classmethod
+    def validate_working_hours(cls, working_hours: Dict[str, List[List[str]]]) -> Dict[str, List[List[str]]]:
+        """Raise ValueError unless hours look like {"sunday": [["08:00", "12:00"], ...]}"""
+        for day, ranges in working_hours.items():
+            if day not in WEEKDAYS:
+                raise ValueError(f"Unknown weekday: {day}")
+            for time_range in ranges:
+                if len(time_range) != 2:
+                    raise ValueError("Working hours must be [start, end] pairs")
+                start, end = (cls._parse_time(value) for value in time_range)
+                if not 0 <= start < end <= 24 * 60:
+                    raise ValueError(f"Invalid working hours on {day}: {time_range}")
+        return working_hours
+
+    @classmethod
+    def working_mask(cls, working_hours: Optional[dict], day: datetime) -> np.ndarray:
+        """Boolean slot mask of the teacher's working time on a day"""
+        mask = np.zeros(SLOTS_PER_DAY, dtype=bool)
+        for start, end in (working_hours or DEFAULT_WORKING_HOURS).get(WEEKDAYS[day.weekday()], []):
+            # Only slots entirely inside working hours are offered
+            first = -(-cls._parse_time(start) // SLOT_MINUTES)
+            last = cls._parse_time(end) // SLOT_MINUTES
+            mask[first:last] = True
+        return mask
+
+    @staticmethod
+    def _split_by_day(start: datetime, end: datetime) -> List[Tuple[datetime, int, int]]:
+        """(day, first_minute, last_minute) pieces of an interval"""
+        pieces = []
+        day = datetime(start.year, start.month, start.day)
+        while day < end:
+            next_day = day + timedelta(days=1)
+            piece_start = max(start, day)
+            piece_end = min(end, next_day)
+            pieces.append((
+                day,
+                int((piece_start - day).total_seconds() // 60),
+                int(-(-(piece_end - day).total_seconds() // 60))
+            ))
+            day = next_day
+        return pieces
+
+    @staticmethod
+    def _words(first_slot: int, last_slot: int) -> Tuple[int, int]:
+        """Bitmask words covering slots [first_slot, last_slot)"""
+        bits = ((1 << last_slot) - 1) ^ ((1 << first_slot) - 1)
+        return bits & WORD_MASK, bits >> WORD_BITS
+
+    @classmethod
+    def _touched_words(cls, start: datetime, end: datetime) -> Dict[datetime, Tuple[int, int]]:
+        """Bitmask words per day of every slot an interval touches"""
+        return {
+            day: cls._words(first_minute // SLOT_MINUTES, -(-last_minute // SLOT_MINUTES))
+            for day, first_minute, last_minute in cls._split_by_day(start, end)
+        }
+
+    async def mark_booked(self, session: dict):
+        """Set the slots a session touches"""
+        start = session["scheduled_at"]
+        end = start + timedelta(minutes=session["duration_minutes"])
+
+        operations = []
+        for day, (low, high) in self._touched_words(start, end).items():
+            operations.append(UpdateOne(
+                {"_id": self._doc_id(session["teacher_id"], day)},
+                {
+                    "$bit": {"booked_low": {"or": low}, "booked_high": {"or": high}},
+                    "$setOnInsert": {"teacher_id": session["teacher_id"], "day": day}
+                },
+                upsert=True
+            ))
+        if operations:
+            await self.db.teacher_availability.bulk_write(operations, ordered=False)
+
+    async def release(self, session: dict, since: Optional[datetime] = None):
+        """Clear the slots a session booked, from `since` when it ended early
+
+        A partly covered edge slot may also hold a neighbouring session, so
+        slots still touched by another active session of the teacher stay
+        booked.
+        """
+        start = session["scheduled_at"]
+        end = start + timedelta(minutes=session["duration_minutes"])
+        if since and since > start:
+            # The slot the session ended in was used up to then
+            since_day = self._day(since)
+            start = since_day + timedelta(minutes=-(-(since - since_day).total_seconds() // 60 // SLOT_MINUTES) * SLOT_MINUTES)
+        released = self._touched_words(start, end) if start < end else {}
+        if not released:
+            return
+
+        # Sessions touching the same slots; they are far shorter than a day
+        neighbours = await self.db.sessions.find(
+            {
+                "teacher_id": session["teacher_id"],
+                "id": {"$ne": session.get("id")},
+                "status": {"$in": ["scheduled", "in_progress"]},
+                "scheduled_at": {"$gte": min(released) - timedelta(days=1), "$lt": end + timedelta(minutes=SLOT_MINUTES)}
+            },
+            {"_id": 0, "scheduled_at": 1, "duration_minutes": 1}
+        ).to_list(length=None)
+        for neighbour in neighbours:
+            neighbour_end = neighbour["scheduled_at"] + timedelta(minutes=neighbour["duration_minutes"])
+            for day, (kept_low, kept_high) in self._touched_words(neighbour["scheduled_at"], neighbour_end).items():
+                if day in released:
+                    low, high = released[day]
+                    released[day] = (low & ~kept_low, high & ~kept_high)
+
+        operations = [
+            UpdateOne(
+                {"_id": self._doc_id(session["teacher_id"], day)},
+                {"$bit": {"booked_low": {"and": WORD_MASK ^ low}, "booked_high": {"and": WORD_MASK ^ high}}}
+            )
+            for day, (low, high) in released.items()
+            if low or high
+        ]
+        if operations:
+            await self.db.teacher_availability.bulk_write(operations, ordered=False)
+
+    async def rebuild(self, since: Optional[datetime] = None) -> int:
+        """Recompute bitmaps from the sessions collection
+
+        Bitmaps are built in memory and written in one bulk write: each day
+        is replaced whole, then days without sessions anymore are removed.
+        """
+        since = self._day(since or datetime.utcnow())
+        run_id = str(uuid.uuid4())
+
+        rebuilt = 0
+        booked: Dict[Tuple[str, datetime], List[int]] = {}
+        sessions_cursor = self.db.sessions.find(
+            {"status": {"$in": ["scheduled", "in_progress"]}, "scheduled_at": {"$gte": since}},
+            {"_id": 0, "teacher_id": 1, "scheduled_at": 1, "duration_minutes": 1}
+        )
+        async for session in sessions_cursor:
+            end = session["scheduled_at"] + timedelta(minutes=session["duration_minutes"])
+            for day, (low, high) in self._touched_words(session["scheduled_at"], end).items():
+                words = booked.setdefault((session["teacher_id"], day), [0, 0])
+                words[0] |= low
+                words[1] |= high
+            rebuilt += 1
+
+        operations = [
+            ReplaceOne(
+                {"_id": self._doc_id(teacher_id, day)},
+                {"teacher_id": teacher_id, "day": day, "booked_low": low, "booked_high": high, "rebuild_run": run_id},
+                upsert=True
+            )
+            for (teacher_id, day), (low, high) in booked.items()
+        ]
+        operations.append(DeleteMany({"day": {"$gte": since}, "rebuild_run": {"$ne": run_id}}))
+        await self.db.teacher_availability.bulk_write(operations, ordered=True)
+        return rebuilt
+
+    @staticmethod
+    def _unpack(low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        """(n,) word pairs to an (n, SLOTS_PER_DAY) boolean matrix"""
+        shifts = np.arange(WORD_BITS, dtype=np.int64)
+        low_bits = (low[:, None] >> shifts) & 1
+        high_bits = (high[:, None] >> shifts) & 1
+        return np.concatenate([low_bits, high_bits], axis=1).astype(bool)
+
+    async def find_free_slots(
+        self,
+        school_id: str,
+        date_from: datetime,
+        date_to: datetime,
+        duration_minutes: int,
+        student_gender: Optional[str] = None
+    ) -> List[dict]:
+        """Start times where each teacher of a school is free for `duration_minutes`"""
+        query = {"driving_school_id": school_id, "is_approved": True}
+        if student_gender == "male":
+            query["can_teach_male"] = True
+        elif student_gender == "female":
+            query["can_teach_female"] = True
+
+        teachers = await self.db.teachers.find(
+            query, {"_id": 0, "id": 1, "user_id": 1, "working_hours": 1}
+        ).to_list(length=None)
+        if not teachers:
+            return []
+
+        days = []
+        day = self._day(date_from)
+        while day <= self._day(date_to):
+            days.append(day)
+            day += timedelta(days=1)
+
+        booked_docs = await self.db.teacher_availability.find({
+            "teacher_id": {"$in": [teacher["id"] for teacher in teachers]},
+            "day": {"$gte": days[0], "$lte": days[-1]}
+        }).to_list(length=None)
+        booked_by_key = {doc["_id"]: doc for doc in booked_docs}
+
+        # One row per (teacher, day)
+        rows = [(teacher, day) for teacher in teachers for day in days]
+        low = np.zeros(len(rows), dtype=np.int64)
+        high = np.zeros(len(rows), dtype=np.int64)
+        working = np.zeros((len(rows), SLOTS_PER_DAY), dtype=bool)
+        for row, (teacher, day) in enumerate(rows):
+            booked = booked_by_key.get(self._doc_id(teacher["id"], day))
+            if booked:
+                low[row] = booked.get("booked_low", 0)
+                high[row] = booked.get("booked_high", 0)
+            working[row] = self.working_mask(teacher.get("working_hours"), day)
+
+        free = working & ~self._unpack(low, high)
+
+        # Past slots of today are not offered
+        now = datetime.utcnow()
+        today = self._day(now)
+        first_open_slot = -(-(now.hour * 60 + now.minute) // SLOT_MINUTES)
+        for row, (_, day) in enumerate(rows):
+            if day == today:
+                free[row, :first_open_slot] = False
+            elif day < today:
+                free[row] = False
+
+        # A start slot is usable when the next `needed` slots are all free
+        needed = max(1, -(-duration_minutes // SLOT_MINUTES))
+        if needed > SLOTS_PER_DAY:
+            return []
+        cumulative = np.concatenate([np.zeros((len(rows), 1), dtype=np.int32), np.cumsum(free, axis=1, dtype=np.int32)], axis=1)
+        usable = (cumulative[:, needed:] - cumulative[:, :-needed]) == needed
+
+        users = await self.db.users.find(
+            {"id": {"$in": [teacher["user_id"] for teacher in teachers]}},
+            {"_id": 0, "id": 1, "first_name": 1, "last_name": 1}
+        ).to_list(length=None)
+        names = {user["id"]: f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() for user in users}
+
+        results = []
+        for row, (teacher, day) in enumerate(rows):
+            start_slots = np.flatnonzero(usable[row])
+            if not len(start_slots):
+                continue
+            results.append({
+                "teacher_id": teacher["id"],
+                "teacher_name": names.get(teacher["user_id"], ""),
+                "date": day.strftime("%Y-%m-%d"),
+                "slots": [(day + timedelta(minutes=int(slot) * SLOT_MINUTES)).isoformat() for slot in start_slots]
+            })
+        return results
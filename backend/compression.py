@@ -0,0 +1,218 @@
+# Response Compression for Driving School Platform
+import os
+import zlib
+import logging
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPRESSIBLE_TYPES = [
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/"
+]
+
+class CompressionStats:
+    """Byte counters per encoding, read by the metrics endpoint"""
+
+    def __init__(self):
+        self.responses: Dict[str, int] = {}
+        self.bytes_in: Dict[str, int] = {}
+        self.bytes_out: Dict[str, int] = {}
+        self.skipped = 0
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int):
+        self.responses[encoding] = self.responses.get(encoding, 0) + 1
+        self.bytes_in[encoding] = self.bytes_in.get(encoding, 0) + bytes_in
+        self.bytes_out[encoding] = self.bytes_out.get(encoding, 0) + bytes_out
+
+    def as_dict(self) -> Dict:
+        return {
+            "responses": dict(self.responses),
+            "bytes_in": dict(self.bytes_in),
+            "bytes_out": dict(self.bytes_out),
+            "bytes_saved": sum(self.bytes_in.values()) - sum(self.bytes_out.values()),
+            "skipped": self.skipped
+        }
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        # wbits 16+ writes the gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+def negotiate_encoding(accept_encoding: str, brotli_available: bool) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values"""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            offered[name] = quality
+
+    candidates = (["br"] if brotli_available else []) + ["gzip"]
+    best = None
+    for encoding in candidates:
+        quality = offered.get(encoding, offered.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+def encoded_etag(etag: bytes, encoding: str) -> bytes:
+    """Strong validator of the encoded representation, weak ones already allow it"""
+    if etag.startswith(b"W/") or not etag.endswith(b'"'):
+        return etag
+    return etag[:-1] + b"-" + encoding.encode() + b'"'
+
+class CompressionMiddleware:
+    """Negotiated gzip/brotli compression as a pure ASGI middleware
+
+    Single-message responses below COMPRESSION_MIN_SIZE are sent as they
+    are. Streamed responses are compressed chunk by chunk with a sync flush
+    after each one, so large exports are never held in memory.
+    """
+
+    def __init__(self, app, stats: Optional[CompressionStats] = None,
+                 minimum_size: Optional[int] = None, content_types: Optional[List[str]] = None):
+        self.app = app
+        self.stats = stats or CompressionStats()
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+        self.content_types = content_types or DEFAULT_COMPRESSIBLE_TYPES
+        self.gzip_level = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+        # Low brotli qualities are close to gzip speed and still smaller on JSON
+        self.brotli_quality = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+
+    def _encoder(self, encoding: str):
+        if encoding == "br":
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+    def _compressible(self, headers: List[tuple]) -> bool:
+        content_type = ""
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        return any(content_type.startswith(allowed) for allowed in self.content_types)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        if_none_match = b""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+            elif name == b"if-none-match":
+                if_none_match = value
+        encoding = negotiate_encoding(accept_encoding, brotli is not None)
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Dict = {}
+        state = {"mode": None, "encoder": None, "bytes_in": 0, "bytes_out": 0}
+
+        def with_encoded_etag(headers: List[tuple]) -> List[tuple]:
+            return [(name, encoded_etag(value, encoding) if name == b"etag" else value) for name, value in headers]
+
+        async def send_compressed_start(headers: List[tuple], content_length: Optional[int]):
+            headers = [(name, value) for name, value in with_encoded_etag(headers) if name != b"content-length"]
+            headers.append((b"content-encoding", encoding.encode()))
+            headers.append((b"vary", b"Accept-Encoding"))
+            if content_length is not None:
+                headers.append((b"content-length", str(content_length).encode()))
+            await send({**start_message, "headers": headers})
+
+        async def compressing_send(message):
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if state["mode"] is None:
+                headers = list(start_message.get("headers", []))
+                status = start_message["status"]
+                if status < 200 or status in (204, 304) or not self._compressible(headers):
+                    state["mode"] = "identity"
+                elif not more_body and len(body) < self.minimum_size:
+                    self.stats.skipped += 1
+                    state["mode"] = "identity"
+                elif not more_body:
+                    compressed = self._encoder(encoding)
+                    payload = compressed.compress(body) + compressed.finish()
+                    self.stats.record(encoding, len(body), len(payload))
+                    await send_compressed_start(headers, len(payload))
+                    await send({"type": "http.response.body", "body": payload})
+                    state["mode"] = "done"
+                    return
+                else:
+                    state["mode"] = "stream"
+                    state["encoder"] = self._encoder(encoding)
+                    await send_compressed_start(headers, None)
+
+                if state["mode"] == "identity":
+                    if status == 304 and any(
+                        name == b"etag" and encoded_etag(value, encoding) in if_none_match for name, value in headers
+                    ):
+                        # Revalidated the compressed representation, answer with its validator
+                        start_message["headers"] = with_encoded_etag(headers)
+                    await send(start_message)
+
+            if state["mode"] == "identity":
+                await send(message)
+                return
+
+            if state["mode"] == "stream":
+                encoder = state["encoder"]
+                chunk = encoder.compress(body) + (encoder.flush() if more_body else encoder.finish())
+                state["bytes_in"] += len(body)
+                state["bytes_out"] += len(chunk)
+                if not more_body:
+                    self.stats.record(encoding, state["bytes_in"], state["bytes_out"])
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
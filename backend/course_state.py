@@ -0,0 +1,152 @@
+# Course State Machine for Driving School Platform
+import uuid
+import logging
+from datetime import datetime
+from typing import Optional, List, Dict, Iterable
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Course sequence order and length
+COURSE_SEQUENCE = ["theory", "park", "road"]
+COURSE_SESSIONS = {"theory": 10, "park": 5, "road": 15}
+
+class CourseStateMachine:
+    """Course sequencing and progression rules shared by the endpoints"""
+
+    def __init__(self, db_client):
+        self.db = db_client.driving_school_platform
+
+    async def ensure_indexes(self):
+        await self.db.courses.create_index([("enrollment_id", ASCENDING)])
+
+    async def create_sequential_courses(self, enrollment_id: str) -> List[dict]:
+        """Create the course sequence for a new enrollment, only theory starts available"""
+        courses = self.sequential_course_documents(enrollment_id, datetime.utcnow())
+        await self.db.courses.insert_many(courses)
+        return courses
+
+    @staticmethod
+    def sequential_course_documents(enrollment_id: str, now: datetime) -> List[dict]:
+        """Course documents for a new enrollment, for callers batching their inserts"""
+        return [
+            {
+                "id": str(uuid.uuid4()),
+                "enrollment_id": enrollment_id,
+                "course_type": course_type,
+                "status": "available" if i == 0 else "locked",
+                "teacher_id": None,
+                "scheduled_sessions": [],
+                "completed_sessions": 0,
+                "total_sessions": COURSE_SESSIONS[course_type],
+                "exam_status": "not_available",
+                "exam_score": None,
+                "created_at": now,
+                "updated_at": now
+            }
+            for i, course_type in enumerate(COURSE_SEQUENCE)
+        ]
+
+    @staticmethod
+    def availability_transitions(courses: Iterable[dict]) -> Dict[str, str]:
+        """Status changes the sequence rules require for one enrollment's courses
+
+        The first course is always open, each later one opens when the exam
+        of the course before it was passed and is locked otherwise.
+        """
+        ordered = sorted(courses, key=lambda course: COURSE_SEQUENCE.index(course["course_type"]))
+
+        transitions = {}
+        for i, course in enumerate(ordered):
+            unlocked = i == 0 or ordered[i - 1].get("exam_status") == "passed"
+            if unlocked and course["status"] == "locked":
+                transitions[course["id"]] = "available"
+            elif not unlocked and course["status"] != "locked":
+                transitions[course["id"]] = "locked"
+        return transitions
+
+    def _transition_operations(self, courses_by_enrollment: Dict[str, List[dict]]) -> List[UpdateOne]:
+        now = datetime.utcnow()
+        operations = []
+        for courses in courses_by_enrollment.values():
+            for course_id, status in self.availability_transitions(courses).items():
+                operations.append(UpdateOne(
+                    {"id": course_id},
+                    {"$set": {"status": status, "updated_at": now}}
+                ))
+        return operations
+
+    async def update_availability(self, enrollment_ids: List[str]) -> int:
+        """Apply the sequence rules to some enrollments in one bulk write"""
+        courses_by_enrollment: Dict[str, List[dict]] = {}
+        courses_cursor = self.db.courses.find(
+            {"enrollment_id": {"$in": list(enrollment_ids)}},
+            {"_id": 0, "id": 1, "enrollment_id": 1, "course_type": 1, "status": 1, "exam_status": 1}
+        )
+        async for course in courses_cursor:
+            courses_by_enrollment.setdefault(course["enrollment_id"], []).append(course)
+
+        operations = self._transition_operations(courses_by_enrollment)
+        if not operations:
+            return 0
+
+        result = await self.db.courses.bulk_write(operations, ordered=False)
+        return result.modified_count
+
+    async def recompute_all_availability(self, batch_size: int = 1000) -> Dict[str, int]:
+        """Re-evaluate every enrollment in one pass over the courses collection"""
+        enrollments = 0
+        modified = 0
+        pending: Dict[str, List[dict]] = {}
+
+        async def flush():
+            nonlocal modified
+            operations = self._transition_operations(pending)
+            if operations:
+                result = await self.db.courses.bulk_write(operations, ordered=False)
+                modified += result.modified_count
+            pending.clear()
+
+        # Sorted by enrollment so each group is complete before it is flushed
+        courses_cursor = self.db.courses.find(
+            {},
+            {"_id": 0, "id": 1, "enrollment_id": 1, "course_type": 1, "status": 1, "exam_status": 1}
+        ).sort("enrollment_id", ASCENDING)
+        async for course in courses_cursor:
+            if course["enrollment_id"] not in pending:
+                if len(pending) >= batch_size:
+                    await flush()
+                enrollments += 1
+            pending.setdefault(course["enrollment_id"], []).append(course)
+        await flush()
+
+        logger.info(f"Recomputed course availability for {enrollments} enrollments, {modified} courses changed")
+        return {"enrollments": enrollments, "modified": modified}
+
+    async def complete_session(self, course_id: str) -> Optional[dict]:
+        """Count one completed session and finish the course at its threshold
+
+        Runs as one pipeline update so concurrent completions never lose an
+        increment, and returns the course as it is after the update.
+        """
+        completed = {"$add": [{"$ifNull": ["$completed_sessions", 0]}, 1]}
+        reached = {"$gte": [completed, "$total_sessions"]}
+
+        return await self.db.courses.find_one_and_update(
+            {"id": course_id},
+            [
+                {"$set": {
+                    "completed_sessions": completed,
+                    "status": {"$cond": [reached, "completed", "$status"]},
+                    # A passed or failed exam is kept when extra sessions are logged
+                    "exam_status": {"$cond": [
+                        {"$and": [reached, {"$eq": ["$exam_status", "not_available"]}]},
+                        "available",
+                        "$exam_status"
+                    ]},
+                    "updated_at": datetime.utcnow()
+                }}
+            ],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
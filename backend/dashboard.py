@@ -0,0 +1,125 @@
+# Dashboard Composition for Driving School Platform
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class DashboardService:
+    """Builds dashboards from independent sections fetched concurrently
+
+    Each section runs under its own timeout; a section that fails or is too
+    slow is returned empty and listed in `degraded_sections` instead of
+    failing the whole dashboard.
+    """
+
+    def __init__(self, db_client, section_timeout: Optional[float] = None):
+        self.db = db_client.driving_school_platform
+        self.section_timeout = section_timeout or float(os.environ.get('DASHBOARD_SECTION_TIMEOUT_SECONDS', '2'))
+
+    async def _section(self, name: str, awaitable: Awaitable, default: Any, degraded: List[str]) -> Any:
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.section_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dashboard section {name} timed out after {self.section_timeout}s")
+        except Exception as e:
+            logger.error(f"Dashboard section {name} error: {str(e)}")
+        degraded.append(name)
+        return default
+
+    async def compose(self, sections: Dict[str, tuple]) -> Dict[str, Any]:
+        """Run {name: (awaitable, default)} concurrently"""
+        degraded: List[str] = []
+        names = list(sections)
+        results = await asyncio.gather(*[
+            self._section(name, sections[name][0], sections[name][1], degraded) for name in names
+        ])
+
+        composed = dict(zip(names, results))
+        if degraded:
+            composed["degraded_sections"] = sorted(degraded)
+        return composed
+
+    async def _schools_by_id(self, school_ids: List[str]) -> Dict[str, dict]:
+        schools = await self.db.driving_schools.find({"id": {"$in": list(set(school_ids))}}).to_list(length=None)
+        return {school["id"]: school for school in schools}
+
+    async def _courses_by_enrollment(self, enrollment_ids: List[str]) -> Dict[str, List[dict]]:
+        courses_by_enrollment: Dict[str, List[dict]] = {enrollment_id: [] for enrollment_id in enrollment_ids}
+        courses_cursor = self.db.courses.find({"enrollment_id": {"$in": enrollment_ids}})
+        async for course in courses_cursor:
+            courses_by_enrollment[course["enrollment_id"]].append(course)
+        return courses_by_enrollment
+
+    async def _enrollments_with_schools(self, student_id: str) -> List[dict]:
+        enrollments = await self.db.enrollments.find({"student_id": student_id}).to_list(length=None)
+        schools = await self._schools_by_id([enrollment["driving_school_id"] for enrollment in enrollments])
+
+        for enrollment in enrollments:
+            school = schools.get(enrollment["driving_school_id"])
+            if school:
+                enrollment["school_name"] = school["name"]
+                enrollment["school_address"] = school["address"]
+                enrollment["school_state"] = school["state"]
+        return enrollments
+
+    async def _enrollments_with_courses(self, student_id: str) -> List[dict]:
+        enrollments = await self.db.enrollments.find({"student_id": student_id}).to_list(length=None)
+        schools, courses = await asyncio.gather(
+            self._schools_by_id([enrollment["driving_school_id"] for enrollment in enrollments]),
+            self._courses_by_enrollment([enrollment["id"] for enrollment in enrollments])
+        )
+
+        for enrollment in enrollments:
+            school = schools.get(enrollment["driving_school_id"])
+            enrollment["school_name"] = school["name"] if school else "Unknown School"
+            enrollment["courses"] = courses[enrollment["id"]]
+        return enrollments
+
+    async def overview(self, user: dict) -> Dict[str, Any]:
+        """Enrollments, documents and latest notifications of a user"""
+        return await self.compose({
+            "enrollments": (self._enrollments_with_schools(user["id"]), []),
+            "documents": (self.db.documents.find({"user_id": user["id"]}).to_list(length=None), []),
+            "notifications": (
+                self.db.notifications.find({"user_id": user["id"]}).sort("created_at", -1).limit(10).to_list(length=None),
+                []
+            )
+        })
+
+    async def for_role(self, user: dict, role: str) -> Dict[str, Any]:
+        """Role specific dashboard"""
+        if role == "student":
+            return await self.compose({
+                "enrollments": (self._enrollments_with_courses(user["id"]), [])
+            })
+
+        if role == "teacher":
+            teacher = await self.db.teachers.find_one({"user_id": user["id"]})
+            if not teacher:
+                return {}
+            return await self.compose({
+                "school": (self.db.driving_schools.find_one({"id": teacher["driving_school_id"]}), None),
+                "sessions": (self.db.sessions.find({"teacher_id": teacher["id"]}).to_list(length=None), [])
+            })
+
+        if role == "manager":
+            school = await self.db.driving_schools.find_one({"manager_id": user["id"]})
+            if not school:
+                return {}
+            composed = await self.compose({
+                "enrollments": (self.db.enrollments.find({"driving_school_id": school["id"]}).to_list(length=None), []),
+                "teachers": (self.db.teachers.find({"driving_school_id": school["id"]}).to_list(length=None), [])
+            })
+            return {"school": school, **composed}
+
+        if role == "external_expert":
+            expert = await self.db.external_experts.find_one({"user_id": user["id"]})
+            if not expert:
+                return {}
+            return await self.compose({
+                "exams": (self.db.exam_schedules.find({"external_expert_id": expert["id"]}).to_list(length=None), [])
+            })
+
+        return {}
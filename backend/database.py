@@ -0,0 +1,180 @@
+# Database Configuration for Driving School Platform
+import os
+import time
+import asyncio
+import logging
+import importlib.util
+import threading
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+logger = logging.getLogger(__name__)
+
+DATABASE_NAME = "driving_school_platform"
+
+# Wire compressors and the package each one needs
+COMPRESSOR_PACKAGES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connections open and checked out, per server"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open: Dict[str, int] = {}
+        self.checked_out: Dict[str, int] = {}
+        self.wait_timeouts = 0
+
+    def _bump(self, counts: Dict[str, int], address, delta: int):
+        key = f"{address[0]}:{address[1]}"
+        with self._lock:
+            counts[key] = max(0, counts.get(key, 0) + delta)
+
+    def connection_created(self, event):
+        self._bump(self.open, event.address, 1)
+
+    def connection_closed(self, event):
+        self._bump(self.open, event.address, -1)
+
+    def connection_checked_out(self, event):
+        self._bump(self.checked_out, event.address, 1)
+
+    def connection_checked_in(self, event):
+        self._bump(self.checked_out, event.address, -1)
+
+    def connection_check_out_failed(self, event):
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            with self._lock:
+                self.wait_timeouts += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    @property
+    def total_checked_out(self) -> int:
+        return sum(self.checked_out.values())
+
+class DatabaseConfig:
+    """Motor client settings read from the environment"""
+
+    def __init__(self):
+        self.url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+        self.max_pool_size = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+        self.min_pool_size = int(os.environ.get('MONGO_MIN_POOL_SIZE', '5'))
+        self.max_idle_time_ms = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000'))
+        self.wait_queue_timeout_ms = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '10000'))
+        self.server_selection_timeout_ms = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+        self.connect_timeout_ms = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+        self.socket_timeout_ms = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '30000'))
+        self.compressors = self._available_compressors(os.environ.get('MONGO_COMPRESSORS', 'zstd,snappy,zlib'))
+        self.analytics_read_preference = os.environ.get('MONGO_ANALYTICS_READ_PREFERENCE', 'secondaryPreferred')
+        self.analytics_max_staleness = int(os.environ.get('MONGO_ANALYTICS_MAX_STALENESS_SECONDS', '-1'))
+        self.ready_timeout = float(os.environ.get('MONGO_READY_TIMEOUT_SECONDS', '1'))
+        self.shutdown_drain_seconds = float(os.environ.get('MONGO_SHUTDOWN_DRAIN_SECONDS', '10'))
+
+    @staticmethod
+    def _available_compressors(requested: str) -> List[str]:
+        compressors = []
+        for name in [value.strip() for value in requested.split(",") if value.strip()]:
+            if name not in COMPRESSOR_PACKAGES:
+                logger.warning(f"Unknown MongoDB compressor {name} ignored")
+            elif COMPRESSOR_PACKAGES[name] and importlib.util.find_spec(COMPRESSOR_PACKAGES[name]) is None:
+                logger.info(f"MongoDB compressor {name} skipped, {COMPRESSOR_PACKAGES[name]} is not installed")
+            else:
+                compressors.append(name)
+        return compressors
+
+    def client_options(self) -> Dict:
+        options = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "maxIdleTimeMS": self.max_idle_time_ms,
+            "waitQueueTimeoutMS": self.wait_queue_timeout_ms,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "socketTimeoutMS": self.socket_timeout_ms
+        }
+        if self.compressors:
+            options["compressors"] = ",".join(self.compressors)
+        return options
+
+class Database:
+    """Owns the Motor client: the primary and analytics handles, readiness and shutdown"""
+
+    def __init__(self, config: Optional[DatabaseConfig] = None, event_listeners: Optional[list] = None):
+        self.config = config or DatabaseConfig()
+        self.pool_monitor = PoolMonitor()
+        self.client = AsyncIOMotorClient(
+            self.config.url,
+            event_listeners=list(event_listeners or []) + [self.pool_monitor],
+            **self.config.client_options()
+        )
+        self.db = self.client[DATABASE_NAME]
+
+        # Reporting reads tolerate replica lag and keep load off the primary
+        mode = read_pref_mode_from_name(self.config.analytics_read_preference)
+        self.analytics_db = self.client.get_database(
+            DATABASE_NAME,
+            read_preference=make_read_preference(mode, None, self.config.analytics_max_staleness)
+        )
+        self.accepting = True
+
+    def pool_stats(self) -> Dict:
+        checked_out = self.pool_monitor.total_checked_out
+        servers = max(1, len(self.pool_monitor.open))
+        return {
+            "max_pool_size": self.config.max_pool_size,
+            "open_connections": dict(self.pool_monitor.open),
+            "checked_out": dict(self.pool_monitor.checked_out),
+            "utilization": round(checked_out / (self.config.max_pool_size * servers), 4),
+            "wait_queue_timeouts": self.pool_monitor.wait_timeouts
+        }
+
+    async def readiness(self) -> Dict:
+        """Ping MongoDB within MONGO_READY_TIMEOUT_SECONDS"""
+        if not self.accepting:
+            return {"ready": False, "reason": "shutting down", "pool": self.pool_stats()}
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.client.admin.command("ping"), timeout=self.config.ready_timeout)
+        except asyncio.TimeoutError:
+            return {"ready": False, "reason": f"ping exceeded {self.config.ready_timeout}s", "pool": self.pool_stats()}
+        except Exception as e:
+            logger.error(f"Readiness ping error: {str(e)}")
+            return {"ready": False, "reason": "ping failed", "pool": self.pool_stats()}
+
+        return {
+            "ready": True,
+            "ping_ms": round((time.perf_counter() - started) * 1000, 2),
+            "compressors": self.config.compressors,
+            "pool": self.pool_stats()
+        }
+
+    async def drain_and_close(self):
+        """Report not ready, wait for checked out connections, then close the pool"""
+        self.accepting = False
+        deadline = time.monotonic() + self.config.shutdown_drain_seconds
+        while self.pool_monitor.total_checked_out and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        if self.pool_monitor.total_checked_out:
+            logger.warning(f"Closing MongoDB pool with {self.pool_monitor.total_checked_out} connections still in use")
+        self.client.close()
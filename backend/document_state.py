@@ -0,0 +1,198 @@
+# Document Completeness State for Driving School Platform
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# One bit per DocumentType, the order must never change
+DOCUMENT_TYPE_BITS = {
+    "profile_photo": 1,
+    "id_card": 2,
+    "medical_certificate": 4,
+    "residence_certificate": 8,
+    "driving_license": 16,
+    "teaching_license": 32
+}
+DOCUMENT_STATUSES = ["accepted", "pending", "refused"]
+
+def type_mask(document_types: Iterable[str]) -> int:
+    mask = 0
+    for document_type in document_types:
+        mask |= DOCUMENT_TYPE_BITS.get(document_type, 0)
+    return mask
+
+def mask_types(mask: int) -> List[str]:
+    return [document_type for document_type, bit in DOCUMENT_TYPE_BITS.items() if mask & bit]
+
+def empty_state() -> dict:
+    return {**{status: 0 for status in DOCUMENT_STATUSES}, "counts": {}}
+
+class DocumentStateService:
+    """Per-user summary of which document types are accepted, pending or refused
+
+    Stored on the user as `document_state`: a bitmask per status and the
+    number of documents per type and status. Every document write moves it
+    along, so completeness checks read one field instead of the user's
+    documents.
+    """
+
+    def __init__(self, db_client, required_documents: Optional[Dict[str, List[str]]] = None):
+        self.db = db_client.driving_school_platform
+        self.required_masks = {role: type_mask(types) for role, types in (required_documents or {}).items()}
+
+    # Reads
+
+    def required_mask(self, role: str) -> int:
+        return self.required_masks.get(role, 0)
+
+    @staticmethod
+    def uploaded_mask(state: dict) -> int:
+        return state.get("accepted", 0) | state.get("pending", 0) | state.get("refused", 0)
+
+    def is_complete(self, state: dict, role: str) -> bool:
+        """Every required type has an accepted document"""
+        required = self.required_mask(role)
+        return state.get("accepted", 0) & required == required
+
+    def missing_types(self, state: dict, role: str, uploaded: bool = False) -> List[str]:
+        """Required types without an accepted document, or without any document when uploaded is set"""
+        have = self.uploaded_mask(state) if uploaded else state.get("accepted", 0)
+        return mask_types(self.required_mask(role) & ~have)
+
+    def summary(self, state: dict, role: str) -> Dict:
+        required = self.required_mask(role)
+        counts = state.get("counts", {})
+        totals = {
+            status: sum(counts.get(document_type, {}).get(status, 0) for document_type in mask_types(required))
+            for status in DOCUMENT_STATUSES
+        }
+        return {
+            "total_required": len(mask_types(required)),
+            "total_uploaded": len(mask_types(self.uploaded_mask(state) & required)),
+            "total_accepted": totals["accepted"],
+            "total_pending": totals["pending"],
+            "total_refused": totals["refused"],
+            "all_uploaded": self.uploaded_mask(state) & required == required,
+            "all_accepted": self.is_complete(state, role)
+        }
+
+    async def state_for(self, user: dict) -> dict:
+        """State of an already loaded user document"""
+        if "document_state" in user:
+            return user["document_state"]
+        return (await self.refresh([user["id"]]))[user["id"]]
+
+    async def get_many(self, user_ids: Iterable[str]) -> Dict[str, dict]:
+        user_ids = list(set(user_ids))
+        states = {}
+        users_cursor = self.db.users.find({"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "document_state": 1})
+        async for user in users_cursor:
+            if "document_state" in user:
+                states[user["id"]] = user["document_state"]
+
+        # Users written before the state existed get it built on first read
+        missing = [user_id for user_id in user_ids if user_id not in states]
+        if missing:
+            states.update(await self.refresh(missing))
+        return states
+
+    # Writes
+
+    @staticmethod
+    def _delta_pipeline(document_type: str, old_status: Optional[str], new_status: Optional[str]) -> List[Dict]:
+        def count(status: str, of_type: str = document_type):
+            return {"$ifNull": [f"$document_state.counts.{of_type}.{status}", 0]}
+
+        changes = {}
+        if old_status:
+            changes[f"document_state.counts.{document_type}.{old_status}"] = {"$max": [0, {"$add": [count(old_status), -1]}]}
+        if new_status:
+            changes[f"document_state.counts.{document_type}.{new_status}"] = {"$add": [count(new_status), 1]}
+
+        masks = {
+            f"document_state.{status}": {"$add": [
+                {"$cond": [{"$gt": [count(status, of_type), 0]}, bit, 0]}
+                for of_type, bit in DOCUMENT_TYPE_BITS.items()
+            ]}
+            for status in DOCUMENT_STATUSES
+        }
+        masks["document_state.updated_at"] = datetime.utcnow()
+        return [{"$set": changes}, {"$set": masks}]
+
+    async def record(self, user_id: str, document_type: str, old_status: Optional[str], new_status: Optional[str]) -> dict:
+        """Move one document of a user from old_status to new_status, None for created or deleted"""
+        if document_type not in DOCUMENT_TYPE_BITS or old_status == new_status:
+            return (await self.get_many([user_id]))[user_id]
+
+        user = await self.db.users.find_one_and_update(
+            {"id": user_id, "document_state": {"$exists": True}},
+            self._delta_pipeline(document_type, old_status, new_status),
+            projection={"_id": 0, "document_state": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if user:
+            return user["document_state"]
+        # No state yet, build it from the documents, which already include this write
+        return (await self.refresh([user_id]))[user_id]
+
+    async def transition(self, document_id: str, fields: Dict) -> Optional[dict]:
+        """Update one document, status included, and its owner's state with it
+
+        Returns the owner's new state, or None when the document does not exist.
+        """
+        before = await self.db.documents.find_one_and_update(
+            {"id": document_id},
+            {"$set": fields},
+            projection={"_id": 0, "user_id": 1, "document_type": 1, "status": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if not before:
+            return None
+        return await self.record(before["user_id"], before["document_type"], before.get("status"), fields.get("status", before.get("status")))
+
+    async def refresh(self, user_ids: Iterable[str]) -> Dict[str, dict]:
+        """Recompute the state of some users from their documents, after bulk document writes"""
+        user_ids = list(set(user_ids))
+        states = {user_id: empty_state() for user_id in user_ids}
+        grouped = self.db.documents.aggregate([
+            {"$match": {"user_id": {"$in": user_ids}}},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "document_type": "$document_type", "status": "$status"},
+                "count": {"$sum": 1}
+            }}
+        ])
+        async for group in grouped:
+            key = group["_id"]
+            if key["document_type"] not in DOCUMENT_TYPE_BITS or key.get("status") not in DOCUMENT_STATUSES:
+                continue
+            state = states[key["user_id"]]
+            state["counts"].setdefault(key["document_type"], {})[key["status"]] = group["count"]
+            state[key["status"]] |= DOCUMENT_TYPE_BITS[key["document_type"]]
+
+        now = datetime.utcnow()
+        for state in states.values():
+            state["updated_at"] = now
+        if states:
+            await self.db.users.bulk_write([
+                UpdateOne({"id": user_id}, {"$set": {"document_state": state}})
+                for user_id, state in states.items()
+            ], ordered=False)
+        return states
+
+    async def rebuild(self, batch_size: int = 1000) -> Dict[str, int]:
+        """Recompute every user's state, one aggregation and bulk write per batch"""
+        users = 0
+        batch = []
+        async for user in self.db.users.find({}, {"_id": 0, "id": 1}).batch_size(batch_size):
+            batch.append(user["id"])
+            if len(batch) >= batch_size:
+                await self.refresh(batch)
+                users += len(batch)
+                batch = []
+        if batch:
+            await self.refresh(batch)
+            users += len(batch)
+        return {"users": users}
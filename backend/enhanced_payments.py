@@ -8,8 +8,13 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 from enum import Enum
 import uuid
+import time
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +40,12 @@ class RefundStatus(str, Enum):
     COMPLETED = "completed"
     DENIED = "denied"
 
+class WebhookEventStatus(str, Enum):
+    RECEIVED = "received"
+    PROCESSING = "processing"
+    PROCESSED = "processed"
+    FAILED = "failed"
+
 class EnhancedPaymentService:
     def __init__(self, db_client):
         self.db = db_client.driving_school_platform
@@ -52,6 +63,22 @@ class EnhancedPaymentService:
         # General Configuration
         self.payment_timeout_minutes = int(os.environ.get('PAYMENT_TIMEOUT_MINUTES', '30'))
         self.webhook_secret = os.environ.get('PAYMENT_WEBHOOK_SECRET', 'default-webhook-secret')
+        
+        # Webhook queue Configuration
+        self.webhook_batch_size = int(os.environ.get('PAYMENT_WEBHOOK_BATCH_SIZE', '50'))
+        self.webhook_lease_seconds = int(os.environ.get('PAYMENT_WEBHOOK_LEASE_SECONDS', '60'))
+        self.webhook_max_attempts = int(os.environ.get('PAYMENT_WEBHOOK_MAX_ATTEMPTS', '5'))
+        self.webhook_poll_seconds = float(os.environ.get('PAYMENT_WEBHOOK_POLL_SECONDS', '5'))
+        self._webhook_wakeup = asyncio.Event()
+        
+        # Expiry Configuration
+        self.expiry_batch_size = int(os.environ.get('PAYMENT_EXPIRY_BATCH_SIZE', '500'))
+        
+        # Rollup rebuild fence Configuration
+        self.rollup_writer_lease_seconds = int(os.environ.get('PAYMENT_ROLLUP_WRITER_LEASE_SECONDS', '30'))
+        self.rollup_fence_lease_seconds = int(os.environ.get('PAYMENT_ROLLUP_FENCE_LEASE_SECONDS', '900'))
+        self.rollup_fence_wait_seconds = float(os.environ.get('PAYMENT_ROLLUP_FENCE_WAIT_SECONDS', '60'))
+        self.rollup_fence_poll_seconds = float(os.environ.get('PAYMENT_ROLLUP_FENCE_POLL_SECONDS', '0.2'))
 
     async def create_payment_intent(
         self,
@@ -115,7 +142,11 @@ class EnhancedPaymentService:
             payment_doc["payment_gateway_data"] = await self._create_bank_transfer_details(payment_doc, school)
         
         # Save payment intent
-        await self.db.enhanced_payments.insert_one(payment_doc)
+        async with self._rollup_writer():
+            await self.db.enhanced_payments.insert_one(payment_doc)
+            await self._apply_rollup_deltas([
+                (payment_doc["school_id"], payment_doc["created_at"], payment_doc["status"], 1, amount)
+            ])
         
         # Update enrollment payment status
         await self.db.enrollments.update_one(
@@ -271,27 +302,278 @@ class EnhancedPaymentService:
         
         return {"status": "processed", "payment_id": payment_id}
 
+    def _webhook_handlers(self) -> Dict:
+        """Webhook payload handlers by provider"""
+        return {
+            "baridimob": self._process_baridimob_webhook
+        }
+
+    def _webhook_payment_id(self, provider: str, payload: dict) -> Optional[str]:
+        """Extract our payment ID from a provider payload"""
+        if provider == "baridimob":
+            return payload.get("order_id")
+        return payload.get("payment_id")
+
+    def _webhook_event_key(self, provider: str, payload: dict) -> str:
+        """Build the unique key used to deduplicate provider retries"""
+        if payload.get("event_id"):
+            return f"{provider}:{payload['event_id']}"
+
+        if payload.get("transaction_id"):
+            return f"{provider}:{payload['transaction_id']}:{payload.get('status', '')}"
+
+        digest = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{provider}:{digest}"
+
+    async def ensure_indexes(self):
+        """Create indexes backing the webhook queue and statistics rollups"""
+        await self.db.payment_webhook_events.create_index("event_key", unique=True)
+        await self.db.payment_webhook_events.create_index([("status", ASCENDING), ("received_at", ASCENDING)])
+        await self.db.payment_webhook_events.create_index([("payment_id", ASCENDING), ("received_at", ASCENDING)])
+        await self.db.payment_webhook_leases.create_index("expires_at", expireAfterSeconds=0)
+        await self.db.payment_stats_daily.create_index(
+            [("school_id", ASCENDING), ("day", ASCENDING), ("status", ASCENDING)],
+            unique=True
+        )
+        await self.db.payment_stats_daily.create_index([("day", ASCENDING)])
+        await self.db.enhanced_payments.create_index([("school_id", ASCENDING), ("created_at", ASCENDING)])
+        await self.db.enhanced_payments.create_index([("created_at", ASCENDING)])
+        await self.db.enhanced_payments.create_index([("status", ASCENDING), ("expires_at", ASCENDING)])
+
+    async def ingest_webhook(self, provider: str, payload: dict, signature: str) -> Dict:
+        """Durably record a webhook event and acknowledge it without processing"""
+
+        if provider not in self._webhook_handlers():
+            raise ValueError(f"Unsupported payment provider: {provider}")
+
+        # Verify webhook signature
+        if not self._verify_webhook_signature(provider, payload, signature):
+            raise ValueError("Invalid webhook signature")
+
+        event_key = self._webhook_event_key(provider, payload)
+        event_doc = {
+            "id": str(uuid.uuid4()),
+            "event_key": event_key,
+            "provider": provider,
+            "payment_id": self._webhook_payment_id(provider, payload),
+            "payload": payload,
+            "status": WebhookEventStatus.RECEIVED,
+            "attempts": 0,
+            "last_error": None,
+            "next_attempt_at": None,
+            "received_at": datetime.utcnow(),
+            "processed_at": None
+        }
+
+        try:
+            await self.db.payment_webhook_events.insert_one(event_doc)
+        except DuplicateKeyError:
+            # Provider retry of an event we already hold
+            return {"status": "duplicate", "event_key": event_key}
+
+        self._webhook_wakeup.set()
+        return {"status": "accepted", "event_id": event_doc["id"]}
+
+    async def process_webhook_events(self, limit: Optional[int] = None) -> int:
+        """Process queued webhook events, in order per payment"""
+
+        # Oldest pending payments first
+        pipeline = [
+            {"$match": {
+                "status": {"$in": [WebhookEventStatus.RECEIVED, WebhookEventStatus.PROCESSING]},
+                "$or": [{"next_attempt_at": None}, {"next_attempt_at": {"$lte": datetime.utcnow()}}]
+            }},
+            {"$sort": {"received_at": 1}},
+            {"$group": {"_id": "$payment_id", "first_received_at": {"$first": "$received_at"}}},
+            {"$sort": {"first_received_at": 1}},
+            {"$limit": limit or self.webhook_batch_size}
+        ]
+        pending = await self.db.payment_webhook_events.aggregate(pipeline).to_list(length=None)
+
+        # Payments are independent, events of one payment are applied sequentially
+        results = await asyncio.gather(*[
+            self._drain_payment_events(group["_id"]) for group in pending
+        ])
+        return sum(results)
+
+    async def _drain_payment_events(self, payment_id: Optional[str]) -> int:
+        """Apply queued events of a single payment while holding its lease"""
+        lease_id = payment_id or "__unassigned__"
+        # Only the holder may release the lease, it can expire and be taken over mid drain
+        owner = str(uuid.uuid4())
+        try:
+            await self.db.payment_webhook_leases.insert_one({
+                "_id": lease_id,
+                "owner": owner,
+                "expires_at": datetime.utcnow() + timedelta(seconds=self.webhook_lease_seconds)
+            })
+        except DuplicateKeyError:
+            # Another worker is processing this payment
+            return 0
+
+        processed = 0
+        try:
+            # Events left in processing belong to a worker whose lease expired
+            events_cursor = self.db.payment_webhook_events.find({
+                "payment_id": payment_id,
+                "status": {"$in": [WebhookEventStatus.RECEIVED, WebhookEventStatus.PROCESSING]}
+            }).sort("received_at", 1)
+
+            async for event in events_cursor:
+                if event.get("next_attempt_at") and event["next_attempt_at"] > datetime.utcnow():
+                    break
+                processed += 1
+                if not await self._apply_webhook_event(event):
+                    # Keep later events queued behind the one that must be retried
+                    break
+        finally:
+            await self.db.payment_webhook_leases.delete_one({"_id": lease_id, "owner": owner})
+
+        return processed
+
+    async def _apply_webhook_event(self, event: dict) -> bool:
+        """Apply one stored event, returns False when it should be retried"""
+        await self.db.payment_webhook_events.update_one(
+            {"id": event["id"]},
+            {"$set": {"status": WebhookEventStatus.PROCESSING}, "$inc": {"attempts": 1}}
+        )
+
+        handler = self._webhook_handlers()[event["provider"]]
+        try:
+            result = await handler(event["payload"])
+        except ValueError as e:
+            # Malformed or unknown payment - retrying will not help
+            await self._finish_webhook_event(event, WebhookEventStatus.FAILED, str(e))
+            return True
+        except Exception as e:
+            logger.error(f"Webhook event {event['id']} failed: {str(e)}")
+            attempts = event.get("attempts", 0) + 1
+            if attempts >= self.webhook_max_attempts:
+                await self._finish_webhook_event(event, WebhookEventStatus.FAILED, str(e))
+                return True
+            await self.db.payment_webhook_events.update_one(
+                {"id": event["id"]},
+                {"$set": {
+                    "status": WebhookEventStatus.RECEIVED,
+                    "last_error": str(e),
+                    "next_attempt_at": datetime.utcnow() + timedelta(seconds=2 ** attempts)
+                }}
+            )
+            return False
+
+        await self._finish_webhook_event(event, WebhookEventStatus.PROCESSED, None, result)
+        return True
+
+    async def _finish_webhook_event(self, event: dict, status: WebhookEventStatus, error: Optional[str], result: Optional[Dict] = None):
+        """Record the final outcome of a webhook event"""
+        await self.db.payment_webhook_events.update_one(
+            {"id": event["id"]},
+            {"$set": {
+                "status": status,
+                "last_error": error,
+                "result": result,
+                "processed_at": datetime.utcnow()
+            }}
+        )
+
+    async def run_webhook_worker(self):
+        """Background loop draining the webhook event queue"""
+        while True:
+            self._webhook_wakeup.clear()
+            try:
+                processed = await self.process_webhook_events()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook worker error: {str(e)}")
+                processed = 0
+
+            if processed:
+                continue
+
+            try:
+                await asyncio.wait_for(self._webhook_wakeup.wait(), timeout=self.webhook_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def replay_webhook_events(
+        self,
+        event_ids: Optional[List[str]] = None,
+        payment_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        status: Optional[WebhookEventStatus] = None,
+        include_processed: bool = False
+    ) -> int:
+        """Requeue stored webhook events so they are processed again
+
+        At least one filter is required, a replay of the whole history would
+        re-apply every payment transition. Processed events are only
+        requeued with include_processed.
+        """
+        if not (event_ids or payment_id or since or status):
+            raise ValueError("Pass event ids, a payment id, a date or a status to replay")
+        if status == WebhookEventStatus.PROCESSED and not include_processed:
+            raise ValueError("Replaying processed events requires include_processed")
+
+        query = {}
+        if event_ids:
+            query["id"] = {"$in": event_ids}
+        if payment_id:
+            query["payment_id"] = payment_id
+        if since:
+            query["received_at"] = {"$gte": since}
+        if status:
+            query["status"] = status
+        elif not include_processed:
+            query["status"] = {"$ne": WebhookEventStatus.PROCESSED}
+
+        result = await self.db.payment_webhook_events.update_many(
+            query,
+            {
+                "$set": {
+                    "status": WebhookEventStatus.RECEIVED,
+                    "attempts": 0,
+                    "last_error": None,
+                    "next_attempt_at": None,
+                    "replayed_at": datetime.utcnow()
+                },
+                "$inc": {"replay_count": 1}
+            }
+        )
+
+        self._webhook_wakeup.set()
+        logger.info(f"Requeued {result.modified_count} webhook events")
+        return result.modified_count
+
     async def _update_payment_status(self, payment_id: str, status: PaymentStatus, metadata: Dict = None):
         """Update payment status and handle side effects"""
-        
+
         update_data = {
             "status": status,
             "updated_at": datetime.utcnow()
         }
-        
+
         if metadata:
             update_data["gateway_metadata"] = metadata
-        
-        # Update payment
-        await self.db.enhanced_payments.update_one(
-            {"id": payment_id},
-            {"$set": update_data}
-        )
-        
-        # Get payment details
-        payment = await self.db.enhanced_payments.find_one({"id": payment_id})
-        if not payment:
-            return
+
+        # Only transition when the status changes, so redelivered events
+        # cannot re-apply enrollment updates or notifications
+        async with self._rollup_writer():
+            previous = await self.db.enhanced_payments.find_one_and_update(
+                {"id": payment_id, "status": {"$ne": status}},
+                {"$set": update_data},
+                return_document=ReturnDocument.BEFORE
+            )
+            if not previous:
+                return
+            
+            payment = {**previous, **update_data}
+            
+            # Move the payment between status buckets of its creation day
+            await self._apply_rollup_deltas([
+                (payment["school_id"], payment["created_at"], previous["status"], -1, -payment["amount"]),
+                (payment["school_id"], payment["created_at"], status, 1, payment["amount"])
+            ])
         
         # Update enrollment based on payment status
         if status == PaymentStatus.COMPLETED:
@@ -413,34 +695,239 @@ class EnhancedPaymentService:
         
         return {"refund_id": refund_id, "status": "requested"}
 
-    async def get_payment_statistics(self, school_id: str = None, date_from: datetime = None, date_to: datetime = None) -> Dict:
-        """Get payment statistics"""
-        query = {}
+    @staticmethod
+    def _rollup_day(value: datetime) -> datetime:
+        """Day bucket of a timestamp"""
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @asynccontextmanager
+    async def _rollup_writer(self):
+        """Hold a payment write and its rollup deltas clear of a rollup rebuild
+
+        Writers register on the fence document itself, so registering and
+        checking for a raised fence is one conditional update. A rebuild raises
+        the fence before waiting for registered writes, so every payment change
+        is either in the rebuilt rollups or applied on top of them.
+        """
+        token = str(uuid.uuid4())
+        deadline = time.monotonic() + self.rollup_fence_wait_seconds
+        while True:
+            now = datetime.utcnow()
+            try:
+                # Upserting onto a raised fence collides with the existing document
+                await self.db.payment_rollup_fence.update_one(
+                    {"_id": "rebuild", "expires_at": {"$not": {"$gt": now}}},
+                    {"$push": {"writers": {
+                        "token": token,
+                        "expires_at": now + timedelta(seconds=self.rollup_writer_lease_seconds)
+                    }}},
+                    upsert=True
+                )
+                break
+            except DuplicateKeyError:
+                if time.monotonic() >= deadline:
+                    raise RuntimeError("Payment rollups are being rebuilt, try again later")
+                await asyncio.sleep(self.rollup_fence_poll_seconds)
+        try:
+            yield
+        finally:
+            await self.db.payment_rollup_fence.update_one(
+                {"_id": "rebuild"},
+                {"$pull": {"writers": {"token": token}}}
+            )
+
+    async def _raise_rollup_fence(self) -> str:
+        owner = str(uuid.uuid4())
+        now = datetime.utcnow()
+        try:
+            # Takes over a fence left behind by a rebuild that died
+            await self.db.payment_rollup_fence.update_one(
+                {"_id": "rebuild", "expires_at": {"$not": {"$gt": now}}},
+                {
+                    "$set": {"owner": owner, "expires_at": now + timedelta(seconds=self.rollup_fence_lease_seconds)},
+                    "$pull": {"writers": {"expires_at": {"$lte": now}}}
+                },
+                upsert=True
+            )
+        except DuplicateKeyError:
+            raise ValueError("A payment rollup rebuild is already running")
+
+        # Wait for writes that registered before the fence went up
+        deadline = time.monotonic() + self.rollup_writer_lease_seconds
+        while await self.db.payment_rollup_fence.count_documents(
+            {"_id": "rebuild", "writers": {"$elemMatch": {"expires_at": {"$gt": datetime.utcnow()}}}}
+        ):
+            if time.monotonic() >= deadline:
+                await self._lower_rollup_fence(owner)
+                raise RuntimeError("Payment writes did not finish, rollups were not rebuilt")
+            await asyncio.sleep(self.rollup_fence_poll_seconds)
+        return owner
+
+    async def _lower_rollup_fence(self, owner: str):
+        await self.db.payment_rollup_fence.update_one(
+            {"_id": "rebuild", "owner": owner},
+            {"$unset": {"owner": "", "expires_at": ""}}
+        )
+
+    async def _apply_rollup_deltas(self, deltas: List[tuple]):
+        """Apply (school_id, created_at, status, count, amount) deltas to daily rollups"""
+        operations = [
+            UpdateOne(
+                {"school_id": school_id, "day": self._rollup_day(created_at), "status": status},
+                {"$inc": {"count": count, "amount": amount}},
+                upsert=True
+            )
+            for school_id, created_at, status, count, amount in deltas
+        ]
+        if operations:
+            await self.db.payment_stats_daily.bulk_write(operations, ordered=False)
+
+    async def rebuild_payment_rollups(self) -> int:
+        """Recompute the daily rollups from enhanced_payments
+
+        Payment writes wait while the rebuild runs, so no delta applied to
+        the live rollups is lost when the rebuilt collection replaces them.
+        """
+        fence_owner = await self._raise_rollup_fence()
+        try:
+            bucket_count = await self._rebuild_payment_rollups()
+            await self.db.payment_rollup_fence.update_one(
+                {"_id": "rebuild"}, {"$set": {"rebuilt_at": datetime.utcnow()}}
+            )
+            return bucket_count
+        finally:
+            await self._lower_rollup_fence(fence_owner)
+
+    async def backfill_payment_rollups(self):
+        """Build the rollups once if they were never built, as the statistics read only them"""
+        fence = await self.db.payment_rollup_fence.find_one({"_id": "rebuild"}, {"rebuilt_at": 1})
+        if fence and fence.get("rebuilt_at"):
+            return
+        try:
+            await self.rebuild_payment_rollups()
+        except ValueError:
+            # Another process is already building them
+            pass
+        except RuntimeError as e:
+            logger.warning(f"Payment rollup backfill skipped: {str(e)}")
+
+    async def _rebuild_payment_rollups(self) -> int:
+        pipeline = [
+            {
+                "$group": {
+                    "_id": {
+                        "school_id": "$school_id",
+                        "day": {
+                            "$dateFromParts": {
+                                "year": {"$year": "$created_at"},
+                                "month": {"$month": "$created_at"},
+                                "day": {"$dayOfMonth": "$created_at"}
+                            }
+                        },
+                        "status": "$status"
+                    },
+                    "count": {"$sum": 1},
+                    "amount": {"$sum": "$amount"}
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "school_id": "$_id.school_id",
+                    "day": "$_id.day",
+                    "status": "$_id.status",
+                    "count": 1,
+                    "amount": 1
+                }
+            },
+            {"$out": "payment_stats_daily_rebuild"}
+        ]
+        await self.db.enhanced_payments.aggregate(pipeline).to_list(length=None)
+        
+        rebuilt = self.db.payment_stats_daily_rebuild
+        await rebuilt.create_index(
+            [("school_id", ASCENDING), ("day", ASCENDING), ("status", ASCENDING)],
+            unique=True
+        )
+        await rebuilt.create_index([("day", ASCENDING)])
+        bucket_count = await rebuilt.count_documents({})
         
+        # No payment write runs behind the fence, so the swap loses no deltas
+        await rebuilt.rename("payment_stats_daily", dropTarget=True)
+        
+        logger.info(f"Rebuilt {bucket_count} payment rollup buckets")
+        return bucket_count
+
+    async def _sum_rollups(self, school_id: Optional[str], day_from: Optional[datetime], day_to: Optional[datetime]) -> Dict:
+        """Sum rollups of whole days in [day_from, day_to)"""
+        query = {}
         if school_id:
             query["school_id"] = school_id
         
-        if date_from or date_to:
-            date_query = {}
-            if date_from:
-                date_query["$gte"] = date_from
-            if date_to:
-                date_query["$lte"] = date_to
-            query["created_at"] = date_query
+        day_query = {}
+        if day_from:
+            day_query["$gte"] = day_from
+        if day_to:
+            day_query["$lt"] = day_to
+        if day_query:
+            query["day"] = day_query
         
-        # Aggregate statistics
         pipeline = [
             {"$match": query},
-            {
-                "$group": {
-                    "_id": "$status",
-                    "count": {"$sum": 1},
-                    "total_amount": {"$sum": "$amount"}
-                }
-            }
+            {"$group": {"_id": "$status", "count": {"$sum": "$count"}, "total_amount": {"$sum": "$amount"}}}
+        ]
+        return await self.db.payment_stats_daily.aggregate(pipeline).to_list(length=None)
+
+    async def _sum_payments(self, school_id: Optional[str], date_query: Dict) -> List[Dict]:
+        """Aggregate raw payments for a partial day window"""
+        query = {"created_at": date_query}
+        if school_id:
+            query["school_id"] = school_id
+        
+        pipeline = [
+            {"$match": query},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}, "total_amount": {"$sum": "$amount"}}}
         ]
+        return await self.db.enhanced_payments.aggregate(pipeline).to_list(length=None)
+
+    async def get_payment_statistics(self, school_id: str = None, date_from: datetime = None, date_to: datetime = None) -> Dict:
+        """Get payment statistics"""
+        
+        # Whole days come from the rollups, partial days at the edges
+        # of the range are aggregated from the payments themselves
+        full_from = None
+        full_to = None
+        partial_windows = []
+        
+        if date_from:
+            full_from = self._rollup_day(date_from)
+            if full_from < date_from:
+                full_from += timedelta(days=1)
+        if date_to:
+            full_to = self._rollup_day(date_to)
+        
+        if full_from and full_to and full_from >= full_to:
+            # Range does not cover a whole day
+            partial_windows.append({"$gte": date_from, "$lte": date_to})
+            full_from = full_to = None
+            use_rollups = False
+        else:
+            use_rollups = True
+            if date_from and date_from < full_from:
+                partial_windows.append({"$gte": date_from, "$lt": full_from})
+            if date_to:
+                partial_windows.append({"$gte": full_to, "$lte": date_to})
         
-        results = await self.db.enhanced_payments.aggregate(pipeline).to_list(length=None)
+        results = []
+        if use_rollups:
+            results.extend(await self._sum_rollups(school_id, full_from, full_to))
+        for window in partial_windows:
+            results.extend(await self._sum_payments(school_id, window))
+        
+        totals = {}
+        for result in results:
+            count, amount = totals.get(result["_id"], (0, 0))
+            totals[result["_id"]] = (count + result["count"], amount + result["total_amount"])
         
         stats = {
             "total_payments": 0,
@@ -454,11 +941,7 @@ class EnhancedPaymentService:
             "success_rate": 0
         }
         
-        for result in results:
-            status = result["_id"]
-            count = result["count"]
-            amount = result["total_amount"]
-            
+        for status, (count, amount) in totals.items():
             stats["total_payments"] += count
             stats["total_amount"] += amount
             
@@ -489,24 +972,82 @@ class EnhancedPaymentService:
                 serialized[key] = value
         return serialized
 
-    async def cleanup_expired_payments(self):
-        """Clean up expired payments"""
+    async def cleanup_expired_payments(self, batch_size: Optional[int] = None) -> Dict:
+        """Expire overdue payments in bounded batches"""
+        batch_size = batch_size or self.expiry_batch_size
+        worker_id = str(uuid.uuid4())
         now = datetime.utcnow()
+        started = time.perf_counter()
         
-        # Find expired pending payments
-        expired_payments = await self.db.enhanced_payments.find({
-            "status": {"$in": [PaymentStatus.PENDING, PaymentStatus.PROCESSING]},
-            "expires_at": {"$lt": now}
-        }).to_list(length=None)
+        expired_count = 0
+        batch_count = 0
         
-        for payment in expired_payments:
-            await self._update_payment_status(payment["id"], PaymentStatus.EXPIRED)
+        while True:
+            # Find the next chunk of expired pending payments
+            candidates = await self.db.enhanced_payments.find(
+                {
+                    "status": {"$in": [PaymentStatus.PENDING, PaymentStatus.PROCESSING]},
+                    "expires_at": {"$lt": now}
+                },
+                {"_id": 0, "id": 1, "status": 1, "enrollment_id": 1, "school_id": 1, "created_at": 1, "amount": 1}
+            ).limit(batch_size).to_list(length=batch_size)
             
-            # Update enrollment
-            await self.db.enrollments.update_one(
-                {"id": payment["enrollment_id"]},
-                {"$set": {"payment_status": "failed"}}
-            )
+            if not candidates:
+                break
+            batch_count += 1
+            
+            async with self._rollup_writer():
+                # Each update only matches while the payment still has the status we read,
+                # so concurrent workers never expire the same payment twice
+                claim_result = await self.db.enhanced_payments.bulk_write([
+                    UpdateOne(
+                        {"id": payment["id"], "status": payment["status"]},
+                        {"$set": {"status": PaymentStatus.EXPIRED, "updated_at": now, "expired_by": worker_id}}
+                    )
+                    for payment in candidates
+                ], ordered=False)
+                
+                if claim_result.modified_count == 0:
+                    continue
+                
+                if claim_result.modified_count < len(candidates):
+                    claimed_ids = set(await self.db.enhanced_payments.distinct("id", {
+                        "id": {"$in": [payment["id"] for payment in candidates]},
+                        "expired_by": worker_id
+                    }))
+                    claimed = [payment for payment in candidates if payment["id"] in claimed_ids]
+                else:
+                    claimed = candidates
+                
+                # Coalesce rollup moves per school, day and previous status
+                rollup_moves = {}
+                for payment in claimed:
+                    key = (payment["school_id"], self._rollup_day(payment["created_at"]), payment["status"])
+                    count, amount = rollup_moves.get(key, (0, 0))
+                    rollup_moves[key] = (count + 1, amount + payment["amount"])
+                
+                deltas = []
+                for (school_id, day, previous_status), (count, amount) in rollup_moves.items():
+                    deltas.append((school_id, day, previous_status, -count, -amount))
+                    deltas.append((school_id, day, PaymentStatus.EXPIRED, count, amount))
+                await self._apply_rollup_deltas(deltas)
+            
+            # Update enrollments
+            enrollment_ids = {payment["enrollment_id"] for payment in claimed}
+            await self.db.enrollments.bulk_write([
+                UpdateOne({"id": enrollment_id}, {"$set": {"payment_status": "failed"}})
+                for enrollment_id in enrollment_ids
+            ], ordered=False)
+            
+            expired_count += len(claimed)
+        
+        elapsed = time.perf_counter() - started
+        report = {
+            "expired": expired_count,
+            "batches": batch_count,
+            "elapsed_seconds": round(elapsed, 3),
+            "payments_per_second": round(expired_count / elapsed, 1) if elapsed > 0 else 0
+        }
         
-        logger.info(f"Marked {len(expired_payments)} payments as expired")
-        return len(expired_payments)
\ No newline at end of file
+        logger.info(f"Marked {expired_count} payments as expired in {batch_count} batches ({report['payments_per_second']}/s)")
+        return report
@@ -0,0 +1,178 @@
+# Enrollment Consistency Engine for Driving School Platform
+import os
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+PENDING_DOCUMENTS = "pending_documents"
+PENDING_APPROVAL = "pending_approval"
+
+STATE_ID = "enrollment_consistency"
+
+# REQUIRED_DOCUMENTS of students in server.py, for callers outside the API
+STUDENT_REQUIRED_DOCUMENTS = ["profile_photo", "id_card", "medical_certificate", "residence_certificate"]
+
+class EnrollmentConsistencyService:
+    """Moves pending_documents enrollments on once their student's documents are all accepted
+
+    Eligible students are found with one aggregation over enrollments and
+    documents and fixed with bulk writes, either for everyone, for some
+    students, or incrementally for what changed since the last run.
+    """
+
+    def __init__(self, db_client, required_types: Iterable[str] = STUDENT_REQUIRED_DOCUMENTS):
+        self.db = db_client.driving_school_platform
+        self.required_types = sorted(required_types)
+        self.batch_size = int(os.environ.get('ENROLLMENT_CONSISTENCY_BATCH_SIZE', '500'))
+        self.interval = float(os.environ.get('ENROLLMENT_CONSISTENCY_INTERVAL_SECONDS', '300'))
+
+    async def ensure_indexes(self):
+        await self.db.enrollments.create_index([("enrollment_status", ASCENDING), ("student_id", ASCENDING)])
+        await self.db.documents.create_index([("user_id", ASCENDING)])
+        await self.db.documents.create_index([("reviewed_at", ASCENDING)])
+
+    def _eligible_pipeline(self, match: Dict) -> List[Dict]:
+        return [
+            {"$match": {"enrollment_status": PENDING_DOCUMENTS, **match}},
+            {"$group": {"_id": "$student_id", "enrollment_ids": {"$push": "$id"}}},
+            {"$lookup": {"from": "documents", "localField": "_id", "foreignField": "user_id", "as": "documents"}},
+            {"$unwind": "$documents"},
+            {"$match": {"documents.status": "accepted", "documents.document_type": {"$in": self.required_types}}},
+            {"$group": {
+                "_id": "$_id",
+                "enrollment_ids": {"$first": "$enrollment_ids"},
+                "accepted_types": {"$addToSet": "$documents.document_type"}
+            }},
+            {"$match": {"accepted_types": {"$all": self.required_types}}},
+            {"$project": {"_id": 1, "enrollment_ids": 1}}
+        ]
+
+    async def _eligible_batches(self, match: Dict) -> AsyncIterator[List[dict]]:
+        batch = []
+        async for student in self.db.enrollments.aggregate(self._eligible_pipeline(match), allowDiskUse=True):
+            batch.append(student)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def _changed_since(self, since: datetime) -> Dict:
+        """Enrollments created, or whose student had documents reviewed, since a run"""
+        changed_students = await self.db.documents.distinct(
+            "user_id", {"$or": [{"reviewed_at": {"$gte": since}}, {"approved_at": {"$gte": since}}]}
+        )
+        return {"$or": [{"created_at": {"$gte": since}}, {"student_id": {"$in": changed_students}}]}
+
+    async def repair(self, student_ids: Optional[List[str]] = None, since: Optional[datetime] = None,
+                     dry_run: bool = False, sample_size: int = 20) -> Dict:
+        """Fix every eligible enrollment, or report them when dry_run is set"""
+        started = time.perf_counter()
+        match = {}
+        if student_ids is not None:
+            match["student_id"] = {"$in": list(student_ids)}
+        if since:
+            match.update(await self._changed_since(since))
+
+        report = {
+            "dry_run": dry_run,
+            "since": since.isoformat() if since else None,
+            "eligible_students": 0,
+            "eligible_enrollments": 0,
+            "fixed_enrollments": 0,
+            "notified_students": 0,
+            "sample": []
+        }
+
+        async for batch in self._eligible_batches(match):
+            # Only students get moved along, like the per-student check did
+            students = set(await self.db.users.distinct(
+                "id", {"id": {"$in": [student["_id"] for student in batch]}, "role": "student"}
+            ))
+            batch = [student for student in batch if student["_id"] in students]
+            report["eligible_students"] += len(batch)
+            report["eligible_enrollments"] += sum(len(student["enrollment_ids"]) for student in batch)
+            for student in batch[:max(0, sample_size - len(report["sample"]))]:
+                report["sample"].append({"student_id": student["_id"], "enrollment_ids": student["enrollment_ids"]})
+
+            if dry_run or not batch:
+                continue
+            fixed, notified = await self._apply(batch)
+            report["fixed_enrollments"] += fixed
+            report["notified_students"] += notified
+
+        report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        if report["fixed_enrollments"]:
+            logger.info(f"Enrollment consistency fixed {report['fixed_enrollments']} enrollments")
+        return report
+
+    async def _apply(self, batch: List[dict]):
+        now = datetime.utcnow()
+        run_id = str(uuid.uuid4())
+        enrollment_ids = [enrollment_id for student in batch for enrollment_id in student["enrollment_ids"]]
+
+        # The status guard makes the writes safe to race with requests and other workers
+        await self.db.enrollments.bulk_write([
+            UpdateOne(
+                {"id": enrollment_id, "enrollment_status": PENDING_DOCUMENTS},
+                {"$set": {
+                    "enrollment_status": PENDING_APPROVAL,
+                    "documents_completed_at": now,
+                    "status_corrected_at": now,
+                    "status_correction_run": run_id
+                }}
+            )
+            for enrollment_id in enrollment_ids
+        ], ordered=False)
+
+        # Notify only the students whose enrollments this run moved
+        fixed = await self.db.enrollments.find(
+            {"id": {"$in": enrollment_ids}, "status_correction_run": run_id}, {"_id": 0, "student_id": 1}
+        ).to_list(length=None)
+        fixed_students = sorted({enrollment["student_id"] for enrollment in fixed})
+        if fixed_students:
+            await self.db.notifications.insert_many([
+                {
+                    "id": str(uuid.uuid4()),
+                    "user_id": student_id,
+                    "type": "status_corrected",
+                    "title": "Enrollment Status Updated",
+                    "message": "Your enrollment status has been updated to pending approval after document verification.",
+                    "is_read": False,
+                    "created_at": now
+                }
+                for student_id in fixed_students
+            ])
+        return len(fixed), len(fixed_students)
+
+    async def run_incremental(self, dry_run: bool = False) -> Dict:
+        """Repair what changed since the last completed run, everything on the first one"""
+        state = await self.db.maintenance_state.find_one({"_id": STATE_ID}) or {}
+        run_started_at = datetime.utcnow()
+        report = await self.repair(since=state.get("last_started_at"), dry_run=dry_run)
+
+        if not dry_run:
+            await self.db.maintenance_state.update_one(
+                {"_id": STATE_ID},
+                {"$set": {"last_started_at": run_started_at, "last_report": report}},
+                upsert=True
+            )
+        return report
+
+    async def run_scheduler(self):
+        """Background loop running the incremental repair every interval"""
+        while True:
+            try:
+                await self.run_incremental()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Enrollment consistency run error: {str(e)}")
+            await asyncio.sleep(self.interval)
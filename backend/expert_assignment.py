@@ -0,0 +1,172 @@
+# External Expert Assignment for Driving School Platform
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Exams still to take place; passed and failed ones no longer hold a slot
+ACTIVE_EXAM_STATUSES = ["available"]
+
+class ExpertAssignmentService:
+    """Assign exams to the least loaded free expert of a specialization and state"""
+
+    def __init__(self, db_client):
+        self.db = db_client.driving_school_platform
+
+    async def ensure_indexes(self):
+        await self.db.expert_calendars.create_index([("expert_id", ASCENDING), ("day", ASCENDING)], unique=True)
+        await self.db.external_experts.create_index([
+            ("specialization", ASCENDING), ("available_states", ASCENDING), ("is_available", ASCENDING)
+        ])
+
+    @staticmethod
+    def _day(value: datetime) -> datetime:
+        return datetime(value.year, value.month, value.day)
+
+    @staticmethod
+    def _calendar_id(expert_id: str, day: datetime) -> str:
+        return f"{expert_id}:{day.strftime('%Y-%m-%d')}"
+
+    async def _candidate_queue(self, exam_type: str, state: Optional[str], day: datetime) -> List[tuple]:
+        """Heap of (exams that day, exams conducted, expert_id) for eligible experts"""
+        query = {"specialization": exam_type, "is_available": True}
+        if state:
+            query["available_states"] = state
+
+        experts = await self.db.external_experts.find(
+            query, {"_id": 0, "id": 1, "total_exams_conducted": 1}
+        ).to_list(length=None)
+        if not experts:
+            return []
+
+        calendars = await self.db.expert_calendars.find(
+            {"_id": {"$in": [self._calendar_id(expert["id"], day) for expert in experts]}},
+            {"expert_id": 1, "exam_count": 1}
+        ).to_list(length=None)
+        load = {calendar["expert_id"]: calendar.get("exam_count", 0) for calendar in calendars}
+
+        queue = [
+            (load.get(expert["id"], 0), expert.get("total_exams_conducted", 0), expert["id"])
+            for expert in experts
+        ]
+        heapq.heapify(queue)
+        return queue
+
+    def _days(self, start: datetime, end: datetime) -> List[datetime]:
+        """Days an exam runs on, the next one too when it crosses midnight"""
+        days = [self._day(start)]
+        while days[-1] + timedelta(days=1) < end:
+            days.append(days[-1] + timedelta(days=1))
+        return days
+
+    async def _reserve_day(self, expert_id: str, exam_id: str, start: datetime, end: datetime, day: datetime) -> bool:
+        overlap = {"$elemMatch": {"start": {"$lt": end}, "end": {"$gt": start}}}
+
+        # The first attempt may race another upsert of the same new day
+        for _ in range(2):
+            try:
+                await self.db.expert_calendars.update_one(
+                    {"_id": self._calendar_id(expert_id, day), "slots": {"$not": overlap}},
+                    {
+                        "$push": {"slots": {"exam_id": exam_id, "start": start, "end": end}},
+                        "$inc": {"exam_count": 1},
+                        "$setOnInsert": {"expert_id": expert_id, "day": day}
+                    },
+                    upsert=True
+                )
+                return True
+            except DuplicateKeyError:
+                # The day exists and the overlap filter rejected it, or a concurrent upsert won
+                continue
+        return False
+
+    async def reserve(self, expert_id: str, exam_id: str, start: datetime, end: datetime) -> bool:
+        """Atomically add an exam to each of the expert's days it runs on unless it overlaps another"""
+        days = self._days(start, end)
+        for position, day in enumerate(days):
+            if not await self._reserve_day(expert_id, exam_id, start, end, day):
+                if position:
+                    await self._release_days(expert_id, exam_id, days[:position])
+                return False
+        return True
+
+    async def _release_days(self, expert_id: str, exam_id: str, days: List[datetime]):
+        await self.db.expert_calendars.update_many(
+            {"_id": {"$in": [self._calendar_id(expert_id, day) for day in days]}, "slots.exam_id": exam_id},
+            {"$pull": {"slots": {"exam_id": exam_id}}, "$inc": {"exam_count": -1}}
+        )
+
+    async def release(self, expert_id: str, exam_id: str, start: datetime):
+        # Exams are far shorter than a day, so at most the next day holds it too
+        day = self._day(start)
+        await self._release_days(expert_id, exam_id, [day, day + timedelta(days=1)])
+
+    async def assign(
+        self,
+        exam_type: str,
+        state: Optional[str],
+        start: datetime,
+        duration_minutes: int,
+        exam_id: str
+    ) -> Optional[str]:
+        """Reserve the slot with the best available expert, returns the expert id"""
+        end = start + timedelta(minutes=duration_minutes)
+        queue = await self._candidate_queue(exam_type, state, self._day(start))
+
+        while queue:
+            _, _, expert_id = heapq.heappop(queue)
+            if await self.reserve(expert_id, exam_id, start, end):
+                return expert_id
+        return None
+
+    async def rebuild_calendars(self) -> int:
+        """Recreate expert calendars from the exams still to take place
+
+        The calendars are built into a side collection that then replaces
+        the live one in a single rename. Exams booked while it was built are
+        reserved again afterwards; reserving an exam that is already there
+        is a no-op.
+        """
+        started = datetime.utcnow()
+        calendars: Dict[str, dict] = {}
+        exams_cursor = self.db.exam_schedules.find(
+            {"external_expert_id": {"$ne": None}, "status": {"$in": ACTIVE_EXAM_STATUSES}},
+            {"_id": 0, "id": 1, "external_expert_id": 1, "scheduled_at": 1, "duration_minutes": 1}
+        )
+        async for exam in exams_cursor:
+            start, end = self._exam_interval(exam)
+            for day in self._days(start, end):
+                calendar_id = self._calendar_id(exam["external_expert_id"], day)
+                calendar = calendars.setdefault(calendar_id, {
+                    "_id": calendar_id,
+                    "expert_id": exam["external_expert_id"],
+                    "day": day,
+                    "slots": [],
+                    "exam_count": 0
+                })
+                calendar["slots"].append({"exam_id": exam["id"], "start": start, "end": end})
+                calendar["exam_count"] += 1
+
+        rebuilt = self.db.expert_calendars_rebuild
+        await rebuilt.drop()
+        if calendars:
+            await rebuilt.insert_many(list(calendars.values()))
+        await rebuilt.create_index([("expert_id", ASCENDING), ("day", ASCENDING)], unique=True)
+        await rebuilt.rename("expert_calendars", dropTarget=True)
+
+        recent_cursor = self.db.exam_schedules.find(
+            {"external_expert_id": {"$ne": None}, "status": {"$in": ACTIVE_EXAM_STATUSES}, "created_at": {"$gte": started}},
+            {"_id": 0, "id": 1, "external_expert_id": 1, "scheduled_at": 1, "duration_minutes": 1}
+        )
+        async for exam in recent_cursor:
+            await self.reserve(exam["external_expert_id"], exam["id"], *self._exam_interval(exam))
+        return len(calendars)
+
+    @staticmethod
+    def _exam_interval(exam: dict):
+        start = exam["scheduled_at"]
+        return start, start + timedelta(minutes=exam.get("duration_minutes") or 90)
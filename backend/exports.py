@@ -0,0 +1,272 @@
+# Operational Data Exports for Driving School Platform
+import io
+import os
+import csv
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# Columns of each export and their Parquet types
+EXPORT_COLUMNS = {
+    "enrollments": [
+        ("enrollment_id", "string"), ("student_name", "string"), ("student_email", "string"),
+        ("school_name", "string"), ("status", "string"), ("created_at", "datetime"), ("approved_at", "datetime")
+    ],
+    "sessions": [
+        ("session_id", "string"), ("scheduled_at", "datetime"), ("session_type", "string"), ("status", "string"),
+        ("duration_minutes", "int"), ("location", "string"), ("student_name", "string"), ("teacher_name", "string"),
+        ("school_name", "string")
+    ],
+    "exams": [
+        ("exam_id", "string"), ("exam_type", "string"), ("scheduled_at", "datetime"), ("status", "string"),
+        ("score", "float"), ("student_name", "string"), ("student_email", "string"), ("school_name", "string")
+    ],
+    "payments": [
+        ("payment_id", "string"), ("created_at", "datetime"), ("paid_at", "datetime"), ("amount", "float"),
+        ("currency", "string"), ("payment_method", "string"), ("status", "string"), ("refund_status", "string"),
+        ("student_name", "string"), ("student_email", "string"), ("school_name", "string")
+    ]
+}
+
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+USER_PROJECTION = {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "email": 1}
+
+def _full_name(user: Optional[dict]) -> str:
+    if not user:
+        return ""
+    return f"{user.get('first_name', '')} {user.get('last_name', '')}".strip()
+
+def _date_filter(field: str, start: Optional[datetime], end: Optional[datetime]) -> Dict:
+    if not start and not end:
+        return {}
+    bounds = {}
+    if start:
+        bounds["$gte"] = start
+    if end:
+        bounds["$lt"] = end
+    return {field: bounds}
+
+class _ChunkSink:
+    """Write target for the Parquet writer, drained after every row group"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+class ExportService:
+    """Streams a school's operational data in bounded batches
+
+    Rows are read from Motor cursors `EXPORT_BATCH_SIZE` at a time and
+    joined to user names with one `$in` lookup per batch, so memory stays
+    flat however large the export is.
+    """
+
+    def __init__(self, db_client):
+        self.db = db_client.driving_school_platform
+        self.batch_size = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+    @property
+    def parquet_available(self) -> bool:
+        return pyarrow is not None
+
+    def stream(self, dataset: str, export_format: str, school: dict,
+               start: Optional[datetime] = None, end: Optional[datetime] = None) -> AsyncIterator[bytes]:
+        batches = self.batches(dataset, school, start, end)
+        if export_format == "parquet":
+            return self._parquet_stream(dataset, batches)
+        return self._csv_stream(dataset, batches)
+
+    def batches(self, dataset: str, school: dict, start: Optional[datetime], end: Optional[datetime]) -> AsyncIterator[List[dict]]:
+        readers = {
+            "enrollments": self._enrollment_batches,
+            "sessions": self._session_batches,
+            "exams": self._exam_batches,
+            "payments": self._payment_batches
+        }
+        return readers[dataset](school, start, end)
+
+    async def _chunks(self, cursor) -> AsyncIterator[List[dict]]:
+        chunk = []
+        async for document in cursor.batch_size(self.batch_size):
+            chunk.append(document)
+            if len(chunk) >= self.batch_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def _users(self, user_ids: Iterable[str]) -> Dict[str, dict]:
+        users_cursor = self.db.users.find({"id": {"$in": list(set(user_ids))}}, USER_PROJECTION)
+        return {user["id"]: user async for user in users_cursor}
+
+    async def _enrollment_batches(self, school, start, end) -> AsyncIterator[List[dict]]:
+        cursor = self.db.enrollments.find(
+            {"driving_school_id": school["id"], **_date_filter("created_at", start, end)}, {"_id": 0}
+        ).sort("created_at", 1)
+        async for enrollments in self._chunks(cursor):
+            users = await self._users(enrollment["student_id"] for enrollment in enrollments)
+            yield [
+                {
+                    "enrollment_id": enrollment["id"],
+                    "student_name": _full_name(users.get(enrollment["student_id"])),
+                    "student_email": users.get(enrollment["student_id"], {}).get("email", ""),
+                    "school_name": school["name"],
+                    "status": enrollment.get("enrollment_status"),
+                    "created_at": enrollment.get("created_at"),
+                    "approved_at": enrollment.get("approved_at")
+                }
+                for enrollment in enrollments
+            ]
+
+    async def _session_batches(self, school, start, end) -> AsyncIterator[List[dict]]:
+        # A school has few teachers, their names are looked up once
+        teachers = await self.db.teachers.find(
+            {"driving_school_id": school["id"]}, {"_id": 0, "id": 1, "user_id": 1}
+        ).to_list(length=None)
+        teacher_users = await self._users(teacher["user_id"] for teacher in teachers)
+        teacher_names = {teacher["id"]: _full_name(teacher_users.get(teacher["user_id"])) for teacher in teachers}
+
+        cursor = self.db.sessions.find(
+            {"teacher_id": {"$in": list(teacher_names)}, **_date_filter("scheduled_at", start, end)}, {"_id": 0}
+        ).sort("scheduled_at", 1)
+        async for sessions in self._chunks(cursor):
+            users = await self._users(session["student_id"] for session in sessions)
+            yield [
+                {
+                    "session_id": session["id"],
+                    "scheduled_at": session.get("scheduled_at"),
+                    "session_type": session.get("session_type"),
+                    "status": session.get("status"),
+                    "duration_minutes": session.get("duration_minutes"),
+                    "location": session.get("location"),
+                    "student_name": _full_name(users.get(session["student_id"])),
+                    "teacher_name": teacher_names.get(session["teacher_id"], ""),
+                    "school_name": school["name"]
+                }
+                for session in sessions
+            ]
+
+    async def _exam_batches(self, school, start, end) -> AsyncIterator[List[dict]]:
+        # Exams only link to a course, so walk the school's enrollments batch by batch
+        cursor = self.db.enrollments.find(
+            {"driving_school_id": school["id"]}, {"_id": 0, "id": 1, "student_id": 1}
+        ).sort("created_at", 1)
+        async for enrollments in self._chunks(cursor):
+            course_ids = await self.db.courses.distinct(
+                "id", {"enrollment_id": {"$in": [enrollment["id"] for enrollment in enrollments]}}
+            )
+            exams = await self.db.exam_schedules.find(
+                {"course_id": {"$in": course_ids}, **_date_filter("scheduled_at", start, end)}, {"_id": 0}
+            ).sort("scheduled_at", 1).to_list(length=None)
+            if not exams:
+                continue
+
+            users = await self._users(exam["student_id"] for exam in exams)
+            yield [
+                {
+                    "exam_id": exam["id"],
+                    "exam_type": exam.get("exam_type"),
+                    "scheduled_at": exam.get("scheduled_at"),
+                    "status": exam.get("status"),
+                    "score": exam.get("score"),
+                    "student_name": _full_name(users.get(exam["student_id"])),
+                    "student_email": users.get(exam["student_id"], {}).get("email", ""),
+                    "school_name": school["name"]
+                }
+                for exam in exams
+            ]
+
+    async def _payment_batches(self, school, start, end) -> AsyncIterator[List[dict]]:
+        cursor = self.db.enhanced_payments.find(
+            {"school_id": school["id"], **_date_filter("created_at", start, end)},
+            {"_id": 0, "payment_attempts": 0, "payment_gateway_data": 0, "metadata": 0}
+        ).sort("created_at", 1)
+        async for payments in self._chunks(cursor):
+            users = await self._users(payment["user_id"] for payment in payments)
+            yield [
+                {
+                    "payment_id": payment["id"],
+                    "created_at": payment.get("created_at"),
+                    "paid_at": payment.get("paid_at"),
+                    "amount": payment.get("amount"),
+                    "currency": payment.get("currency"),
+                    "payment_method": payment.get("payment_method"),
+                    "status": payment.get("status"),
+                    "refund_status": payment.get("refund_status"),
+                    "student_name": _full_name(users.get(payment["user_id"])),
+                    "student_email": users.get(payment["user_id"], {}).get("email", ""),
+                    "school_name": school["name"]
+                }
+                for payment in payments
+            ]
+
+    async def _csv_stream(self, dataset: str, batches: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+        columns = [name for name, _ in EXPORT_COLUMNS[dataset]]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        rows = 0
+        try:
+            async for batch in batches:
+                for row in batch:
+                    writer.writerow([
+                        value.isoformat() if isinstance(value, datetime) else ("" if value is None else value)
+                        for value in (row[column] for column in columns)
+                    ])
+                rows += len(batch)
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+            if not rows:
+                yield buffer.getvalue().encode("utf-8")
+        except Exception as e:
+            # Headers are already sent, the client sees a truncated file
+            logger.error(f"{dataset} CSV export error after {rows} rows: {str(e)}")
+            raise
+
+    async def _parquet_stream(self, dataset: str, batches: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+        arrow_types = {
+            "string": pyarrow.string(),
+            "datetime": pyarrow.timestamp("ms"),
+            "float": pyarrow.float64(),
+            "int": pyarrow.int64()
+        }
+        schema = pyarrow.schema([(name, arrow_types[kind]) for name, kind in EXPORT_COLUMNS[dataset]])
+        sink = _ChunkSink()
+        rows = 0
+        writer = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode="w"), schema)
+        try:
+            # One row group per batch, written out as soon as it is encoded
+            async for batch in batches:
+                writer.write_table(pyarrow.Table.from_pylist(batch, schema=schema))
+                rows += len(batch)
+                yield sink.drain()
+            writer.close()
+            yield sink.drain()
+        except Exception as e:
+            logger.error(f"{dataset} Parquet export error after {rows} rows: {str(e)}")
+            raise
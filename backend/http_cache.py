@@ -0,0 +1,198 @@
+# HTTP Caching for Driving School Platform public endpoints
+import os
+import re
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Suffixes CompressionMiddleware adds to the ETags of encoded responses
+ENCODING_ETAG_SUFFIXES = ("-gzip", "-br")
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """If-None-Match check that also accepts the ETags of encoded representations"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate == etag:
+            return True
+        for suffix in ENCODING_ETAG_SUFFIXES:
+            if candidate.endswith(suffix + '"') and candidate[:-len(suffix) - 1] + '"' == etag:
+                return True
+    return False
+
+class CachePolicy:
+    """Cache-Control and invalidation tags of a group of routes"""
+
+    def __init__(self, pattern: str, max_age: int, tags: List[str]):
+        self.pattern = re.compile(pattern)
+        self.max_age = max_age
+        self.tags = tags
+        self.cache_control = f"public, max-age={max_age}"
+
+# Ids are UUIDs, which keeps named routes such as /driving-schools/search-suggestions out
+ID_PATTERN = r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+
+# Public, read-mostly endpoints
+DEFAULT_POLICIES = [
+    CachePolicy(r"^/api/states$", 86400, []),
+    CachePolicy(r"^/api/driving-schools$", 60, ["schools"]),
+    CachePolicy(rf"^/api/driving-schools/{ID_PATTERN}$", 300, ["schools"]),
+    CachePolicy(r"^/api/reviews/school/[^/]+$", 60, ["reviews"]),
+    CachePolicy(r"^/api/certificates/[^/]+/verify$", 300, ["certificates"]),
+]
+
+class ResponseCache:
+    """In-process response cache invalidated through shared tag versions
+
+    Writes bump a tag version in `cache_versions`; every worker re-reads the
+    versions at most every HTTP_CACHE_VERSION_CHECK_SECONDS and drops
+    entries stored under older versions.
+    """
+
+    def __init__(self, db_client, policies: Optional[List[CachePolicy]] = None):
+        self.db = db_client.driving_school_platform
+        self.policies = policies or DEFAULT_POLICIES
+        self.enabled = os.environ.get('HTTP_CACHE_ENABLED', 'true').lower() == 'true'
+        self.max_entries = int(os.environ.get('HTTP_CACHE_MAX_ENTRIES', '512'))
+        self.check_interval = float(os.environ.get('HTTP_CACHE_VERSION_CHECK_SECONDS', '2'))
+
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._checked_at = 0.0
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def policy_for(self, path: str) -> Optional[CachePolicy]:
+        for policy in self.policies:
+            if policy.pattern.match(path):
+                return policy
+        return None
+
+    @staticmethod
+    def etag_for(body: bytes) -> str:
+        return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    async def _refresh_versions(self):
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        versions = await self.db.cache_versions.find({}).to_list(length=None)
+        self._versions = {version["_id"]: version["version"] for version in versions}
+        self._checked_at = time.monotonic()
+
+    def _tag_versions(self, policy: CachePolicy) -> Tuple[int, ...]:
+        return tuple(self._versions.get(tag, 0) for tag in policy.tags)
+
+    async def invalidate(self, *tags: str):
+        """Call after writing data that cached responses depend on"""
+        for tag in tags:
+            version_doc = await self.db.cache_versions.find_one_and_update(
+                {"_id": tag},
+                {"$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            self._versions[tag] = version_doc["version"]
+
+    async def lookup(self, key: str, policy: CachePolicy) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        await self._refresh_versions()
+
+        entry = self._entries.get(key)
+        if (
+            entry
+            and entry["versions"] == self._tag_versions(policy)
+            and time.monotonic() - entry["stored_at"] < policy.max_age
+        ):
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+        self.stats["misses"] += 1
+        return None
+
+    def store(self, key: str, policy: CachePolicy, status: int, headers: List[tuple], body: bytes, etag: str):
+        if not self.enabled:
+            return
+        self._entries[key] = {
+            "versions": self._tag_versions(policy),
+            "stored_at": time.monotonic(),
+            "status": status,
+            "headers": headers,
+            "body": body,
+            "etag": etag
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+class HTTPCacheMiddleware:
+    """ETag, conditional GET and Cache-Control for the routes of a ResponseCache"""
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.cache.policy_for(scope["path"])
+        if not policy:
+            await self.app(scope, receive, send)
+            return
+
+        key = scope["path"] + "?" + scope.get("query_string", b"").decode("latin-1")
+        if_none_match = None
+        for name, value in scope.get("headers", []):
+            if name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+
+        entry = await self.cache.lookup(key, policy)
+        if entry:
+            scope["http_cache_hit"] = True
+            await self._send(send, policy, entry["status"], entry["headers"], entry["body"], entry["etag"], if_none_match)
+            return
+
+        # Buffer the response to hash it; these payloads are small catalog documents
+        start_message = {}
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+
+        status = start_message["status"]
+        headers = [
+            (name, value) for name, value in start_message.get("headers", [])
+            if name not in (b"etag", b"cache-control")
+        ]
+        body = b"".join(chunks)
+        if status != 200:
+            await send({"type": "http.response.start", "status": status, "headers": start_message.get("headers", [])})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        etag = self.cache.etag_for(body)
+        self.cache.store(key, policy, status, headers, body, etag)
+        await self._send(send, policy, status, headers, body, etag, if_none_match)
+
+    async def _send(self, send, policy, status, headers, body, etag, if_none_match):
+        cache_headers = [(b"etag", etag.encode()), (b"cache-control", policy.cache_control.encode())]
+
+        if if_none_match and etag_matches(etag, if_none_match):
+            self.cache.stats["not_modified"] += 1
+            await send({"type": "http.response.start", "status": 304, "headers": cache_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({"type": "http.response.start", "status": status, "headers": headers + cache_headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Operational commands for the Driving School Platform backend"""
+
+import os
+import sys
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+
+import typer
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.append(os.path.dirname(__file__))
+
+from enhanced_payments import EnhancedPaymentService, WebhookEventStatus
+from availability import AvailabilityService
+from expert_assignment import ExpertAssignmentService
+from course_state import CourseStateMachine
+from ratings import RatingService
+from database import Database
+from http_cache import ResponseCache
+from enrollment_consistency import EnrollmentConsistencyService
+from document_state import DocumentStateService
+
+cli = typer.Typer(help="Driving School Platform maintenance commands")
+
+def get_client() -> AsyncIOMotorClient:
+    return Database().client
+
+@cli.command("replay-webhooks")
+def replay_webhooks(
+    event_id: Optional[List[str]] = typer.Option(None, "--event-id", help="Replay specific event IDs"),
+    payment_id: Optional[str] = typer.Option(None, help="Replay all events of one payment"),
+    since: Optional[datetime] = typer.Option(None, help="Replay events received after this date"),
+    status: Optional[WebhookEventStatus] = typer.Option(None, help="Only replay events with this status"),
+    include_processed: bool = typer.Option(
+        False, "--include-processed", help="Also replay events that were already processed"
+    ),
+    process: bool = typer.Option(True, help="Process the requeued events before exiting")
+):
+    """Requeue stored payment webhook events and reprocess them"""
+    if not (event_id or payment_id or since or status):
+        typer.echo("Refusing to replay every webhook event: pass --event-id, --payment-id, --since or --status", err=True)
+        raise typer.Exit(1)
+
+    async def run():
+        client = get_client()
+        payment_service = EnhancedPaymentService(client)
+        try:
+            requeued = await payment_service.replay_webhook_events(
+                event_ids=event_id,
+                payment_id=payment_id,
+                since=since,
+                status=status,
+                include_processed=include_processed
+            )
+            typer.echo(f"Requeued {requeued} webhook events")
+
+            if process:
+                total = 0
+                while True:
+                    processed = await payment_service.process_webhook_events()
+                    if not processed:
+                        break
+                    total += processed
+                typer.echo(f"Processed {total} webhook events")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+@cli.command("rebuild-payment-rollups")
+def rebuild_payment_rollups():
+    """Backfill the daily payment statistics rollups"""
+
+    async def run():
+        client = get_client()
+        try:
+            buckets = await EnhancedPaymentService(client).rebuild_payment_rollups()
+            typer.echo(f"Rebuilt {buckets} payment rollup buckets")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+@cli.command("expire-payments")
+def expire_payments(
+    batch_size: Optional[int] = typer.Option(None, help="Payments processed per batch")
+):
+    """Expire overdue payments, safe to run on several workers at once"""
+
+    async def run():
+        client = get_client()
+        try:
+            report = await EnhancedPaymentService(client).cleanup_expired_payments(batch_size)
+            typer.echo(
+                f"Expired {report['expired']} payments in {report['batches']} batches "
+                f"({report['payments_per_second']} payments/s)"
+            )
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+@cli.command("rebuild-availability")
+def rebuild_availability(
+    since: Optional[datetime] = typer.Option(None, help="First day to rebuild, defaults to today")
+):
+    """Recompute teacher availability bitmaps from scheduled sessions"""
+
+    async def run():
+        client = get_client()
+        try:
+            sessions = await AvailabilityService(client).rebuild(since)
+            typer.echo(f"Rebuilt availability from {sessions} sessions")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+@cli.command("rebuild-expert-calendars")
+def rebuild_expert_calendars():
+    """Recreate expert calendars from the scheduled exams"""
+
+    async def run():
+        client = get_client()
+        try:
+            calendars = await ExpertAssignmentService(client).rebuild_calendars()
+            typer.echo(f"Rebuilt {calendars} expert calendar days")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+@cli.command("recompute-course-availability")
+def recompute_course_availability(
+    batch_size: int = typer.Option(1000, help="Enrollments per bulk write")
+):
+    """Re-apply the theory -> park -> road unlocking rules to every enrollment"""
+
+    async def run():
+        client = get_client()
+        try:
+            report = await CourseStateMachine(client).recompute_all_availability(batch_size)
+            typer.echo(f"Checked {report['enrollments']} enrollments, updated {report['modified']} courses")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+@cli.command("reconcile-ratings")
+def reconcile_ratings():
+    """Recompute school and teacher rating aggregates from reviews"""
+
+    async def run():
+        client = get_client()
+        try:
+            report = await RatingService(client).reconcile()
+            # Running API workers drop their cached school pages on the next version check
+            await ResponseCache(client).invalidate("schools")
+            typer.echo(f"Corrected {report['schools']} schools and {report['teachers']} teachers")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+@cli.command("repair-enrollment-status")
+def repair_enrollment_status(
+    dry_run: bool = typer.Option(False, "--dry-run", help="Report eligible enrollments without changing them"),
+    incremental: bool = typer.Option(False, "--incremental", help="Only look at changes since the last incremental run")
+):
+    """Move pending_documents enrollments whose documents are all accepted to pending_approval"""
+
+    async def run():
+        client = get_client()
+        try:
+            service = EnrollmentConsistencyService(client)
+            report = await (service.run_incremental(dry_run) if incremental else service.repair(dry_run=dry_run))
+            typer.echo(f"{report['eligible_enrollments']} eligible enrollments of {report['eligible_students']} students, "
+                       f"fixed {report['fixed_enrollments']} in {report['duration_ms']}ms")
+            for student in report["sample"]:
+                typer.echo(f"  {student['student_id']}: {', '.join(student['enrollment_ids'])}")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+@cli.command("rebuild-document-state")
+def rebuild_document_state(
+    batch_size: int = typer.Option(1000, help="Users per aggregation and bulk write")
+):
+    """Recompute every user's document_state from the documents collection"""
+
+    async def run():
+        client = get_client()
+        try:
+            report = await DocumentStateService(client).rebuild(batch_size)
+            typer.echo(f"Rebuilt document state of {report['users']} users")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,199 @@
+# Request Metrics for Driving School Platform
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_CALL_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+class RequestStats:
+    """DB activity of one request, filled in by the command listener"""
+
+    def __init__(self):
+        self.db_calls = 0
+        self.db_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        # Listener callbacks run on Motor's executor threads
+        with self._lock:
+            self.db_calls += 1
+            self.db_seconds += seconds
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labels, label_values)} {value}"
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._values.setdefault(label_values, [0] * (len(self.buckets) + 1) + [0.0])
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = _labels(self.labels, label_values, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            bucket_labels = _labels(self.labels, label_values, 'le="+Inf"')
+            yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, label_values)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.labels, label_values)} {cumulative}"
+
+class MetricsRegistry:
+    """Process wide request and MongoDB metrics in Prometheus text format"""
+
+    def __init__(self):
+        self.requests = Counter("http_requests_total", "HTTP requests", ("method", "route", "status"))
+        self.errors = Counter("http_request_errors_total", "HTTP requests answered with 5xx or an exception", ("method", "route"))
+        self.latency = Histogram("http_request_duration_seconds", "HTTP request latency", LATENCY_BUCKETS, ("method", "route"))
+        self.db_calls = Histogram("http_request_db_calls", "MongoDB commands per request", DB_CALL_BUCKETS, ("method", "route"))
+        self.db_time = Histogram("http_request_db_seconds", "MongoDB time per request", LATENCY_BUCKETS, ("method", "route"))
+        self.response_size = Histogram("http_response_size_bytes", "Response body size as sent", SIZE_BUCKETS, ("method", "route"))
+        self.commands = Counter("mongodb_commands_total", "MongoDB commands", ("command", "outcome"))
+        self.command_time = Counter("mongodb_command_seconds_total", "MongoDB command time", ("command",))
+        self._collectors = []
+
+    def add_collector(self, collector):
+        """Register a callable yielding extra exposition lines"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in (self.requests, self.errors, self.latency, self.db_calls,
+                       self.db_time, self.response_size, self.commands, self.command_time):
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+class DBCommandListener(monitoring.CommandListener):
+    """Attributes MongoDB commands to the request running them"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+
+    def _record(self, event, outcome: str):
+        seconds = event.duration_micros / 1_000_000
+        self.registry.commands.inc(event.command_name, outcome)
+        self.registry.command_time.inc(event.command_name, amount=seconds)
+        stats = _current_request.get()
+        if stats is not None:
+            stats.add(seconds)
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, "success")
+
+    def failed(self, event):
+        self._record(event, "failure")
+
+class MetricsMiddleware:
+    """Per-route latency, DB call and response size recording
+
+    Requests slower than METRICS_SLOW_REQUEST_MS or issuing more than
+    METRICS_MAX_DB_CALLS commands are logged with their route template.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+        self.slow_request_ms = float(os.environ.get('METRICS_SLOW_REQUEST_MS', '1000'))
+        self.max_db_calls = int(os.environ.get('METRICS_MAX_DB_CALLS', '50'))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        started = time.perf_counter()
+        response = {"status": 500, "size": 0}
+
+        async def measuring_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        failed = False
+        try:
+            await self.app(scope, receive, measuring_send)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _current_request.reset(token)
+            elapsed = time.perf_counter() - started
+            # Set on the shared scope by the router once a route matched
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or ("cached" if scope.get("http_cache_hit") else "unmatched")
+            method = scope["method"]
+
+            self.registry.requests.inc(method, route_path, str(response["status"]))
+            if failed or response["status"] >= 500:
+                self.registry.errors.inc(method, route_path)
+            self.registry.latency.observe(elapsed, method, route_path)
+            self.registry.db_calls.observe(stats.db_calls, method, route_path)
+            self.registry.db_time.observe(stats.db_seconds, method, route_path)
+            self.registry.response_size.observe(response["size"], method, route_path)
+
+            elapsed_ms = elapsed * 1000
+            if elapsed_ms > self.slow_request_ms or stats.db_calls > self.max_db_calls:
+                logger.warning(
+                    f"Slow request {method} {route_path}: {elapsed_ms:.0f}ms, "
+                    f"{stats.db_calls} DB calls ({stats.db_seconds * 1000:.0f}ms)"
+                )
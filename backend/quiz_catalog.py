@@ -0,0 +1,185 @@
+# Quiz Catalog Cache for Driving School Platform
+import os
+import time
+import asyncio
+import logging
+from typing import Optional, List, Dict, Tuple
+from pymongo import ReturnDocument
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Codes of a submitted answer that is not an option, and of a question without an answer key
+UNKNOWN_OPTION = -1
+NO_ANSWER_KEY = -2
+
+SUMMARY_FIELDS = (
+    "id", "course_type", "title", "description", "difficulty", "passing_score",
+    "time_limit_minutes", "is_active", "created_by", "created_at"
+)
+
+class QuizCatalog:
+    """In-process quiz cache kept in sync through a shared version document"""
+
+    def __init__(self, db_client):
+        self.db = db_client.driving_school_platform
+        self.check_interval = float(os.environ.get('QUIZ_CATALOG_CHECK_SECONDS', '5'))
+
+        self.version = None
+        self._quizzes: Dict[str, dict] = {}
+        self._summaries: List[dict] = []
+        self._answer_keys: Dict[str, np.ndarray] = {}
+        # quiz id -> {(question index, option): option code}
+        self._option_codes: Dict[str, Dict[Tuple[str, str], int]] = {}
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _current_version(self) -> int:
+        version_doc = await self.db.catalog_versions.find_one({"_id": "quizzes"})
+        return version_doc["version"] if version_doc else 0
+
+    def _is_fresh(self) -> bool:
+        return self.version is not None and time.monotonic() - self._checked_at < self.check_interval
+
+    async def _ensure_fresh(self, force: bool = False):
+        """Reload the catalog when another writer bumped the version"""
+        if not force and self._is_fresh():
+            return
+
+        async with self._lock:
+            if not force and self._is_fresh():
+                return
+
+            version = await self._current_version()
+            if version != self.version:
+                await self._load(version)
+            self._checked_at = time.monotonic()
+
+    async def _load(self, version: int):
+        quizzes = await self.db.quizzes.find({}, {"_id": 0}).sort("created_at", -1).to_list(length=None)
+
+        self._quizzes = {quiz["id"]: quiz for quiz in quizzes}
+        self._summaries = [self._summarize(quiz) for quiz in quizzes]
+        encoded = {quiz["id"]: self._encode_quiz(quiz) for quiz in quizzes}
+        self._answer_keys = {quiz_id: answer_key for quiz_id, (answer_key, _) in encoded.items()}
+        self._option_codes = {quiz_id: option_codes for quiz_id, (_, option_codes) in encoded.items()}
+        self.version = version
+
+        logger.info(f"Loaded quiz catalog version {version} ({len(quizzes)} quizzes)")
+
+    @staticmethod
+    def _summarize(quiz: dict) -> dict:
+        summary = {field: quiz.get(field) for field in SUMMARY_FIELDS}
+        summary["question_count"] = len(quiz.get("questions", []))
+        return summary
+
+    @staticmethod
+    def _encode_quiz(quiz: dict) -> Tuple[np.ndarray, Dict[Tuple[str, str], int]]:
+        """Answer key as option codes, and the code of every option of every question"""
+        questions = quiz.get("questions", [])
+        answer_key = np.full(len(questions), NO_ANSWER_KEY, dtype=np.int32)
+        option_codes = {}
+        for i, question in enumerate(questions):
+            options = list(question.get("options") or [])
+            correct_answer = question.get("correct_answer")
+            # A key outside the options still matches the same submitted value
+            if correct_answer is not None and correct_answer not in options:
+                options.append(correct_answer)
+            for code, option in enumerate(options):
+                if isinstance(option, str):
+                    option_codes.setdefault((str(i), option), code)
+            if correct_answer is not None:
+                answer_key[i] = option_codes.get((str(i), correct_answer), NO_ANSWER_KEY)
+        return answer_key, option_codes
+
+    async def invalidate(self) -> int:
+        """Bump the catalog version after a quiz write"""
+        version_doc = await self.db.catalog_versions.find_one_and_update(
+            {"_id": "quizzes"},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        # Force the next read in this process to reload
+        self._checked_at = 0.0
+        return version_doc["version"]
+
+    async def list_quizzes(
+        self,
+        course_type: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        created_by: Optional[str] = None,
+        active_only: bool = True
+    ) -> List[dict]:
+        """Quiz summaries without questions"""
+        await self._ensure_fresh()
+
+        return [
+            dict(summary) for summary in self._summaries
+            if (not active_only or summary["is_active"])
+            and (course_type is None or summary["course_type"] == course_type)
+            and (difficulty is None or summary["difficulty"] == difficulty)
+            and (created_by is None or summary["created_by"] == created_by)
+        ]
+
+    async def _lookup(self, quiz_id: str) -> Optional[dict]:
+        await self._ensure_fresh()
+
+        quiz = self._quizzes.get(quiz_id)
+        if not quiz:
+            # The quiz may have been created by another worker since the last check
+            await self._ensure_fresh(force=True)
+            quiz = self._quizzes.get(quiz_id)
+        return quiz
+
+    async def get_summary(self, quiz_id: str) -> Optional[dict]:
+        quiz = await self._lookup(quiz_id)
+        return self._summarize(quiz) if quiz else None
+
+    async def get_quiz(self, quiz_id: str, include_answers: bool = False) -> Optional[dict]:
+        """Full quiz with its questions, answers stripped unless requested"""
+        quiz = await self._lookup(quiz_id)
+        if not quiz:
+            return None
+
+        questions = quiz.get("questions", [])
+        if not include_answers:
+            questions = [
+                {key: value for key, value in question.items() if key != "correct_answer"}
+                for question in questions
+            ]
+
+        return {**self._summarize(quiz), "questions": questions}
+
+    async def grade(self, quiz_id: str, answers: dict) -> Optional[Tuple[int, int]]:
+        """Return (correct_answers, total_questions) against the precomputed answer key"""
+        correct_counts = await self.grade_many(quiz_id, [answers])
+        if correct_counts is None:
+            return None
+
+        return int(correct_counts[0]), self.question_count(quiz_id)
+
+    async def grade_many(self, quiz_id: str, answer_sets: List[dict]) -> Optional[np.ndarray]:
+        """Correct answer counts for several attempts of the same quiz"""
+        if not await self._lookup(quiz_id):
+            return None
+
+        answer_key = self._answer_keys[quiz_id]
+        option_codes = self._option_codes[quiz_id]
+        # Only the given answers are encoded, each with one lookup; the rest stay unknown
+        rows, columns, codes = [], [], []
+        for row, answers in enumerate(answer_sets):
+            for question, answer in answers.items():
+                code = option_codes.get((question, answer)) if isinstance(answer, str) else None
+                if code is not None:
+                    rows.append(row)
+                    columns.append(int(question))
+                    codes.append(code)
+        submitted = np.full((len(answer_sets), len(answer_key)), UNKNOWN_OPTION, dtype=np.int32)
+        submitted[rows, columns] = codes
+
+        # One integer comparison against the broadcast key for the whole batch
+        return np.count_nonzero(submitted == answer_key, axis=1)
+
+    def question_count(self, quiz_id: str) -> int:
+        return len(self._answer_keys[quiz_id])
@@ -0,0 +1,96 @@
+# Rating Aggregates for Driving School Platform
+import logging
+from typing import Dict
+from pymongo import UpdateOne, UpdateMany
+
+logger = logging.getLogger(__name__)
+
+RATING_VALUES = range(1, 6)
+
+class RatingService:
+    """Review counts, sums and histograms kept on schools and teachers"""
+
+    def __init__(self, db_client):
+        self.db = db_client.driving_school_platform
+
+    @staticmethod
+    def _increment_pipeline(rating: int) -> list:
+        # Documents rated before the aggregates existed only carry rating and total_reviews
+        previous_count = {"$ifNull": ["$rating_count", {"$ifNull": ["$total_reviews", 0]}]}
+        previous_sum = {"$ifNull": [
+            "$rating_sum",
+            {"$multiply": [{"$ifNull": ["$rating", 0]}, {"$ifNull": ["$total_reviews", 0]}]}
+        ]}
+        return [
+            {"$set": {
+                "rating_count": {"$add": [previous_count, 1]},
+                "rating_sum": {"$add": [previous_sum, rating]},
+                f"rating_histogram.{rating}": {"$add": [{"$ifNull": [f"$rating_histogram.{rating}", 0]}, 1]}
+            }},
+            {"$set": {
+                "total_reviews": "$rating_count",
+                "rating": {"$divide": ["$rating_sum", "$rating_count"]}
+            }}
+        ]
+
+    async def record_review(self, review: dict):
+        """Fold a new review into its school's and teacher's aggregates"""
+        pipeline = self._increment_pipeline(review["rating"])
+        await self.db.driving_schools.update_one({"id": review["driving_school_id"]}, pipeline)
+        if review.get("teacher_id"):
+            await self.db.teachers.update_one({"id": review["teacher_id"]}, pipeline)
+
+    @staticmethod
+    def summary(doc: dict) -> Dict:
+        """Rating figures of a school or teacher document"""
+        count = doc.get("rating_count", doc.get("total_reviews", 0))
+        histogram = doc.get("rating_histogram") or {}
+        return {
+            "total_reviews": count,
+            "average_rating": doc.get("rating", 0) if count else 0,
+            "rating_histogram": {str(value): histogram.get(str(value), 0) for value in RATING_VALUES}
+        }
+
+    async def _reconcile(self, collection, owner_field: str) -> int:
+        aggregates = await self.db.reviews.aggregate([
+            {"$match": {owner_field: {"$ne": None}}},
+            {"$group": {
+                "_id": {"owner": f"${owner_field}", "rating": "$rating"},
+                "count": {"$sum": 1}
+            }}
+        ]).to_list(length=None)
+
+        totals: Dict[str, dict] = {}
+        for row in aggregates:
+            owner = totals.setdefault(row["_id"]["owner"], {"count": 0, "sum": 0, "histogram": {}})
+            owner["count"] += row["count"]
+            owner["sum"] += row["_id"]["rating"] * row["count"]
+            owner["histogram"][str(row["_id"]["rating"])] = row["count"]
+
+        operations = [
+            UpdateOne({"id": owner_id}, {"$set": {
+                "rating_count": owner["count"],
+                "rating_sum": owner["sum"],
+                "rating_histogram": owner["histogram"],
+                "total_reviews": owner["count"],
+                "rating": owner["sum"] / owner["count"]
+            }})
+            for owner_id, owner in totals.items()
+        ]
+        # Owners whose reviews are all gone
+        operations.append(UpdateMany(
+            {"id": {"$nin": list(totals)}, "rating_count": {"$ne": 0}},
+            {"$set": {"rating_count": 0, "rating_sum": 0, "rating_histogram": {}, "total_reviews": 0, "rating": 0.0}}
+        ))
+
+        result = await collection.bulk_write(operations, ordered=False)
+        return result.modified_count
+
+    async def reconcile(self) -> Dict[str, int]:
+        """Recompute every aggregate from the reviews collection"""
+        report = {
+            "schools": await self._reconcile(self.db.driving_schools, "driving_school_id"),
+            "teachers": await self._reconcile(self.db.teachers, "teacher_id")
+        }
+        logger.info(f"Reconciled ratings: {report}")
+        return report
@@ -0,0 +1,187 @@
+# Session Scheduling Engine for Driving School Platform
+import os
+import bisect
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Tuple
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_SESSION_STATUSES = ["scheduled", "in_progress"]
+
+class ScheduleConflictError(Exception):
+    """Raised when a booking overlaps an existing session"""
+
+    def __init__(self, message: str, session_id: Optional[str] = None):
+        super().__init__(message)
+        self.session_id = session_id
+
+class IntervalIndex:
+    """Sessions of one participant sorted by start time"""
+
+    def __init__(self, loaded_from: datetime):
+        self.loaded_from = loaded_from
+        self.starts: List[datetime] = []
+        self.entries: List[Tuple[datetime, datetime, str]] = []
+        self.max_duration = timedelta(0)
+
+    def add(self, start: datetime, end: datetime, session_id: str):
+        position = bisect.bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.entries.insert(position, (start, end, session_id))
+        self.max_duration = max(self.max_duration, end - start)
+
+    def find_overlap(self, start: datetime, end: datetime) -> Optional[str]:
+        """Return the id of a session overlapping [start, end), if any"""
+        # Only sessions starting before `end` and no earlier than the longest
+        # session before `start` can overlap, so the scan stays short
+        position = bisect.bisect_left(self.starts, end) - 1
+        earliest = start - self.max_duration
+        while position >= 0 and self.starts[position] >= earliest:
+            entry_start, entry_end, session_id = self.entries[position]
+            if entry_end > start:
+                return session_id
+            position -= 1
+        return None
+
+class SessionScheduler:
+    """Conflict-checked session booking shared safely between workers
+
+    Each teacher and student has a version document in `schedule_locks`.
+    A booking is written first and then commits by advancing the versions
+    it read; if another worker advanced one in between, the booking is
+    rolled back and retried against a fresh view of the schedule.
+    """
+
+    def __init__(self, db_client):
+        self.db = db_client.driving_school_platform
+        self.cache_size = int(os.environ.get('SCHEDULE_CACHE_SIZE', '1000'))
+        self.max_retries = int(os.environ.get('SCHEDULE_MAX_RETRIES', '5'))
+        self.lookback = timedelta(hours=int(os.environ.get('SCHEDULE_LOOKBACK_HOURS', '24')))
+
+        self._indexes: "OrderedDict[str, Tuple[int, IntervalIndex]]" = OrderedDict()
+
+    async def ensure_indexes(self):
+        await self.db.sessions.create_index([("teacher_id", ASCENDING), ("scheduled_at", ASCENDING)])
+        await self.db.sessions.create_index([("student_id", ASCENDING), ("scheduled_at", ASCENDING)])
+
+    @staticmethod
+    def normalize(value: datetime) -> datetime:
+        """Naive UTC with millisecond precision, exactly as Mongo returns it"""
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+    @staticmethod
+    def _session_interval(session: dict) -> Tuple[datetime, datetime]:
+        start = session["scheduled_at"]
+        return start, start + timedelta(minutes=session.get("duration_minutes") or 0)
+
+    async def _read_version(self, lock_key: str) -> int:
+        lock = await self.db.schedule_locks.find_one({"_id": lock_key})
+        return lock["version"] if lock else 0
+
+    async def _advance_version(self, lock_key: str, expected: int) -> bool:
+        """Compare-and-set the participant version"""
+        try:
+            result = await self.db.schedule_locks.update_one(
+                {"_id": lock_key, "version": expected},
+                {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=(expected == 0)
+            )
+        except DuplicateKeyError:
+            return False
+        return result.modified_count == 1 or result.upserted_id is not None
+
+    async def _bump_version(self, lock_key: str):
+        await self.db.schedule_locks.update_one(
+            {"_id": lock_key},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def _get_index(self, field: str, owner_id: str, version: int, since: datetime) -> IntervalIndex:
+        """Cached interval index, reloaded when its version is stale"""
+        lock_key = f"{field}:{owner_id}"
+        cached = self._indexes.get(lock_key)
+        if cached and cached[0] == version and cached[1].loaded_from <= since:
+            self._indexes.move_to_end(lock_key)
+            return cached[1]
+
+        # Sessions starting up to `lookback` earlier may still run into the window
+        loaded_from = min(since, datetime.utcnow())
+        index = IntervalIndex(loaded_from)
+        sessions_cursor = self.db.sessions.find(
+            {
+                field: owner_id,
+                "status": {"$in": ACTIVE_SESSION_STATUSES},
+                "scheduled_at": {"$gte": loaded_from - self.lookback}
+            },
+            {"_id": 0, "id": 1, "scheduled_at": 1, "duration_minutes": 1}
+        ).sort("scheduled_at", ASCENDING)
+        async for session in sessions_cursor:
+            index.add(*self._session_interval(session), session["id"])
+
+        self._indexes[lock_key] = (version, index)
+        self._indexes.move_to_end(lock_key)
+        while len(self._indexes) > self.cache_size:
+            self._indexes.popitem(last=False)
+        return index
+
+    def _remember(self, lock_key: str, version: int, index: IntervalIndex):
+        if lock_key in self._indexes:
+            self._indexes[lock_key] = (version, index)
+
+    async def book(self, session_doc: dict):
+        """Insert a session unless the teacher or student is already busy"""
+        session_doc["scheduled_at"] = self.normalize(session_doc["scheduled_at"])
+        start, end = self._session_interval(session_doc)
+        participants = [("teacher_id", session_doc["teacher_id"]), ("student_id", session_doc["student_id"])]
+
+        for attempt in range(self.max_retries):
+            versions = {}
+            indexes = {}
+            for field, owner_id in participants:
+                lock_key = f"{field}:{owner_id}"
+                versions[lock_key] = await self._read_version(lock_key)
+                indexes[lock_key] = await self._get_index(field, owner_id, versions[lock_key], start)
+
+                conflict_id = indexes[lock_key].find_overlap(start, end)
+                if conflict_id:
+                    who = "Teacher" if field == "teacher_id" else "Student"
+                    raise ScheduleConflictError(f"{who} already has a session at this time", conflict_id)
+
+            await self.db.sessions.insert_one(session_doc)
+
+            committed = True
+            for lock_key, version in versions.items():
+                if not await self._advance_version(lock_key, version):
+                    committed = False
+                    break
+
+            if committed:
+                for lock_key, index in indexes.items():
+                    index.add(start, end, session_doc["id"])
+                    self._remember(lock_key, versions[lock_key] + 1, index)
+                return
+
+            # Another booking touched the same schedule, undo and retry. The versions
+            # move again so nobody keeps an index that saw the rolled back session
+            await self.db.sessions.delete_one({"id": session_doc["id"]})
+            session_doc.pop("_id", None)
+            for lock_key in versions:
+                await self._bump_version(lock_key)
+            logger.info(f"Schedule version conflict for session {session_doc['id']}, retry {attempt + 1}")
+
+        raise ScheduleConflictError("Schedule is busy, please try again")
+
+    async def release(self, session: dict):
+        """Forget a cancelled session so its slot can be booked again"""
+        for field in ("teacher_id", "student_id"):
+            lock_key = f"{field}:{session[field]}"
+            await self._bump_version(lock_key)
+            # Other workers reload on the version change, this one drops its copy
+            self._indexes.pop(lock_key, None)
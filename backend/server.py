@@ -11,9 +11,10 @@ from fastapi import FastAPI, HTTPException, status, Depends, UploadFile, File, F
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr
-from motor.motor_asyncio import AsyncIOMotorClient
-from passlib.context import CryptContext
+from pymongo import ASCENDING, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
 import jwt
 from enum import Enum
 import requests
@@ -27,8 +28,28 @@ from io import BytesIO
 import base64
 import sys
 import os
+import asyncio
 sys.path.append(os.path.dirname(__file__))
 
+from enhanced_payments import EnhancedPaymentService
+from quiz_catalog import QuizCatalog
+from scheduling import SessionScheduler, ScheduleConflictError
+from availability import AvailabilityService
+from expert_assignment import ExpertAssignmentService
+from course_state import CourseStateMachine
+from ratings import RatingService
+from dashboard import DashboardService
+from http_cache import ResponseCache, HTTPCacheMiddleware
+from shared_cache import SharedCache
+from compression import CompressionMiddleware, CompressionStats
+from metrics import MetricsRegistry, MetricsMiddleware, DBCommandListener
+from database import Database
+from accounts import ALGERIAN_STATES, pwd_context, hash_password, verify_password
+from user_import import UserImportService
+from exports import ExportService, EXPORT_COLUMNS, EXPORT_FORMATS
+from enrollment_consistency import EnrollmentConsistencyService
+from document_state import DocumentStateService
+
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -64,6 +85,62 @@ demo_uploads_dir = Path("demo-uploads")
 demo_uploads_dir.mkdir(exist_ok=True)
 app.mount("/demo-uploads", StaticFiles(directory="demo-uploads"), name="demo-uploads")
 
+# Metrics setup
+metrics_registry = MetricsRegistry()
+
+# Database setup, pool and timeouts come from MONGO_* environment variables
+database = Database(event_listeners=[DBCommandListener(metrics_registry)])
+client = database.client
+db = database.db
+analytics_db = database.analytics_db
+
+# Payment service setup
+payment_service = EnhancedPaymentService(client)
+PAYMENT_WEBHOOK_WORKER_ENABLED = os.environ.get('PAYMENT_WEBHOOK_WORKER_ENABLED', 'true').lower() == 'true'
+
+# Quiz catalog setup
+quiz_catalog = QuizCatalog(client)
+QUIZ_ATTEMPT_BATCH_LIMIT = int(os.environ.get('QUIZ_ATTEMPT_BATCH_LIMIT', '200'))
+
+# Session scheduling setup
+session_scheduler = SessionScheduler(client)
+availability_service = AvailabilityService(client)
+AVAILABILITY_MAX_DAYS = int(os.environ.get('AVAILABILITY_MAX_DAYS', '31'))
+
+# Exam expert assignment setup
+expert_assignment = ExpertAssignmentService(client)
+EXAM_DURATION_MINUTES = 90
+
+# Course progression setup
+course_state = CourseStateMachine(client)
+ENROLLMENT_DECISION_BATCH_LIMIT = int(os.environ.get('ENROLLMENT_DECISION_BATCH_LIMIT', '200'))
+
+# Rating aggregates setup
+rating_service = RatingService(client)
+
+# Dashboard setup
+dashboard_service = DashboardService(client)
+
+# Data export setup
+export_service = ExportService(client)
+
+# HTTP caching setup, inside CORS so cached responses get per-request CORS headers
+response_cache = ResponseCache(client)
+app.add_middleware(HTTPCacheMiddleware, cache=response_cache)
+
+# Shared cache setup. The memory backend only sees invalidations made in its own
+# worker, so deployments running more than one worker need CACHE_BACKEND=redis
+shared_cache = SharedCache()
+FILTER_STATS_CACHE_TTL_SECONDS = float(os.environ.get('FILTER_STATS_CACHE_TTL_SECONDS', '300'))
+ANALYTICS_CACHE_TTL_SECONDS = float(os.environ.get('ANALYTICS_CACHE_TTL_SECONDS', '60'))
+# Everything the school and teacher analytics are computed from
+ANALYTICS_CACHE_TAGS = ["schools", "enrollments", "teachers", "sessions"]
+
+async def invalidate_caches(*tags: str):
+    """Call after writing data that cached responses or values depend on"""
+    await response_cache.invalidate(*tags)
+    await shared_cache.invalidate(*tags)
+
 # CORS setup
 app.add_middleware(
     CORSMiddleware,
@@ -73,14 +150,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Database setup
-MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.driving_school_platform
+# Compression setup, outermost so every response leaves compressed
+compression_stats = CompressionStats()
+app.add_middleware(CompressionMiddleware, stats=compression_stats)
+
+# Request metrics, outermost so latency and sizes are what clients see
+app.add_middleware(MetricsMiddleware, registry=metrics_registry)
 
 # Security setup
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 ALGORITHM = "HS256"
 
@@ -100,6 +178,34 @@ cloudinary.config(
 async def health_check():
     return {"status": "healthy", "message": "Driving School Platform API is running"}
 
+@app.get("/ready")
+async def readiness_check():
+    readiness = await database.readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+@app.get("/metrics/compression")
+async def compression_metrics():
+    return compression_stats.as_dict()
+
+def compression_collector():
+    yield "# HELP http_compression_bytes_total Response bytes before and after compression"
+    yield "# TYPE http_compression_bytes_total counter"
+    for encoding, bytes_in in compression_stats.bytes_in.items():
+        yield f'http_compression_bytes_total{{encoding="{encoding}",stage="in"}} {bytes_in}'
+        yield f'http_compression_bytes_total{{encoding="{encoding}",stage="out"}} {compression_stats.bytes_out[encoding]}'
+
+metrics_registry.add_collector(compression_collector)
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    return shared_cache.stats.as_dict()
+
+metrics_registry.add_collector(shared_cache.collector)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # Enums
 class UserRole(str, Enum):
     GUEST = "guest"
@@ -205,6 +311,10 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
 class User(UserBase):
     id: str
     role: UserRole
@@ -277,6 +387,11 @@ class Enrollment(BaseModel):
 class EnrollmentCreate(BaseModel):
     school_id: str
 
+class EnrollmentBulkDecision(BaseModel):
+    action: str  # accept, reject or refuse
+    enrollment_ids: List[str]
+    reason: Optional[str] = None
+
 class Course(BaseModel):
     id: str
     enrollment_id: str
@@ -338,6 +453,17 @@ class QuizAttempt(BaseModel):
     completed_at: Optional[datetime] = None
     time_taken_minutes: Optional[int] = None
 
+class QuizAttemptSubmission(BaseModel):
+    quiz_id: str
+    answers: dict
+    idempotency_key: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    time_taken_minutes: Optional[int] = None
+
+class QuizAttemptBatch(BaseModel):
+    attempts: List[QuizAttemptSubmission]
+
 class VideoRoom(BaseModel):
     id: str
     course_id: str
@@ -469,23 +595,6 @@ class Review(BaseModel):
     comment: str
     created_at: datetime
 
-# Algerian States (58 wilayas)
-ALGERIAN_STATES = [
-    "Adrar", "Chlef", "Laghouat", "Oum El Bouaghi", "Batna", "Béjaïa", "Biskra", 
-    "Béchar", "Blida", "Bouira", "Tamanrasset", "Tébessa", "Tlemcen", "Tiaret", 
-    "Tizi Ouzou", "Alger", "Djelfa", "Jijel", "Sétif", "Saïda", "Skikda", 
-    "Sidi Bel Abbès", "Annaba", "Guelma", "Constantine", "Médéa", "Mostaganem", 
-    "M'Sila", "Mascara", "Ouargla", "Oran", "El Bayadh", "Illizi", 
-    "Bordj Bou Arréridj", "Boumerdès", "El Tarf", "Tindouf", "Tissemsilt", 
-    "El Oued", "Khenchela", "Souk Ahras", "Tipaza", "Mila", "Aïn Defla", 
-    "Naâma", "Aïn Témouchent", "Ghardaïa", "Relizane", "Timimoun", 
-    "Bordj Badji Mokhtar", "Ouled Djellal", "Béni Abbès", "In Salah", 
-    "In Guezzam", "Touggourt", "Djanet", "El M'Ghair", "El Meniaa"
-]
-
-# Course sequence order
-COURSE_SEQUENCE = [CourseType.THEORY, CourseType.PARK, CourseType.ROAD]
-
 # Required documents by role
 REQUIRED_DOCUMENTS = {
     UserRole.STUDENT: [DocumentType.PROFILE_PHOTO, DocumentType.ID_CARD, DocumentType.MEDICAL_CERTIFICATE, DocumentType.RESIDENCE_CERTIFICATE],
@@ -495,11 +604,17 @@ REQUIRED_DOCUMENTS = {
 }
 
 # Helper functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# Bulk user import setup
+user_import_service = UserImportService(client, hash_password, ALGERIAN_STATES, invalidate=invalidate_caches)
+
+# Document state setup
+document_states = DocumentStateService(
+    client, {role.value: [doc.value for doc in docs] for role, docs in REQUIRED_DOCUMENTS.items()}
+)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# Enrollment consistency setup
+enrollment_consistency = EnrollmentConsistencyService(client, [doc.value for doc in REQUIRED_DOCUMENTS[UserRole.STUDENT]])
+ENROLLMENT_CONSISTENCY_WORKER_ENABLED = os.environ.get('ENROLLMENT_CONSISTENCY_WORKER_ENABLED', 'true').lower() == 'true'
 
 def serialize_doc(doc):
     """Convert MongoDB document to JSON serializable format"""
@@ -533,7 +648,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_authenticated_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -547,193 +662,56 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
+async def get_current_user(user: dict = Depends(get_authenticated_user)):
+    # Imported users log in with a generated password and must replace it before anything else
+    if user.get("must_reset_password"):
+        raise HTTPException(status_code=403, detail="Password change required")
+    return user
+
 async def check_user_documents_complete(user_id: str, role: str) -> bool:
     """Check if user has uploaded and accepted all required documents"""
-    required_docs = REQUIRED_DOCUMENTS.get(role, [])
-    
-    documents_cursor = db.documents.find({
-        "user_id": user_id,
-        "status": "accepted",  # Changed from is_verified to status: accepted
-        "document_type": {"$in": [doc.value for doc in required_docs]}
-    })
-    documents = await documents_cursor.to_list(length=None)
-    
-    uploaded_types = {doc["document_type"] for doc in documents}
-    required_types = {doc.value for doc in required_docs}
-    
-    return required_types.issubset(uploaded_types)
+    states = await document_states.get_many([user_id])
+    return document_states.is_complete(states[user_id], role)
+
+async def documents_complete_for_users(user_ids: List[str], role: str) -> Dict[str, bool]:
+    """check_user_documents_complete for many users in a single query"""
+    states = await document_states.get_many(user_ids)
+    return {user_id: document_states.is_complete(states[user_id], role) for user_id in user_ids}
 
 async def check_user_documents_complete_enhanced(user_id: str, role: str) -> bool:
     """Enhanced check for user documents with additional validation and logging"""
     try:
         logger.info(f"Checking document completeness for user {user_id} with role {role}")
         
-        required_docs = REQUIRED_DOCUMENTS.get(role, [])
-        if not required_docs:
+        if not REQUIRED_DOCUMENTS.get(role, []):
             logger.warning(f"No required documents found for role {role}")
             return True
         
-        # Get all documents for this user
-        all_documents = await db.documents.find({"user_id": user_id}).to_list(length=None)
-        logger.info(f"Found {len(all_documents)} total documents for user {user_id}")
-        
-        # Filter for accepted documents of required types
-        accepted_documents = [
-            doc for doc in all_documents 
-            if doc.get("status") == "accepted" and doc.get("document_type") in [doc_type.value for doc_type in required_docs]
-        ]
-        logger.info(f"Found {len(accepted_documents)} accepted required documents")
-        
-        uploaded_types = {doc["document_type"] for doc in accepted_documents}
-        required_types = {doc.value for doc in required_docs}
-        
-        logger.info(f"Required types: {required_types}")
-        logger.info(f"Accepted types: {uploaded_types}")
-        
-        missing_types = required_types - uploaded_types
+        states = await document_states.get_many([user_id])
+        missing_types = document_states.missing_types(states[user_id], role)
         if missing_types:
             logger.info(f"Missing document types: {missing_types}")
             return False
         
-        # Double-check: ensure we have exactly one accepted document for each required type
-        for doc_type in required_types:
-            type_docs = [doc for doc in accepted_documents if doc["document_type"] == doc_type]
-            if len(type_docs) == 0:
-                logger.warning(f"No accepted document found for type {doc_type}")
-                return False
-            elif len(type_docs) > 1:
-                logger.info(f"Multiple documents found for type {doc_type}, using latest")
-        
         logger.info(f"All required documents are complete for user {user_id}")
         return True
         
     except Exception as e:
         logger.error(f"Error checking document completeness: {str(e)}")
-        # Fallback to original function
-        return await check_user_documents_complete(user_id, role)
+        # Fall back to rebuilding the state from the documents
+        states = await document_states.refresh([user_id])
+        return document_states.is_complete(states[user_id], role)
 
 async def ensure_enrollment_status_consistency(student_id: str):
     """Ensure enrollment status is consistent with document status"""
     try:
-        logger.info(f"Ensuring enrollment status consistency for student {student_id}")
-        
-        # Get student info
-        student = await db.users.find_one({"id": student_id})
-        if not student or student.get("role") != "student":
-            return
-        
-        # Get student's enrollments
-        enrollments = await db.enrollments.find({"student_id": student_id}).to_list(None)
-        
-        for enrollment in enrollments:
-            current_status = enrollment.get("enrollment_status")
-            
-            # Only check enrollments that are in pending_documents status
-            if current_status != EnrollmentStatus.PENDING_DOCUMENTS:
-                continue
-            
-            # Check if documents are complete
-            documents_complete = await check_user_documents_complete_enhanced(student_id, "student")
-            
-            if documents_complete:
-                logger.info(f"Documents are complete for enrollment {enrollment['id']}, updating status")
-                
-                # Update status to pending_approval
-                update_result = await db.enrollments.update_one(
-                    {"id": enrollment["id"]},
-                    {
-                        "$set": {
-                            "enrollment_status": EnrollmentStatus.PENDING_APPROVAL,
-                            "documents_completed_at": datetime.utcnow(),
-                            "status_corrected_at": datetime.utcnow()
-                        }
-                    }
-                )
-                
-                if update_result.modified_count > 0:
-                    logger.info(f"Corrected enrollment status for {enrollment['id']}")
-                    
-                    # Send notification
-                    notification_doc = {
-                        "id": str(uuid.uuid4()),
-                        "user_id": student_id,
-                        "type": "status_corrected",
-                        "title": "Enrollment Status Updated",
-                        "message": "Your enrollment status has been updated to pending approval after document verification.",
-                        "is_read": False,
-                        "created_at": datetime.utcnow()
-                    }
-                    await db.notifications.insert_one(notification_doc)
+        report = await enrollment_consistency.repair(student_ids=[student_id])
+        if report["fixed_enrollments"]:
+            logger.info(f"Corrected {report['fixed_enrollments']} enrollments for student {student_id}")
     
     except Exception as e:
         logger.error(f"Error ensuring enrollment status consistency: {str(e)}")
 
-async def update_course_availability(enrollment_id: str):
-    """Update course availability based on completion status"""
-    courses_cursor = db.courses.find({"enrollment_id": enrollment_id}).sort("course_type", 1)
-    courses = await courses_cursor.to_list(length=None)
-    
-    # Sort courses by sequence
-    course_order = {CourseType.THEORY: 0, CourseType.PARK: 1, CourseType.ROAD: 2}
-    courses.sort(key=lambda x: course_order[x["course_type"]])
-    
-    for i, course in enumerate(courses):
-        if i == 0:  # First course (theory) is always available
-            if course["status"] == CourseStatus.LOCKED:
-                await db.courses.update_one(
-                    {"id": course["id"]},
-                    {"$set": {"status": CourseStatus.AVAILABLE, "updated_at": datetime.utcnow()}}
-                )
-        else:
-            # Check if previous course is completed and exam passed
-            prev_course = courses[i-1]
-            if prev_course["exam_status"] == ExamStatus.PASSED:
-                if course["status"] == CourseStatus.LOCKED:
-                    await db.courses.update_one(
-                        {"id": course["id"]},
-                        {"$set": {"status": CourseStatus.AVAILABLE, "updated_at": datetime.utcnow()}}
-                    )
-            else:
-                # Lock the course if previous not completed
-                if course["status"] != CourseStatus.LOCKED:
-                    await db.courses.update_one(
-                        {"id": course["id"]},
-                        {"$set": {"status": CourseStatus.LOCKED, "updated_at": datetime.utcnow()}}
-                    )
-
-async def create_sequential_courses(enrollment_id: str):
-    """Create courses with proper sequential logic"""
-    courses = []
-    course_configs = [
-        {"type": CourseType.THEORY, "sessions": 10},
-        {"type": CourseType.PARK, "sessions": 5}, 
-        {"type": CourseType.ROAD, "sessions": 15}
-    ]
-    
-    for i, course_config in enumerate(course_configs):
-        course_id = str(uuid.uuid4())
-        # Only first course (theory) is available initially
-        initial_status = CourseStatus.AVAILABLE if i == 0 else CourseStatus.LOCKED
-        
-        course_doc = {
-            "id": course_id,
-            "enrollment_id": enrollment_id,
-            "course_type": course_config["type"],
-            "status": initial_status,
-            "teacher_id": None,
-            "scheduled_sessions": [],
-            "completed_sessions": 0,
-            "total_sessions": course_config["sessions"],
-            "exam_status": ExamStatus.NOT_AVAILABLE,
-            "exam_score": None,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-        courses.append(course_doc)
-    
-    await db.courses.insert_many(courses)
-    return courses
-
 # Cloudinary upload function
 async def upload_to_cloudinary(file: UploadFile, folder: str, resource_type: str = "auto"):
     """Upload file to Cloudinary"""
@@ -986,7 +964,7 @@ async def generate_student_analytics_chart(student_data: dict) -> str:
 async def calculate_student_metrics(student_id: str) -> dict:
     """Calculate comprehensive student metrics"""
     # Get student enrollments
-    enrollments_cursor = db.enrollments.find({"student_id": student_id})
+    enrollments_cursor = analytics_db.enrollments.find({"student_id": student_id})
     enrollments = await enrollments_cursor.to_list(length=None)
     
     metrics = {
@@ -1005,7 +983,7 @@ async def calculate_student_metrics(student_id: str) -> dict:
     
     for enrollment in enrollments:
         # Get courses for this enrollment
-        courses_cursor = db.courses.find({"enrollment_id": enrollment["id"]})
+        courses_cursor = analytics_db.courses.find({"enrollment_id": enrollment["id"]})
         courses = await courses_cursor.to_list(length=None)
         
         for course in courses:
@@ -1017,7 +995,7 @@ async def calculate_student_metrics(student_id: str) -> dict:
                 metrics["completed_courses"] += 1
         
         # Get quiz attempts
-        quiz_attempts_cursor = db.quiz_attempts.find({"student_id": student_id})
+        quiz_attempts_cursor = analytics_db.quiz_attempts.find({"student_id": student_id})
         quiz_attempts = await quiz_attempts_cursor.to_list(length=None)
         
         quiz_scores = [attempt["score"] for attempt in quiz_attempts]
@@ -1026,7 +1004,7 @@ async def calculate_student_metrics(student_id: str) -> dict:
         metrics["average_quiz_score"] = sum(quiz_scores) / len(quiz_scores) if quiz_scores else 0
         
         # Get sessions
-        sessions_cursor = db.sessions.find({"student_id": student_id})
+        sessions_cursor = analytics_db.sessions.find({"student_id": student_id})
         sessions = await sessions_cursor.to_list(length=None)
         
         attended_sessions = [s for s in sessions if s["status"] == "completed"]
@@ -1049,51 +1027,43 @@ async def calculate_student_metrics(student_id: str) -> dict:
         metrics["learning_time_hours"] = sum(metrics["learning_time"].values())
     
     # Get certificates
-    certificates_cursor = db.certificates.find({"student_id": student_id})
+    certificates_cursor = analytics_db.certificates.find({"student_id": student_id})
     certificates = await certificates_cursor.to_list(length=None)
     metrics["certificates_earned"] = len(certificates)
     
     return metrics
 
 @api_router.post("/admin/fix-enrollment-status")
-async def fix_enrollment_status(current_user = Depends(get_current_user)):
+async def fix_enrollment_status(
+    dry_run: bool = False,
+    incremental: bool = False,
+    current_user = Depends(get_current_user)
+):
     """Administrative endpoint to fix enrollment status inconsistencies"""
     try:
         # Only allow managers or system admin
         if current_user["role"] not in ["manager", "admin"]:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
         
-        logger.info(f"Admin {current_user['id']} triggered enrollment status fix")
+        logger.info(f"Admin {current_user['id']} triggered enrollment status fix (dry_run={dry_run}, incremental={incremental})")
         
-        # Find all students with pending_documents status
-        pending_enrollments = await db.enrollments.find({
-            "enrollment_status": EnrollmentStatus.PENDING_DOCUMENTS
-        }).to_list(None)
-        
-        fixed_count = 0
-        total_count = len(pending_enrollments)
-        
-        for enrollment in pending_enrollments:
-            student_id = enrollment["student_id"]
-            
-            # Check if documents are actually complete
-            documents_complete = await check_user_documents_complete_enhanced(student_id, "student")
-            
-            if documents_complete:
-                # Fix the status
-                await ensure_enrollment_status_consistency(student_id)
-                fixed_count += 1
-                logger.info(f"Fixed enrollment status for student {student_id}")
+        if incremental:
+            report = await enrollment_consistency.run_incremental(dry_run=dry_run)
+        else:
+            report = await enrollment_consistency.repair(dry_run=dry_run)
         
         return {
-            "message": f"Status fix completed",
-            "total_checked": total_count,
-            "fixed_count": fixed_count,
-            "fixed_enrollments": fixed_count
+            "message": "Status fix dry run completed" if dry_run else "Status fix completed",
+            "total_checked": report["eligible_enrollments"],
+            "fixed_count": report["fixed_enrollments"],
+            "fixed_enrollments": report["fixed_enrollments"],
+            "report": report
         }
     
     except Exception as e:
         logger.error(f"Error in fix enrollment status: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail="Failed to fix enrollment status")
 
 # API Routes
@@ -1168,13 +1138,13 @@ async def mark_notification_read(
 
 
 @api_router.get("/users/me")
-async def get_current_user_info(current_user: dict = Depends(get_current_user)):
+async def get_current_user_info(current_user: dict = Depends(get_authenticated_user)):
     """Get current authenticated user information"""
     user_data = {k: v for k, v in current_user.items() if k != "password_hash"}
     return serialize_doc(user_data)
 
 @api_router.get("/users/me")
-async def get_current_user_info(current_user: dict = Depends(get_current_user)):
+async def get_current_user_info(current_user: dict = Depends(get_authenticated_user)):
     """Get current authenticated user information"""
     user_data = {k: v for k, v in current_user.items() if k != "password_hash"}
     return serialize_doc(user_data)
@@ -1309,40 +1279,41 @@ async def login_user(user_data: UserLogin):
             raise e
         raise HTTPException(status_code=500, detail="Login failed")
 
+@api_router.post("/auth/change-password")
+async def change_password(
+    password_data: PasswordChange,
+    current_user: dict = Depends(get_authenticated_user)
+):
+    """Replace the current password, clearing the reset required after an import"""
+    try:
+        if not verify_password(password_data.current_password, current_user["password_hash"]):
+            raise HTTPException(status_code=400, detail="Current password is incorrect")
+        if password_data.new_password == password_data.current_password:
+            raise HTTPException(status_code=400, detail="New password must be different")
+        
+        await db.users.update_one(
+            {"id": current_user["id"]},
+            {"$set": {
+                "password_hash": hash_password(password_data.new_password),
+                "must_reset_password": False,
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        
+        return {"message": "Password changed successfully"}
+    
+    except Exception as e:
+        logger.error(f"Change password error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to change password")
+
 @api_router.get("/dashboard")
 async def get_dashboard_data(current_user: dict = Depends(get_current_user)):
     """Get dashboard data for the current user"""
     try:
-        dashboard_data = {
-            "user": serialize_doc(current_user),
-            "enrollments": [],
-            "documents": [],
-            "notifications": []
-        }
-        
-        # Get user's enrollments
-        enrollments_cursor = db.enrollments.find({"student_id": current_user["id"]})
-        enrollments = await enrollments_cursor.to_list(length=None)
-        
-        for enrollment in enrollments:
-            # Get school details
-            school = await db.driving_schools.find_one({"id": enrollment["driving_school_id"]})
-            enrollment_data = serialize_doc(enrollment)
-            if school:
-                enrollment_data["school_name"] = school["name"]
-                enrollment_data["school_address"] = school["address"]
-                enrollment_data["school_state"] = school["state"]
-            dashboard_data["enrollments"].append(enrollment_data)
-        
-        # Get user's documents
-        documents_cursor = db.documents.find({"user_id": current_user["id"]})
-        documents = await documents_cursor.to_list(length=None)
-        dashboard_data["documents"] = serialize_doc(documents)
-        
-        # Get user's notifications
-        notifications_cursor = db.notifications.find({"user_id": current_user["id"]}).sort("created_at", -1).limit(10)
-        notifications = await notifications_cursor.to_list(length=None)
-        dashboard_data["notifications"] = serialize_doc(notifications)
+        sections = await dashboard_service.overview(current_user)
+        dashboard_data = {"user": serialize_doc(current_user), **serialize_doc(sections)}
         
         return dashboard_data
     
@@ -1394,10 +1365,14 @@ async def upload_document(
         else:
             await db.documents.insert_one(document_data)
         
+        document_state = await document_states.record(
+            current_user["id"], document_type, existing_doc.get("status") if existing_doc else None, "accepted"
+        )
+        
         # Check if all required documents are uploaded and update enrollment status automatically
         if current_user["role"] == "student":
             # Check if all required documents are now uploaded
-            documents_complete = await check_user_documents_complete_enhanced(current_user["id"], "student")
+            documents_complete = document_states.is_complete(document_state, "student")
             
             if documents_complete:
                 # Update all enrollments with pending_documents status to pending_approval
@@ -1488,9 +1463,10 @@ async def enroll_in_school(
         }
         
         await db.enrollments.insert_one(enrollment_doc)
+        await invalidate_caches("enrollments")
         
         # Create initial courses (locked until documents are approved)
-        await create_sequential_courses(enrollment_doc["id"])
+        await course_state.create_sequential_courses(enrollment_doc["id"])
         
         return {
             "message": "Enrollment created successfully",
@@ -1619,56 +1595,63 @@ async def get_search_suggestions(q: str):
         logger.error(f"Error getting search suggestions: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get search suggestions")
 
+async def compute_filter_stats() -> dict:
+    """Price range, rating and state distributions over every school"""
+    # Get price range
+    price_stats = await db.driving_schools.aggregate([
+        {
+            "$group": {
+                "_id": None,
+                "min_price": {"$min": "$price"},
+                "max_price": {"$max": "$price"},
+                "avg_price": {"$avg": "$price"}
+            }
+        }
+    ]).to_list(length=1)
+    
+    # Get rating distribution
+    rating_stats = await db.driving_schools.aggregate([
+        {
+            "$group": {
+                "_id": {"$floor": "$rating"},
+                "count": {"$sum": 1}
+            }
+        },
+        {"$sort": {"_id": 1}}
+    ]).to_list(length=None)
+    
+    # Get state distribution
+    state_stats = await db.driving_schools.aggregate([
+        {
+            "$group": {
+                "_id": "$state",
+                "count": {"$sum": 1}
+            }
+        },
+        {"$sort": {"count": -1}}
+    ]).to_list(length=None)
+    
+    result = {
+        "price_range": {
+            "min": price_stats[0]["min_price"] if price_stats else 0,
+            "max": price_stats[0]["max_price"] if price_stats else 100000,
+            "average": price_stats[0]["avg_price"] if price_stats else 50000
+        },
+        "rating_distribution": {str(stat["_id"]): stat["count"] for stat in rating_stats},
+        "state_distribution": state_stats[:10],  # Top 10 states
+        "total_schools": await db.driving_schools.count_documents({})
+    }
+    
+    return result
+
 @api_router.get("/driving-schools/filters/stats")
 async def get_filter_stats():
     """Get statistics for filter options (price range, rating distribution)"""
     try:
-        # Get price range
-        price_stats = await db.driving_schools.aggregate([
-            {
-                "$group": {
-                    "_id": None,
-                    "min_price": {"$min": "$price"},
-                    "max_price": {"$max": "$price"},
-                    "avg_price": {"$avg": "$price"}
-                }
-            }
-        ]).to_list(length=1)
-        
-        # Get rating distribution
-        rating_stats = await db.driving_schools.aggregate([
-            {
-                "$group": {
-                    "_id": {"$floor": "$rating"},
-                    "count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"_id": 1}}
-        ]).to_list(length=None)
-        
-        # Get state distribution
-        state_stats = await db.driving_schools.aggregate([
-            {
-                "$group": {
-                    "_id": "$state",
-                    "count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"count": -1}}
-        ]).to_list(length=None)
-        
-        result = {
-            "price_range": {
-                "min": price_stats[0]["min_price"] if price_stats else 0,
-                "max": price_stats[0]["max_price"] if price_stats else 100000,
-                "average": price_stats[0]["avg_price"] if price_stats else 50000
-            },
-            "rating_distribution": {str(stat["_id"]): stat["count"] for stat in rating_stats},
-            "state_distribution": state_stats[:10],  # Top 10 states
-            "total_schools": await db.driving_schools.count_documents({})
-        }
-        
-        return result
+        # Computed once per worker fleet until a school changes or the TTL runs out
+        return await shared_cache.get_or_compute(
+            "filter_stats", compute_filter_stats, ttl=FILTER_STATS_CACHE_TTL_SECONDS, tags=["schools"]
+        )
     
     except Exception as e:
         logger.error(f"Error getting filter stats: {str(e)}")
@@ -1711,6 +1694,7 @@ async def create_enrollment(
         }
         
         await db.enrollments.insert_one(enrollment_doc)
+        await invalidate_caches("enrollments")
         
         # Update user role to student if they were a guest
         if current_user["role"] == "guest":
@@ -1720,7 +1704,7 @@ async def create_enrollment(
             )
         
         # Create sequential courses for the enrollment
-        await create_sequential_courses(enrollment_id)
+        await course_state.create_sequential_courses(enrollment_id)
         
         return {
             "message": "Enrollment successful! Please upload required documents for approval.",
@@ -1809,13 +1793,11 @@ async def upload_document(
         }
         
         await db.documents.insert_one(document_doc)
+        document_state = await document_states.record(current_user["id"], document_type, None, "pending")
         
         # Check if all required documents are uploaded and update enrollment status
         if current_user["role"] == "student":
-            documents_complete = await check_user_documents_complete(
-                current_user["id"], 
-                "student"
-            )
+            documents_complete = document_states.is_complete(document_state, "student")
             
             if documents_complete:
                 # Update pending enrollments to pending_approval status
@@ -1863,26 +1845,27 @@ async def get_pending_enrollments(current_user = Depends(get_current_user)):
         if not school:
             raise HTTPException(status_code=404, detail="No driving school found for this manager")
         
-        # Get all enrollments for the school
-        enrollments_cursor = db.enrollments.find({
-            "driving_school_id": school["id"]
-        }).sort("created_at", -1)
-        enrollments = await enrollments_cursor.to_list(length=None)
+        # Get all enrollments for the school with their students joined in
+        enrollments = await db.enrollments.aggregate([
+            {"$match": {"driving_school_id": school["id"]}},
+            {"$sort": {"created_at": -1}},
+            {"$lookup": {"from": "users", "localField": "student_id", "foreignField": "id", "as": "students"}}
+        ]).to_list(length=None)
+        
+        # Check if documents are verified, for all students at once
+        documents_complete = await documents_complete_for_users(
+            list({enrollment["student_id"] for enrollment in enrollments}),
+            "student"
+        )
         
-        # Get student information for each enrollment
         for enrollment in enrollments:
-            student = await db.users.find_one({"id": enrollment["student_id"]})
-            if student:
+            students = enrollment.pop("students")
+            if students:
+                student = students[0]
                 enrollment["student_name"] = f"{student['first_name']} {student['last_name']}"
                 enrollment["student_email"] = student["email"]
                 enrollment["student_phone"] = student["phone"]
-                
-                # Check if documents are verified
-                documents_complete = await check_user_documents_complete(
-                    enrollment["student_id"], 
-                    "student"
-                )
-                enrollment["documents_verified"] = documents_complete
+                enrollment["documents_verified"] = documents_complete[enrollment["student_id"]]
         
         return {"enrollments": serialize_doc(enrollments)}
     
@@ -1980,6 +1963,41 @@ async def get_student_details_for_approval(
         raise HTTPException(status_code=500, detail="Failed to get student details")
 
 # NEW APPROVAL SYSTEM: Accept student enrollment (replaces old approve function)
+def enrollment_decision_notification(action: str, enrollment: dict, school: dict, manager: dict, reason: str = "") -> dict:
+    """Notification telling a student about an accept, reject or refuse decision"""
+    if action == "accept":
+        notification_type = NotificationType.ENROLLMENT_APPROVED
+        title = "Enrollment Accepted - You Can Start Learning!"
+        message = f"Congratulations! Your enrollment at {school['name']} has been accepted. You are now an official student and can start your lessons immediately!"
+        metadata = {"enrollment_id": enrollment["id"], "school_name": school["name"], "action": "accepted"}
+    elif action == "reject":
+        notification_type = NotificationType.ENROLLMENT_REJECTED
+        title = "Enrollment Rejected"
+        message = f"Your enrollment at {school['name']} was rejected. Reason: {reason}"
+        metadata = {"enrollment_id": enrollment["id"], "school_name": school["name"], "reason": reason}
+    else:
+        notification_type = NotificationType.ENROLLMENT_REJECTED
+        title = "Enrollment Refused"
+        message = f"Your enrollment at {school['name']} has been refused. Reason: {reason}"
+        metadata = {
+            "enrollment_id": enrollment["id"],
+            "school_name": school["name"],
+            "rejection_reason": reason,
+            "action": "refused",
+            "manager_name": f"{manager.get('first_name', '')} {manager.get('last_name', '')}".strip()
+        }
+    
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": enrollment["student_id"],
+        "type": notification_type,
+        "title": title,
+        "message": message,
+        "is_read": False,
+        "metadata": metadata,
+        "created_at": datetime.utcnow()
+    }
+
 @api_router.post("/manager/enrollments/{enrollment_id}/accept")
 async def accept_student_enrollment(
     enrollment_id: str,
@@ -2004,14 +2022,10 @@ async def accept_student_enrollment(
             raise HTTPException(status_code=403, detail="Unauthorized to accept this enrollment")
         
         # Verify all required documents are uploaded and have acceptable status
-        required_docs = REQUIRED_DOCUMENTS.get("student", [])
-        all_documents = await db.documents.find({"user_id": enrollment["student_id"]}).to_list(length=None)
+        required_types = [doc.value for doc in REQUIRED_DOCUMENTS.get("student", [])]
+        states = await document_states.get_many([enrollment["student_id"]])
         
-        # Check if student has uploaded all required documents
-        uploaded_types = {doc["document_type"] for doc in all_documents}
-        required_types = {doc.value for doc in required_docs}
-        
-        if not required_types.issubset(uploaded_types):
+        if document_states.missing_types(states[enrollment["student_id"]], "student", uploaded=True):
             raise HTTPException(status_code=400, detail="Student has not uploaded all required documents")
         
         # Accept the enrollment
@@ -2027,43 +2041,30 @@ async def accept_student_enrollment(
         )
         
         # Mark all student documents as accepted
-        for doc_type in required_types:
-            await db.documents.update_many(
-                {
-                    "user_id": enrollment["student_id"],
-                    "document_type": doc_type,
-                    "status": {"$in": ["pending", "refused"]}
-                },
-                {
-                    "$set": {
-                        "status": "accepted",
-                        "is_verified": True,
-                        "approved_at": datetime.utcnow(),
-                        "approved_by": current_user["id"],
-                        "refusal_reason": None
-                    }
+        await db.documents.update_many(
+            {
+                "user_id": enrollment["student_id"],
+                "document_type": {"$in": required_types},
+                "status": {"$in": ["pending", "refused"]}
+            },
+            {
+                "$set": {
+                    "status": "accepted",
+                    "is_verified": True,
+                    "approved_at": datetime.utcnow(),
+                    "approved_by": current_user["id"],
+                    "refusal_reason": None
                 }
-            )
+            }
+        )
+        await document_states.refresh([enrollment["student_id"]])
         
         # Update course availability - student can now start lessons
-        await update_course_availability(enrollment_id)
+        await course_state.update_availability([enrollment_id])
         
         # Send notification to student
-        notification_doc = {
-            "id": str(uuid.uuid4()),
-            "user_id": enrollment["student_id"],
-            "type": NotificationType.ENROLLMENT_APPROVED,
-            "title": "Enrollment Accepted - You Can Start Learning!",
-            "message": f"Congratulations! Your enrollment at {school['name']} has been accepted. You are now an official student and can start your lessons immediately!",
-            "is_read": False,
-            "metadata": {
-                "enrollment_id": enrollment_id, 
-                "school_name": school["name"],
-                "action": "accepted"
-            },
-            "created_at": datetime.utcnow()
-        }
-        await db.notifications.insert_one(notification_doc)
+        await db.notifications.insert_one(enrollment_decision_notification("accept", enrollment, school, current_user))
+        await invalidate_caches("enrollments")
         
         return {
             "message": "Student enrollment accepted successfully",
@@ -2108,17 +2109,8 @@ async def reject_enrollment(
         )
         
         # Send notification to student
-        notification_doc = {
-            "id": str(uuid.uuid4()),
-            "user_id": enrollment["student_id"],
-            "type": NotificationType.ENROLLMENT_REJECTED,
-            "title": "Enrollment Rejected",
-            "message": f"Your enrollment at {school['name']} was rejected. Reason: {reason}",
-            "is_read": False,
-            "metadata": {"enrollment_id": enrollment_id, "school_name": school["name"], "reason": reason},
-            "created_at": datetime.utcnow()
-        }
-        await db.notifications.insert_one(notification_doc)
+        await db.notifications.insert_one(enrollment_decision_notification("reject", enrollment, school, current_user, reason))
+        await invalidate_caches("enrollments")
         
         return {"message": "Enrollment rejected"}
     
@@ -2235,25 +2227,13 @@ async def refuse_student_enrollment(
                 }
             }
         )
+        await document_states.refresh([enrollment["student_id"]])
         
         # Send detailed notification to student
-        notification_doc = {
-            "id": str(uuid.uuid4()),
-            "user_id": enrollment["student_id"],
-            "type": NotificationType.ENROLLMENT_REJECTED,
-            "title": "Enrollment Refused",
-            "message": f"Your enrollment at {school['name']} has been refused. Reason: {reason.strip()}",
-            "is_read": False,
-            "metadata": {
-                "enrollment_id": enrollment_id,
-                "school_name": school["name"],
-                "rejection_reason": reason.strip(),
-                "action": "refused",
-                "manager_name": f"{current_user.get('first_name', '')} {current_user.get('last_name', '')}".strip()
-            },
-            "created_at": datetime.utcnow()
-        }
-        await db.notifications.insert_one(notification_doc)
+        await db.notifications.insert_one(
+            enrollment_decision_notification("refuse", enrollment, school, current_user, reason.strip())
+        )
+        await invalidate_caches("enrollments")
         
         return {
             "message": "Student enrollment refused successfully",
@@ -2268,6 +2248,154 @@ async def refuse_student_enrollment(
             raise e
         raise HTTPException(status_code=500, detail="Failed to refuse enrollment")
 
+@api_router.post("/manager/enrollments/bulk-decision")
+async def bulk_enrollment_decision(
+    decision: EnrollmentBulkDecision,
+    current_user = Depends(get_current_user)
+):
+    """Accept, reject or refuse many enrollments with set-based reads and bulk writes"""
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can decide on enrollments")
+        
+        if decision.action not in ["accept", "reject", "refuse"]:
+            raise HTTPException(status_code=400, detail="Action must be accept, reject or refuse")
+        
+        reason = (decision.reason or "").strip()
+        if decision.action in ["reject", "refuse"] and not reason:
+            raise HTTPException(status_code=400, detail="A reason is required to reject or refuse enrollments")
+        
+        enrollment_ids = list(dict.fromkeys(decision.enrollment_ids))
+        if len(enrollment_ids) > ENROLLMENT_DECISION_BATCH_LIMIT:
+            raise HTTPException(status_code=400, detail=f"At most {ENROLLMENT_DECISION_BATCH_LIMIT} enrollments per request")
+        
+        target_status = EnrollmentStatus.APPROVED if decision.action == "accept" else EnrollmentStatus.REJECTED
+        
+        schools = await db.driving_schools.find({"manager_id": current_user["id"]}).to_list(length=None)
+        schools_by_id = {school["id"]: school for school in schools}
+        enrollments = await db.enrollments.find({"id": {"$in": enrollment_ids}}).to_list(length=None)
+        enrollments_by_id = {enrollment["id"]: enrollment for enrollment in enrollments}
+        
+        # Document state of every student in the batch
+        required_types = [doc.value for doc in REQUIRED_DOCUMENTS.get("student", [])]
+        document_state_by_student = {}
+        if decision.action == "accept":
+            document_state_by_student = await document_states.get_many(enrollment["student_id"] for enrollment in enrollments)
+        
+        results = []
+        decided = []
+        decided_results = {}
+        for enrollment_id in enrollment_ids:
+            enrollment = enrollments_by_id.get(enrollment_id)
+            if not enrollment:
+                results.append({"enrollment_id": enrollment_id, "status": "not_found"})
+            elif enrollment["driving_school_id"] not in schools_by_id:
+                results.append({"enrollment_id": enrollment_id, "status": "forbidden"})
+            elif enrollment["enrollment_status"] == target_status:
+                results.append({"enrollment_id": enrollment_id, "status": "unchanged", "student_id": enrollment["student_id"]})
+            elif decision.action == "accept" and document_states.missing_types(
+                document_state_by_student[enrollment["student_id"]], "student", uploaded=True
+            ):
+                results.append({
+                    "enrollment_id": enrollment_id,
+                    "status": "missing_documents",
+                    "student_id": enrollment["student_id"],
+                    "missing": document_states.missing_types(
+                        document_state_by_student[enrollment["student_id"]], "student", uploaded=True
+                    )
+                })
+            else:
+                decided.append(enrollment)
+                decided_results[enrollment_id] = {
+                    "enrollment_id": enrollment_id,
+                    "status": {"accept": "accepted", "reject": "rejected", "refuse": "refused"}[decision.action],
+                    "student_id": enrollment["student_id"]
+                }
+                results.append(decided_results[enrollment_id])
+        
+        if decided:
+            now = datetime.utcnow()
+            run_id = str(uuid.uuid4())
+            
+            if decision.action == "accept":
+                enrollment_update = {"enrollment_status": EnrollmentStatus.APPROVED, "approved_at": now, "approved_by": current_user["id"]}
+            elif decision.action == "reject":
+                enrollment_update = {"enrollment_status": EnrollmentStatus.REJECTED}
+            else:
+                enrollment_update = {
+                    "enrollment_status": EnrollmentStatus.REJECTED,
+                    "rejected_at": now,
+                    "rejected_by": current_user["id"],
+                    "rejection_reason": reason
+                }
+            enrollment_update["decision_run"] = run_id
+            # Each write expects the status read above, so a decision made meanwhile by
+            # another request is not overwritten
+            await db.enrollments.bulk_write([
+                UpdateOne(
+                    {"id": enrollment["id"], "enrollment_status": enrollment["enrollment_status"]},
+                    {"$set": enrollment_update}
+                )
+                for enrollment in decided
+            ], ordered=False)
+            
+            # Documents and notifications follow only the enrollments this call moved
+            moved_ids = set(await db.enrollments.distinct("id", {"id": {"$in": list(decided_results)}, "decision_run": run_id}))
+            for enrollment in decided:
+                if enrollment["id"] not in moved_ids:
+                    decided_results[enrollment["id"]]["status"] = "conflict"
+            decided = [enrollment for enrollment in decided if enrollment["id"] in moved_ids]
+            decided_ids = [enrollment["id"] for enrollment in decided]
+            student_ids = list({enrollment["student_id"] for enrollment in decided})
+        
+        if decided:
+            if decision.action == "accept":
+                await db.documents.bulk_write([UpdateMany(
+                    {
+                        "user_id": {"$in": student_ids},
+                        "document_type": {"$in": required_types},
+                        "status": {"$in": ["pending", "refused"]}
+                    },
+                    {"$set": {"status": "accepted", "is_verified": True, "approved_at": now, "approved_by": current_user["id"], "refusal_reason": None}}
+                )], ordered=False)
+                
+                # Students can now start lessons
+                await course_state.update_availability(decided_ids)
+            elif decision.action == "refuse":
+                await db.documents.bulk_write([UpdateMany(
+                    {"user_id": {"$in": student_ids}, "status": "pending"},
+                    {"$set": {
+                        "status": "refused",
+                        "is_verified": False,
+                        "refusal_reason": f"Enrollment rejected: {reason}",
+                        "refused_at": now,
+                        "refused_by": current_user["id"]
+                    }}
+                )], ordered=False)
+            
+            if decision.action in ["accept", "refuse"]:
+                await document_states.refresh(student_ids)
+            
+            await db.notifications.insert_many([
+                enrollment_decision_notification(
+                    decision.action, enrollment, schools_by_id[enrollment["driving_school_id"]], current_user, reason
+                )
+                for enrollment in decided
+            ])
+            await invalidate_caches("enrollments")
+        
+        return {
+            "action": decision.action,
+            "processed": len(decided),
+            "results": results
+        }
+    
+    except Exception as e:
+        logger.error(f"Bulk enrollment decision error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to apply enrollment decisions")
+
 # NEW APPROVAL SYSTEM: Get student documents for viewing
 @api_router.get("/manager/student-documents/{student_id}")
 async def get_student_documents_for_manager(
@@ -2387,18 +2515,13 @@ async def reject_document(
             raise HTTPException(status_code=403, detail="Unauthorized to reject this document")
         
         # Reject document
-        await db.documents.update_one(
-            {"id": document_id},
-            {
-                "$set": {
-                    "status": "refused",
-                    "is_verified": False,
-                    "refusal_reason": reason,
-                    "rejected_at": datetime.utcnow(),
-                    "rejected_by": current_user["id"]
-                }
-            }
-        )
+        await document_states.transition(document_id, {
+            "status": "refused",
+            "is_verified": False,
+            "refusal_reason": reason,
+            "rejected_at": datetime.utcnow(),
+            "rejected_by": current_user["id"]
+        })
         
         # Update enrollment status back to pending_documents if it was pending_approval
         await db.enrollments.update_many(
@@ -2469,6 +2592,7 @@ async def create_driving_school(
         }
         
         await db.driving_schools.insert_one(school_doc)
+        await invalidate_caches("schools")
         
         return {"id": school_id, "message": "Driving school created successfully"}
     
@@ -2528,6 +2652,7 @@ async def update_driving_school(
             {"id": school_id},
             {"$set": update_data}
         )
+        await invalidate_caches("schools")
         
         return {"message": "Driving school updated successfully"}
     
@@ -2571,6 +2696,7 @@ async def upload_school_photo(
                 {"id": school_id},
                 {"$push": {"photos": upload_result["file_url"]}}
             )
+        await invalidate_caches("schools")
         
         return {
             "message": f"School {photo_type} uploaded successfully",
@@ -2668,6 +2794,7 @@ async def add_teacher(
         }
         
         await db.teachers.insert_one(teacher_doc)
+        await invalidate_caches("teachers")
         
         # Update user role to teacher (if not already)
         if teacher_user["role"] != "teacher":
@@ -2762,6 +2889,7 @@ async def approve_teacher(
             {"id": teacher_id},
             {"$set": {"is_approved": True}}
         )
+        await invalidate_caches("teachers")
         
         return {"message": "Teacher approved successfully"}
     
@@ -2771,6 +2899,88 @@ async def approve_teacher(
             raise e
         raise HTTPException(status_code=500, detail="Failed to approve teacher")
 
+class WorkingHoursUpdate(BaseModel):
+    working_hours: Dict[str, List[List[str]]]
+
+@api_router.put("/teachers/{teacher_id}/working-hours")
+async def update_working_hours(
+    teacher_id: str,
+    hours_data: WorkingHoursUpdate,
+    current_user = Depends(get_current_user)
+):
+    try:
+        teacher = await db.teachers.find_one({"id": teacher_id})
+        if not teacher:
+            raise HTTPException(status_code=404, detail="Teacher not found")
+        
+        # Teachers manage their own hours, managers those of their school
+        if current_user["role"] == "teacher":
+            if teacher["user_id"] != current_user["id"]:
+                raise HTTPException(status_code=403, detail="Unauthorized to update this teacher")
+        elif current_user["role"] == "manager":
+            school = await db.driving_schools.find_one({
+                "id": teacher["driving_school_id"],
+                "manager_id": current_user["id"]
+            })
+            if not school:
+                raise HTTPException(status_code=403, detail="Unauthorized to update this teacher")
+        else:
+            raise HTTPException(status_code=403, detail="Only teachers and managers can update working hours")
+        
+        working_hours = AvailabilityService.validate_working_hours(hours_data.working_hours)
+        await db.teachers.update_one(
+            {"id": teacher_id},
+            {"$set": {"working_hours": working_hours}}
+        )
+        
+        return {"message": "Working hours updated successfully", "working_hours": working_hours}
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Update working hours error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to update working hours")
+
+@api_router.get("/schools/{school_id}/availability")
+async def get_school_availability(
+    school_id: str,
+    date_from: str,
+    date_to: Optional[str] = None,
+    duration_minutes: int = 60,
+    gender: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    """Free start times per teacher of a school for a session of the given length"""
+    try:
+        start_day = datetime.fromisoformat(date_from)
+        end_day = datetime.fromisoformat(date_to) if date_to else start_day
+        if end_day < start_day:
+            raise HTTPException(status_code=400, detail="date_to must not be before date_from")
+        if (end_day - start_day).days >= AVAILABILITY_MAX_DAYS:
+            raise HTTPException(status_code=400, detail=f"At most {AVAILABILITY_MAX_DAYS} days per search")
+        if duration_minutes <= 0:
+            raise HTTPException(status_code=400, detail="duration_minutes must be positive")
+        
+        # Students only see teachers allowed to teach them
+        if current_user["role"] == "student":
+            gender = current_user.get("gender")
+        
+        availability = await availability_service.find_free_slots(
+            school_id, start_day, end_day, duration_minutes, student_gender=gender
+        )
+        
+        return {"school_id": school_id, "duration_minutes": duration_minutes, "availability": availability}
+    
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in ISO format")
+    except Exception as e:
+        logger.error(f"Get school availability error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve availability")
+
 # QUIZ SYSTEM ENDPOINTS
 
 @api_router.post("/quizzes")
@@ -2799,6 +3009,7 @@ async def create_quiz(
         }
         
         await db.quizzes.insert_one(quiz_doc)
+        await quiz_catalog.invalidate()
         
         return {"quiz_id": quiz_id, "message": "Quiz created successfully"}
     
@@ -2815,15 +3026,7 @@ async def get_quizzes(
     current_user = Depends(get_current_user)
 ):
     try:
-        query = {"is_active": True}
-        
-        if course_type:
-            query["course_type"] = course_type
-        if difficulty:
-            query["difficulty"] = difficulty
-        
-        quizzes_cursor = db.quizzes.find(query)
-        quizzes = await quizzes_cursor.to_list(length=None)
+        quizzes = await quiz_catalog.list_quizzes(course_type=course_type, difficulty=difficulty)
         
         return serialize_doc(quizzes)
     
@@ -2844,19 +3047,12 @@ async def take_quiz(
             raise HTTPException(status_code=403, detail="Only students can take quizzes")
         
         # Get quiz
-        quiz = await db.quizzes.find_one({"id": quiz_id, "is_active": True})
-        if not quiz:
+        quiz = await quiz_catalog.get_summary(quiz_id)
+        if not quiz or not quiz["is_active"]:
             raise HTTPException(status_code=404, detail="Quiz not found")
         
         # Calculate score
-        total_questions = len(quiz["questions"])
-        correct_answers = 0
-        
-        for i, question in enumerate(quiz["questions"]):
-            student_answer = answers.get(str(i))
-            correct_answer = question["correct_answer"]
-            if student_answer == correct_answer:
-                correct_answers += 1
+        correct_answers, total_questions = await quiz_catalog.grade(quiz_id, answers)
         
         score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
         passed = score >= quiz["passing_score"]
@@ -2891,6 +3087,125 @@ async def take_quiz(
             raise e
         raise HTTPException(status_code=500, detail="Failed to take quiz")
 
+def _attempt_result(index: int, result_status: str, attempt: dict = None, idempotency_key: str = None) -> dict:
+    result = {"index": index, "idempotency_key": idempotency_key, "status": result_status}
+    if attempt:
+        result.update({
+            "attempt_id": attempt["id"],
+            "quiz_id": attempt["quiz_id"],
+            "score": attempt["score"],
+            "passed": attempt["passed"],
+            "correct_answers": attempt.get("correct_answers"),
+            "total_questions": attempt.get("total_questions")
+        })
+    return result
+
+@api_router.post("/quizzes/attempts/batch")
+async def submit_quiz_attempts(
+    batch: QuizAttemptBatch,
+    current_user = Depends(get_current_user)
+):
+    """Grade and store many quiz attempts at once, used by offline sync"""
+    try:
+        if current_user["role"] != "student":
+            raise HTTPException(status_code=403, detail="Only students can take quizzes")
+        if len(batch.attempts) > QUIZ_ATTEMPT_BATCH_LIMIT:
+            raise HTTPException(status_code=400, detail=f"At most {QUIZ_ATTEMPT_BATCH_LIMIT} attempts per batch")
+        
+        student_id = current_user["id"]
+        results = [None] * len(batch.attempts)
+        
+        # Attempts already stored by an earlier sync are answered from the stored copy
+        keys = list({attempt.idempotency_key for attempt in batch.attempts if attempt.idempotency_key})
+        existing = {}
+        if keys:
+            existing_cursor = db.quiz_attempts.find({"student_id": student_id, "idempotency_key": {"$in": keys}})
+            existing = {attempt["idempotency_key"]: attempt async for attempt in existing_cursor}
+        
+        pending_by_quiz = {}
+        first_index_by_key = {}
+        for index, attempt in enumerate(batch.attempts):
+            key = attempt.idempotency_key
+            if key and (key in existing or key in first_index_by_key):
+                continue
+            if key:
+                first_index_by_key[key] = index
+            pending_by_quiz.setdefault(attempt.quiz_id, []).append(index)
+        
+        # Grade each quiz's attempts together
+        now = datetime.utcnow()
+        new_attempts = []
+        for quiz_id, indexes in pending_by_quiz.items():
+            quiz = await quiz_catalog.get_summary(quiz_id)
+            if not quiz or not quiz["is_active"]:
+                for index in indexes:
+                    results[index] = _attempt_result(index, "not_found", idempotency_key=batch.attempts[index].idempotency_key)
+                continue
+            
+            correct_counts = await quiz_catalog.grade_many(quiz_id, [batch.attempts[index].answers for index in indexes])
+            total_questions = quiz_catalog.question_count(quiz_id)
+            
+            for index, correct_answers in zip(indexes, correct_counts.tolist()):
+                attempt = batch.attempts[index]
+                score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
+                attempt_doc = {
+                    "id": str(uuid.uuid4()),
+                    "quiz_id": quiz_id,
+                    "student_id": student_id,
+                    "answers": attempt.answers,
+                    "score": score,
+                    "passed": score >= quiz["passing_score"],
+                    "correct_answers": correct_answers,
+                    "total_questions": total_questions,
+                    "started_at": attempt.started_at or now,
+                    "completed_at": attempt.completed_at or now,
+                    "time_taken_minutes": attempt.time_taken_minutes or 0
+                }
+                if attempt.idempotency_key:
+                    attempt_doc["idempotency_key"] = attempt.idempotency_key
+                new_attempts.append((index, attempt_doc))
+        
+        # Store new attempts, a concurrent sync of the same key loses on the unique index
+        raced_keys = set()
+        if new_attempts:
+            try:
+                await db.quiz_attempts.insert_many([attempt_doc for _, attempt_doc in new_attempts], ordered=False)
+            except BulkWriteError as e:
+                write_errors = e.details.get("writeErrors", [])
+                if any(error["code"] != 11000 for error in write_errors):
+                    raise
+                raced_keys = {new_attempts[error["index"]][1]["idempotency_key"] for error in write_errors}
+                raced_cursor = db.quiz_attempts.find({"student_id": student_id, "idempotency_key": {"$in": list(raced_keys)}})
+                existing.update({attempt["idempotency_key"]: attempt async for attempt in raced_cursor})
+        
+        for index, attempt_doc in new_attempts:
+            if attempt_doc.get("idempotency_key") not in raced_keys:
+                results[index] = _attempt_result(index, "created", attempt_doc, attempt_doc.get("idempotency_key"))
+        
+        new_attempts_by_index = dict(new_attempts)
+        for index, attempt in enumerate(batch.attempts):
+            if results[index] is not None:
+                continue
+            key = attempt.idempotency_key
+            first = results[first_index_by_key[key]] if key not in existing and key in first_index_by_key else None
+            if first and first["status"] == "not_found":
+                results[index] = {**first, "index": index}
+            else:
+                results[index] = _attempt_result(index, "duplicate", existing.get(key) or new_attempts_by_index.get(first_index_by_key.get(key)), key)
+        
+        return {
+            "results": results,
+            "created": len([r for r in results if r["status"] == "created"]),
+            "duplicates": len([r for r in results if r["status"] == "duplicate"]),
+            "rejected": len([r for r in results if r["status"] == "not_found"])
+        }
+    
+    except Exception as e:
+        logger.error(f"Submit quiz attempts error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to submit quiz attempts")
+
 # Daily.co API integration
 async def create_daily_room(room_name: str, duration_hours: int = 24) -> dict:
     """Create a room using Daily.co API"""
@@ -3152,7 +3467,7 @@ async def schedule_session(
             "teacher_id": session_data.teacher_id,
             "student_id": current_user["id"],
             "session_type": course["course_type"],
-            "scheduled_at": datetime.fromisoformat(session_data.scheduled_at),
+            "scheduled_at": SessionScheduler.normalize(datetime.fromisoformat(session_data.scheduled_at)),
             "duration_minutes": session_data.duration_minutes,
             "location": session_data.location,
             "status": SessionStatus.SCHEDULED,
@@ -3161,10 +3476,14 @@ async def schedule_session(
             "updated_at": datetime.utcnow()
         }
         
-        await db.sessions.insert_one(session_doc)
+        await session_scheduler.book(session_doc)
+        await availability_service.mark_booked(session_doc)
+        await invalidate_caches("sessions")
         
         return {"session_id": session_id, "message": "Session scheduled successfully"}
     
+    except ScheduleConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Schedule session error: {str(e)}")
         if isinstance(e, HTTPException):
@@ -3178,7 +3497,11 @@ async def get_my_sessions(current_user = Depends(get_current_user)):
         if current_user["role"] == "student":
             query["student_id"] = current_user["id"]
         elif current_user["role"] == "teacher":
-            query["teacher_id"] = current_user["id"]
+            # Sessions reference the teacher record, not the user
+            teacher = await db.teachers.find_one({"user_id": current_user["id"]})
+            if not teacher:
+                return []
+            query["teacher_id"] = teacher["id"]
         else:
             raise HTTPException(status_code=403, detail="Only students and teachers can view sessions")
         
@@ -3208,9 +3531,9 @@ async def complete_session(
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        # Update session
-        await db.sessions.update_one(
-            {"id": session_id},
+        # Update session, only the first of repeated or concurrent completions counts
+        result = await db.sessions.update_one(
+            {"id": session_id, "status": {"$ne": SessionStatus.COMPLETED}},
             {
                 "$set": {
                     "status": SessionStatus.COMPLETED,
@@ -3219,33 +3542,17 @@ async def complete_session(
                 }
             }
         )
+        if result.modified_count != 1:
+            return {"message": "Session already completed"}
+        await invalidate_caches("sessions")
+        
+        # Free the rest of the slot when finished early
+        if session["status"] in [SessionStatus.SCHEDULED, SessionStatus.IN_PROGRESS]:
+            await session_scheduler.release(session)
+            await availability_service.release(session, since=datetime.utcnow())
         
         # Update course progress
-        course = await db.courses.find_one({"id": session["course_id"]})
-        if course:
-            new_completed = course["completed_sessions"] + 1
-            await db.courses.update_one(
-                {"id": session["course_id"]},
-                {
-                    "$set": {
-                        "completed_sessions": new_completed,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
-            
-            # Check if course is completed
-            if new_completed >= course["total_sessions"]:
-                await db.courses.update_one(
-                    {"id": session["course_id"]},
-                    {
-                        "$set": {
-                            "status": CourseStatus.COMPLETED,
-                            "exam_status": ExamStatus.AVAILABLE,
-                            "updated_at": datetime.utcnow()
-                        }
-                    }
-                )
+        await course_state.complete_session(session["course_id"])
         
         return {"message": "Session completed successfully"}
     
@@ -3255,6 +3562,58 @@ async def complete_session(
             raise e
         raise HTTPException(status_code=500, detail="Failed to complete session")
 
+@api_router.post("/sessions/{session_id}/cancel")
+async def cancel_session(
+    session_id: str,
+    current_user = Depends(get_current_user)
+):
+    try:
+        session = await db.sessions.find_one({"id": session_id})
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        # Participants can cancel their own sessions, managers those of their school's teachers
+        if current_user["role"] == "student":
+            authorized = session["student_id"] == current_user["id"]
+        elif current_user["role"] == "teacher":
+            # Sessions reference the teacher record, not the teacher's user
+            teacher = await db.teachers.find_one({"user_id": current_user["id"]})
+            authorized = bool(teacher) and session["teacher_id"] == teacher["id"]
+        elif current_user["role"] == "manager":
+            teacher = await db.teachers.find_one({"id": session["teacher_id"]})
+            authorized = bool(teacher) and await db.driving_schools.find_one({
+                "id": teacher["driving_school_id"],
+                "manager_id": current_user["id"]
+            }) is not None
+        else:
+            authorized = False
+        if not authorized:
+            raise HTTPException(status_code=403, detail="Not authorized to cancel this session")
+        
+        result = await db.sessions.update_one(
+            {"id": session_id, "status": SessionStatus.SCHEDULED},
+            {
+                "$set": {
+                    "status": SessionStatus.CANCELLED,
+                    "updated_at": datetime.utcnow()
+                }
+            }
+        )
+        if result.modified_count == 0:
+            raise HTTPException(status_code=400, detail="Only scheduled sessions can be cancelled")
+        await invalidate_caches("sessions")
+        
+        await session_scheduler.release(session)
+        await availability_service.release(session)
+        
+        return {"message": "Session cancelled successfully"}
+    
+    except Exception as e:
+        logger.error(f"Cancel session error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to cancel session")
+
 # EXAM MANAGEMENT ENDPOINTS
 
 @api_router.post("/exams/schedule")
@@ -3274,39 +3633,51 @@ async def schedule_exam(
         if course["exam_status"] != ExamStatus.AVAILABLE:
             raise HTTPException(status_code=400, detail="Course is not ready for exam")
         
-        # Find available external expert
-        experts_cursor = db.external_experts.find({
-            "specialization": {"$in": [exam_data.exam_type]},
-            "is_available": True
-        })
-        experts = await experts_cursor.to_list(length=None)
+        if not exam_data.preferred_dates:
+            raise HTTPException(status_code=400, detail="At least one preferred date is required")
         
-        if not experts:
-            raise HTTPException(status_code=404, detail="No available external experts for this exam type")
+        # Exams take place in the school's state
+        enrollment = await db.enrollments.find_one({"id": course["enrollment_id"]})
+        school = await db.driving_schools.find_one({"id": enrollment["driving_school_id"]}) if enrollment else None
+        state = school.get("state") if school else current_user.get("state")
+        
+        # Reserve the least loaded free expert, trying preferred dates in order
+        exam_id = str(uuid.uuid4())
+        expert_id = None
+        for preferred_date in exam_data.preferred_dates:
+            scheduled_at = SessionScheduler.normalize(datetime.fromisoformat(preferred_date))
+            expert_id = await expert_assignment.assign(
+                exam_data.exam_type, state, scheduled_at, EXAM_DURATION_MINUTES, exam_id
+            )
+            if expert_id:
+                break
         
-        # Select first available expert (in real app, would have better logic)
-        expert = experts[0]
+        if not expert_id:
+            raise HTTPException(status_code=404, detail="No available external experts for this exam type")
         
         # Create exam
-        exam_id = str(uuid.uuid4())
         exam_doc = {
             "id": exam_id,
             "course_id": exam_data.course_id,
             "student_id": current_user["id"],
-            "external_expert_id": expert["id"],
+            "external_expert_id": expert_id,
             "exam_type": exam_data.exam_type,
-            "scheduled_at": datetime.fromisoformat(exam_data.preferred_dates[0]),  # Use first preferred date
+            "scheduled_at": scheduled_at,
             "location": exam_data.location,
-            "duration_minutes": 90,
+            "duration_minutes": EXAM_DURATION_MINUTES,
             "status": ExamStatus.AVAILABLE,
             "score": None,
             "notes": None,
             "created_at": datetime.utcnow()
         }
         
-        await db.exam_schedules.insert_one(exam_doc)
+        try:
+            await db.exam_schedules.insert_one(exam_doc)
+        except Exception:
+            await expert_assignment.release(expert_id, exam_id, scheduled_at)
+            raise
         
-        return {"exam_id": exam_id, "message": "Exam scheduled successfully"}
+        return {"exam_id": exam_id, "external_expert_id": expert_id, "scheduled_at": scheduled_at.isoformat(), "message": "Exam scheduled successfully"}
     
     except Exception as e:
         logger.error(f"Schedule exam error: {str(e)}")
@@ -3402,6 +3773,11 @@ async def complete_exam(
                 }
             }
         )
+        if exam["status"] not in [ExamStatus.PASSED, ExamStatus.FAILED]:
+            await db.external_experts.update_one(
+                {"id": expert["id"]},
+                {"$inc": {"total_exams_conducted": 1}}
+            )
         
         # Update course exam status
         await db.courses.update_one(
@@ -3418,7 +3794,7 @@ async def complete_exam(
         # Update course availability for next course
         course = await db.courses.find_one({"id": exam["course_id"]})
         if course and passed:
-            await update_course_availability(course["enrollment_id"])
+            await course_state.update_availability([course["enrollment_id"]])
         
         return {"message": "Exam completed successfully", "passed": passed}
     
@@ -3586,26 +3962,31 @@ async def get_school_overview(current_user = Depends(get_current_user)):
             raise HTTPException(status_code=404, detail="Manager has no driving school")
         
         # Calculate school metrics
-        enrollments_cursor = db.enrollments.find({"driving_school_id": school["id"]})
-        enrollments = await enrollments_cursor.to_list(length=None)
-        
-        teachers_cursor = db.teachers.find({"driving_school_id": school["id"]})
-        teachers = await teachers_cursor.to_list(length=None)
-        
-        reviews_cursor = db.reviews.find({"driving_school_id": school["id"]})
-        reviews = await reviews_cursor.to_list(length=None)
+        async def school_metrics():
+            enrollments_cursor = analytics_db.enrollments.find({"driving_school_id": school["id"]})
+            enrollments = await enrollments_cursor.to_list(length=None)
+            
+            teachers_cursor = analytics_db.teachers.find({"driving_school_id": school["id"]})
+            teachers = await teachers_cursor.to_list(length=None)
+            
+            ratings = rating_service.summary(school)
+            
+            return {
+                "school_name": school["name"],
+                "total_enrollments": len(enrollments),
+                "active_enrollments": len([e for e in enrollments if e["enrollment_status"] == "approved"]),
+                "pending_enrollments": len([e for e in enrollments if e["enrollment_status"] == "pending_approval"]),
+                "total_teachers": len(teachers),
+                "approved_teachers": len([t for t in teachers if t["is_approved"]]),
+                "total_reviews": ratings["total_reviews"],
+                "average_rating": ratings["average_rating"],
+                "rating_histogram": ratings["rating_histogram"],
+                "revenue_estimate": len([e for e in enrollments if e["enrollment_status"] == "approved"]) * school["price"]
+            }
         
-        metrics = {
-            "school_name": school["name"],
-            "total_enrollments": len(enrollments),
-            "active_enrollments": len([e for e in enrollments if e["enrollment_status"] == "approved"]),
-            "pending_enrollments": len([e for e in enrollments if e["enrollment_status"] == "pending_approval"]),
-            "total_teachers": len(teachers),
-            "approved_teachers": len([t for t in teachers if t["is_approved"]]),
-            "total_reviews": len(reviews),
-            "average_rating": sum([r["rating"] for r in reviews]) / len(reviews) if reviews else 0,
-            "revenue_estimate": len([e for e in enrollments if e["enrollment_status"] == "approved"]) * school["price"]
-        }
+        metrics = await shared_cache.get_or_compute(
+            f"school_overview:{school['id']}", school_metrics, ttl=ANALYTICS_CACHE_TTL_SECONDS, tags=ANALYTICS_CACHE_TAGS
+        )
         
         return metrics
     
@@ -3638,23 +4019,28 @@ async def get_teacher_performance(
             raise HTTPException(status_code=403, detail="Unauthorized to view this teacher's performance")
         
         # Calculate teacher metrics
-        sessions_cursor = db.sessions.find({"teacher_id": teacher_id})
-        sessions = await sessions_cursor.to_list(length=None)
-        
-        completed_sessions = [s for s in sessions if s["status"] == "completed"]
-        
-        reviews_cursor = db.reviews.find({"teacher_id": teacher_id})
-        reviews = await reviews_cursor.to_list(length=None)
+        async def teacher_metrics():
+            sessions_cursor = analytics_db.sessions.find({"teacher_id": teacher_id})
+            sessions = await sessions_cursor.to_list(length=None)
+            
+            completed_sessions = [s for s in sessions if s["status"] == "completed"]
+            
+            ratings = rating_service.summary(teacher)
+            
+            return {
+                "teacher_id": teacher_id,
+                "total_sessions": len(sessions),
+                "completed_sessions": len(completed_sessions),
+                "completion_rate": (len(completed_sessions) / len(sessions) * 100) if sessions else 0,
+                "total_reviews": ratings["total_reviews"],
+                "average_rating": ratings["average_rating"],
+                "rating_histogram": ratings["rating_histogram"],
+                "recent_sessions": serialize_doc(sessions[-10:])  # Last 10 sessions
+            }
         
-        metrics = {
-            "teacher_id": teacher_id,
-            "total_sessions": len(sessions),
-            "completed_sessions": len(completed_sessions),
-            "completion_rate": (len(completed_sessions) / len(sessions) * 100) if sessions else 0,
-            "total_reviews": len(reviews),
-            "average_rating": sum([r["rating"] for r in reviews]) / len(reviews) if reviews else 0,
-            "recent_sessions": serialize_doc(sessions[-10:])  # Last 10 sessions
-        }
+        metrics = await shared_cache.get_or_compute(
+            f"teacher_performance:{teacher_id}", teacher_metrics, ttl=ANALYTICS_CACHE_TTL_SECONDS, tags=ANALYTICS_CACHE_TAGS
+        )
         
         return metrics
     
@@ -3675,6 +4061,9 @@ async def create_review(
         if current_user["role"] != "student":
             raise HTTPException(status_code=403, detail="Only students can create reviews")
         
+        if review_data.rating not in range(1, 6):
+            raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
+        
         # Verify enrollment exists and is completed
         enrollment = await db.enrollments.find_one({
             "id": review_data.enrollment_id,
@@ -3708,20 +4097,8 @@ async def create_review(
         await db.reviews.insert_one(review_doc)
         
         # Update school rating
-        school_reviews_cursor = db.reviews.find({"driving_school_id": enrollment["driving_school_id"]})
-        school_reviews = await school_reviews_cursor.to_list(length=None)
-        
-        if school_reviews:
-            avg_rating = sum([r["rating"] for r in school_reviews]) / len(school_reviews)
-            await db.driving_schools.update_one(
-                {"id": enrollment["driving_school_id"]},
-                {
-                    "$set": {
-                        "rating": avg_rating,
-                        "total_reviews": len(school_reviews)
-                    }
-                }
-            )
+        await rating_service.record_review(review_doc)
+        await invalidate_caches("reviews", "schools")
         
         return {"review_id": review_id, "message": "Review created successfully"}
     
@@ -3765,29 +4142,13 @@ async def complete_course_session(
         if current_user["role"] not in ["student", "teacher", "manager"]:
             raise HTTPException(status_code=403, detail="Unauthorized to complete sessions")
         
-        # Get course
-        course = await db.courses.find_one({"id": course_id})
+        # Count the session and finish the course in one atomic update
+        course = await course_state.complete_session(course_id)
         if not course:
             raise HTTPException(status_code=404, detail="Course not found")
         
-        # Increment completed sessions
-        new_completed = course["completed_sessions"] + 1
-        
-        # Update course
-        update_data = {
-            "completed_sessions": new_completed,
-            "updated_at": datetime.utcnow()
-        }
-        
-        # Check if course is completed
-        if new_completed >= course["total_sessions"]:
-            update_data["status"] = CourseStatus.COMPLETED
-            update_data["exam_status"] = ExamStatus.AVAILABLE
-        
-        await db.courses.update_one({"id": course_id}, {"$set": update_data})
-        
         # Update course availability
-        await update_course_availability(course["enrollment_id"])
+        await course_state.update_availability([course["enrollment_id"]])
         
         return {"message": "Session completed successfully"}
     
@@ -3833,7 +4194,7 @@ async def take_course_exam(
         
         # Update course availability for next course
         if passed:
-            await update_course_availability(course["enrollment_id"])
+            await course_state.update_availability([course["enrollment_id"]])
         
         return {"message": "Exam completed successfully", "passed": passed, "score": score}
     
@@ -3854,60 +4215,7 @@ async def get_dashboard(
         if current_user["role"] != role:
             raise HTTPException(status_code=403, detail="Role mismatch")
         
-        dashboard_data = {}
-        
-        if role == "student":
-            # Get student's enrollments with courses
-            enrollments_cursor = db.enrollments.find({"student_id": current_user["id"]})
-            enrollments = await enrollments_cursor.to_list(length=None)
-            
-            for enrollment in enrollments:
-                # Get school details
-                school = await db.driving_schools.find_one({"id": enrollment["driving_school_id"]})
-                enrollment["school_name"] = school["name"] if school else "Unknown School"
-                
-                # Get courses
-                courses_cursor = db.courses.find({"enrollment_id": enrollment["id"]})
-                courses = await courses_cursor.to_list(length=None)
-                enrollment["courses"] = serialize_doc(courses)
-            
-            dashboard_data["enrollments"] = serialize_doc(enrollments)
-            
-        elif role == "teacher":
-            # Get teacher's school and students
-            teacher = await db.teachers.find_one({"user_id": current_user["id"]})
-            if teacher:
-                school = await db.driving_schools.find_one({"id": teacher["driving_school_id"]})
-                dashboard_data["school"] = serialize_doc(school)
-                
-                # Get assigned sessions
-                sessions_cursor = db.sessions.find({"teacher_id": teacher["id"]})
-                sessions = await sessions_cursor.to_list(length=None)
-                dashboard_data["sessions"] = serialize_doc(sessions)
-            
-        elif role == "manager":
-            # Get manager's school
-            school = await db.driving_schools.find_one({"manager_id": current_user["id"]})
-            if school:
-                dashboard_data["school"] = serialize_doc(school)
-                
-                # Get enrollments
-                enrollments_cursor = db.enrollments.find({"driving_school_id": school["id"]})
-                enrollments = await enrollments_cursor.to_list(length=None)
-                dashboard_data["enrollments"] = serialize_doc(enrollments)
-                
-                # Get teachers
-                teachers_cursor = db.teachers.find({"driving_school_id": school["id"]})
-                teachers = await teachers_cursor.to_list(length=None)
-                dashboard_data["teachers"] = serialize_doc(teachers)
-        
-        elif role == "external_expert":
-            # Get expert's exams
-            expert = await db.external_experts.find_one({"user_id": current_user["id"]})
-            if expert:
-                exams_cursor = db.exam_schedules.find({"external_expert_id": expert["id"]})
-                exams = await exams_cursor.to_list(length=None)
-                dashboard_data["exams"] = serialize_doc(exams)
+        dashboard_data = serialize_doc(await dashboard_service.for_role(current_user, role))
         
         return dashboard_data
     
@@ -3962,6 +4270,22 @@ async def complete_payment(
             raise e
         raise HTTPException(status_code=500, detail="Failed to complete payment")
 
+@api_router.post("/payments/webhook/{provider}")
+async def receive_payment_webhook(provider: str, request: Request):
+    """Record a payment provider webhook and acknowledge it immediately"""
+    try:
+        payload = await request.json()
+        signature = request.headers.get("X-Signature", "")
+        
+        # Processing happens in the background webhook worker
+        return await payment_service.ingest_webhook(provider, payload, signature)
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Payment webhook error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to record webhook")
+
 # MISSING ENDPOINTS THAT WERE IDENTIFIED IN TESTING
 
 @api_router.get("/documents")
@@ -4088,16 +4412,13 @@ async def accept_document(
         logger.info(f"Manager {current_user['id']} accepting document {document_id} for student {document['user_id']}")
         
         # Update document status to accepted
-        await db.documents.update_one(
-            {"id": document_id},
-            {"$set": {
-                "status": "accepted", 
-                "refusal_reason": None, 
-                "is_verified": True,
-                "reviewed_at": datetime.utcnow(),
-                "reviewed_by": current_user["id"]
-            }}
-        )
+        document_state = await document_states.transition(document_id, {
+            "status": "accepted", 
+            "refusal_reason": None, 
+            "is_verified": True,
+            "reviewed_at": datetime.utcnow(),
+            "reviewed_by": current_user["id"]
+        })
         
         # Check if all required documents are now accepted for this user using enhanced function
         document_owner = await db.users.find_one({"id": document["user_id"]})
@@ -4105,11 +4426,7 @@ async def accept_document(
         if document_owner and document_owner["role"] == "student":
             logger.info(f"Checking document completeness for student {document['user_id']}")
             
-            # Use the enhanced function with better logging
-            documents_complete = await check_user_documents_complete_enhanced(
-                document["user_id"], 
-                "student"
-            )
+            documents_complete = document_states.is_complete(document_state, "student")
             
             logger.info(f"Documents complete for student {document['user_id']}: {documents_complete}")
             
@@ -4200,10 +4517,7 @@ async def refuse_document(
                 raise HTTPException(status_code=403, detail="Unauthorized to refuse this document")
         
         # Update document status to refused with reason
-        await db.documents.update_one(
-            {"id": document_id},
-            {"$set": {"status": "refused", "refusal_reason": reason, "is_verified": False}}
-        )
+        await document_states.transition(document_id, {"status": "refused", "refusal_reason": reason, "is_verified": False})
         
         # Send notification to student about document refusal
         notification_doc = {
@@ -4309,35 +4623,8 @@ async def get_enhanced_pending_enrollments(
                 continue
             
             # Get document summary
-            documents_cursor = db.documents.find({"user_id": student["id"]})
-            documents = await documents_cursor.to_list(length=None)
-            
-            required_docs = REQUIRED_DOCUMENTS.get("student", [])
-            required_types = {doc.value for doc in required_docs}
-            
-            document_summary = {
-                "total_required": len(required_types),
-                "total_uploaded": 0,
-                "total_accepted": 0,
-                "total_refused": 0,
-                "total_pending": 0,
-                "all_uploaded": False,
-                "ready_for_decision": False
-            }
-            
-            uploaded_types = set()
-            for doc in documents:
-                if doc["document_type"] in required_types:
-                    uploaded_types.add(doc["document_type"])
-                    if doc["status"] == "accepted":
-                        document_summary["total_accepted"] += 1
-                    elif doc["status"] == "refused":
-                        document_summary["total_refused"] += 1
-                    elif doc["status"] == "pending":
-                        document_summary["total_pending"] += 1
-            
-            document_summary["total_uploaded"] = len(uploaded_types)
-            document_summary["all_uploaded"] = required_types.issubset(uploaded_types)
+            document_summary = document_states.summary(await document_states.state_for(student), "student")
+            document_summary.pop("all_accepted")
             document_summary["ready_for_decision"] = document_summary["all_uploaded"] and document_summary["total_pending"] > 0
             
             # Determine if this enrollment is ready for the new approval workflow
@@ -4492,6 +4779,11 @@ async def complete_exam_updated(
                 }
             }
         )
+        if exam["status"] not in [ExamStatus.PASSED, ExamStatus.FAILED]:
+            await db.external_experts.update_one(
+                {"id": expert["id"]},
+                {"$inc": {"total_exams_conducted": 1}}
+            )
         
         # Update course exam status
         await db.courses.update_one(
@@ -4508,7 +4800,7 @@ async def complete_exam_updated(
         # Update course availability for next course
         course = await db.courses.find_one({"id": exam["course_id"]})
         if course and passed:
-            await update_course_availability(course["enrollment_id"])
+            await course_state.update_availability([course["enrollment_id"]])
             
             # Check if all courses completed and generate certificate
             cert_id = await check_and_generate_certificate(course["enrollment_id"])
@@ -4629,6 +4921,7 @@ async def create_sample_data():
         
         # Insert sample schools
         await db.driving_schools.insert_many(sample_schools)
+        await invalidate_caches("schools")
         
         return {
             "message": "Sample data created successfully",
@@ -4661,14 +4954,28 @@ async def get_my_quizzes(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "manager":
         raise HTTPException(status_code=403, detail="Only managers can access this endpoint")
     
-    quizzes_cursor = db.quizzes.find({"created_by": current_user["id"]}).sort("created_at", -1)
-    quizzes = await quizzes_cursor.to_list(length=None)
+    quizzes = await quiz_catalog.list_quizzes(created_by=current_user["id"], active_only=False)
     
     return {
         "quizzes": serialize_doc(quizzes),
         "total": len(quizzes)
     }
 
+@api_router.get("/quizzes/{quiz_id}", response_model=dict)
+async def get_quiz(quiz_id: str, current_user: dict = Depends(get_current_user)):
+    """Get a quiz with its questions, answer keys stay server-side"""
+    quiz = await quiz_catalog.get_summary(quiz_id)
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    
+    # Only the author sees correct answers
+    is_author = current_user["role"] == "manager" and quiz["created_by"] == current_user["id"]
+    if not quiz["is_active"] and not is_author:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    
+    quiz = await quiz_catalog.get_quiz(quiz_id, include_answers=is_author)
+    return serialize_doc(quiz)
+
 @api_router.get("/sessions/school", response_model=dict)
 async def get_school_sessions(current_user: dict = Depends(get_current_user)):
     """Get all sessions for the manager's school"""
@@ -4728,6 +5035,7 @@ async def remove_teacher(teacher_id: str, current_user: dict = Depends(get_curre
     
     # Remove teacher
     await db.teachers.delete_one({"id": teacher_id})
+    await invalidate_caches("teachers")
     
     # Update user role back to guest or student if they have enrollments
     user = await db.users.find_one({"id": teacher["user_id"]})
@@ -4828,6 +5136,7 @@ async def add_teacher_enhanced(
     }
     
     await db.teachers.insert_one(teacher_data)
+    await invalidate_caches("teachers")
     
     # Get the created teacher with user info for response
     teacher = await db.teachers.find_one({"id": teacher_id})
@@ -4839,6 +5148,154 @@ async def add_teacher_enhanced(
     
     return serialize_doc(teacher)
 
+@api_router.post("/manager/imports")
+async def start_user_import(
+    role: str = Form(...),
+    file: UploadFile = File(...),
+    current_user = Depends(get_current_user)
+):
+    """Import teachers or students from a CSV file as a background job"""
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can import users")
+        
+        school = await db.driving_schools.find_one({"manager_id": current_user["id"]})
+        if not school:
+            raise HTTPException(status_code=404, detail="No driving school found for this manager")
+        
+        try:
+            job = await user_import_service.start_import(file, role, school, current_user["id"])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return serialize_doc(job)
+    
+    except Exception as e:
+        logger.error(f"Start user import error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to start import")
+
+@api_router.get("/manager/imports/{job_id}")
+async def get_user_import(
+    job_id: str,
+    current_user = Depends(get_current_user)
+):
+    """Progress of an import job"""
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can view imports")
+        
+        job = await user_import_service.get_job(job_id, current_user["id"])
+        if not job:
+            raise HTTPException(status_code=404, detail="Import not found")
+        
+        return serialize_doc(job)
+    
+    except Exception as e:
+        logger.error(f"Get user import error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to get import")
+
+@api_router.get("/manager/imports/{job_id}/errors")
+async def download_user_import_errors(
+    job_id: str,
+    current_user = Depends(get_current_user)
+):
+    """CSV report of the rows an import job could not create"""
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can view imports")
+        
+        job = await user_import_service.get_job(job_id, current_user["id"])
+        if not job:
+            raise HTTPException(status_code=404, detail="Import not found")
+        
+        return StreamingResponse(
+            user_import_service.error_report(job_id),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="import-{job_id}-errors.csv"'}
+        )
+    
+    except Exception as e:
+        logger.error(f"Download user import errors error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to get import errors")
+
+@api_router.get("/manager/imports/{job_id}/credentials")
+async def download_user_import_credentials(
+    job_id: str,
+    current_user = Depends(get_current_user)
+):
+    """CSV of the passwords generated for imported users, who must change them at first login"""
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can view imports")
+        
+        job = await user_import_service.get_job(job_id, current_user["id"])
+        if not job:
+            raise HTTPException(status_code=404, detail="Import not found")
+        
+        return StreamingResponse(
+            user_import_service.credentials_report(job_id),
+            media_type="text/csv",
+            headers={
+                "Content-Disposition": f'attachment; filename="import-{job_id}-credentials.csv"',
+                "Cache-Control": "no-store"
+            }
+        )
+    
+    except Exception as e:
+        logger.error(f"Download user import credentials error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to get import credentials")
+
+@api_router.get("/manager/exports/{dataset}")
+async def export_school_data(
+    dataset: str,
+    format: str = "csv",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    """Stream enrollments, sessions, exams or payments of the manager's school as CSV or Parquet"""
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can export school data")
+        
+        if dataset not in EXPORT_COLUMNS:
+            raise HTTPException(status_code=404, detail=f"Unknown export, use one of {', '.join(EXPORT_COLUMNS)}")
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail="Format must be csv or parquet")
+        if format == "parquet" and not export_service.parquet_available:
+            raise HTTPException(status_code=400, detail="Parquet export requires pyarrow on the server")
+        
+        try:
+            start_date = datetime.fromisoformat(start) if start else None
+            end_date = datetime.fromisoformat(end) if end else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        
+        school = await db.driving_schools.find_one({"manager_id": current_user["id"]})
+        if not school:
+            raise HTTPException(status_code=404, detail="No driving school found for this manager")
+        
+        file_name = f"{dataset}-{datetime.utcnow().strftime('%Y%m%d')}.{format}"
+        return StreamingResponse(
+            export_service.stream(dataset, format, school, start_date, end_date),
+            media_type=EXPORT_FORMATS[format],
+            headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+        )
+    
+    except Exception as e:
+        logger.error(f"Export school data error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to export data")
+
 # Include the API router
 # NEW APPROVAL SYSTEM: Student endpoint to view enrollment status and rejection reasons
 @api_router.get("/student/enrollment-status")
@@ -4854,6 +5311,28 @@ async def get_student_enrollment_status(
         enrollments_cursor = db.enrollments.find({"student_id": current_user["id"]}).sort("created_at", -1)
         enrollments = await enrollments_cursor.to_list(length=None)
         
+        # The document summary is the same for every enrollment of the student
+        document_state = await document_states.state_for(current_user)
+        document_summary = document_states.summary(document_state, "student")
+        document_summary = {
+            key: document_summary[key] for key in ["total_required", "total_uploaded", "total_accepted", "total_refused"]
+        }
+        document_summary["refused_documents"] = []
+        
+        required_types = [doc.value for doc in REQUIRED_DOCUMENTS.get("student", [])]
+        if document_state.get("refused", 0) & document_states.required_mask("student"):
+            refused_cursor = db.documents.find({
+                "user_id": current_user["id"],
+                "document_type": {"$in": required_types},
+                "status": "refused"
+            })
+            async for doc in refused_cursor:
+                document_summary["refused_documents"].append({
+                    "document_type": doc["document_type"].replace('_', ' ').title(),
+                    "refusal_reason": doc.get("refusal_reason", "No reason provided"),
+                    "refused_at": doc.get("refused_at").isoformat() if doc.get("refused_at") else None
+                })
+        
         enrollment_statuses = []
         for enrollment in enrollments:
             # Get school info
@@ -4870,37 +5349,6 @@ async def get_student_enrollment_status(
                     "rejected_by_manager": True
                 }
             
-            # Get document status summary
-            documents_cursor = db.documents.find({"user_id": current_user["id"]})
-            documents = await documents_cursor.to_list(length=None)
-            
-            required_docs = REQUIRED_DOCUMENTS.get("student", [])
-            required_types = {doc.value for doc in required_docs}
-            
-            document_summary = {
-                "total_required": len(required_types),
-                "total_uploaded": 0,
-                "total_accepted": 0,
-                "total_refused": 0,
-                "refused_documents": []
-            }
-            
-            uploaded_types = set()
-            for doc in documents:
-                if doc["document_type"] in required_types:
-                    uploaded_types.add(doc["document_type"])
-                    if doc["status"] == "accepted":
-                        document_summary["total_accepted"] += 1
-                    elif doc["status"] == "refused":
-                        document_summary["total_refused"] += 1
-                        document_summary["refused_documents"].append({
-                            "document_type": doc["document_type"].replace('_', ' ').title(),
-                            "refusal_reason": doc.get("refusal_reason", "No reason provided"),
-                            "refused_at": doc.get("refused_at").isoformat() if doc.get("refused_at") else None
-                        })
-            
-            document_summary["total_uploaded"] = len(uploaded_types)
-            
             enrollment_status = {
                 "id": enrollment["id"],
                 "school_name": school["name"],
@@ -4928,6 +5376,37 @@ async def get_student_enrollment_status(
             raise e
         raise HTTPException(status_code=500, detail="Failed to get enrollment status")
 
+# Background workers
+@app.on_event("startup")
+async def start_background_workers():
+    await payment_service.ensure_indexes()
+    await payment_service.backfill_payment_rollups()
+    await session_scheduler.ensure_indexes()
+    await availability_service.ensure_indexes()
+    await expert_assignment.ensure_indexes()
+    await course_state.ensure_indexes()
+    await user_import_service.ensure_indexes()
+    await enrollment_consistency.ensure_indexes()
+    await db.quiz_attempts.create_index(
+        [("student_id", ASCENDING), ("idempotency_key", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"idempotency_key": {"$type": "string"}}
+    )
+    if PAYMENT_WEBHOOK_WORKER_ENABLED:
+        app.state.webhook_worker = asyncio.create_task(payment_service.run_webhook_worker())
+    if ENROLLMENT_CONSISTENCY_WORKER_ENABLED:
+        app.state.consistency_worker = asyncio.create_task(enrollment_consistency.run_scheduler())
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    for worker_name in ["webhook_worker", "consistency_worker"]:
+        worker = getattr(app.state, worker_name, None)
+        if worker:
+            worker.cancel()
+    await user_import_service.shutdown()
+    await shared_cache.close()
+    await database.drain_and_close()
+
 app.include_router(api_router)
 
 if __name__ == "__main__":
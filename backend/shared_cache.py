@@ -0,0 +1,329 @@
+# Shared Cache for Driving School Platform
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+try:
+    import redis.asyncio as redis
+    from redis.exceptions import WatchError
+except ImportError:  # memory backend only
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+class MemoryBackend:
+    """LRU of byte values with a TTL per entry, local to one worker"""
+
+    def __init__(self, max_entries: int = 1024, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        # key -> (value, expires_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and self.clock() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [self._live(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self._entries[key] = (value, self.clock() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Set only when the key is absent, the lock primitive"""
+        if self._live(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def delete_if(self, key: str, value: bytes) -> bool:
+        """Delete only while the key still holds value, the unlock primitive"""
+        if self._live(key) != value:
+            return False
+        del self._entries[key]
+        return True
+
+    async def close(self):
+        self._entries.clear()
+
+class RedisBackend:
+    """Any server speaking the Redis protocol, shared by every worker"""
+
+    def __init__(self, url: Optional[str] = None, client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("The redis package is required for CACHE_BACKEND=redis")
+            client = redis.from_url(url or "redis://localhost:6379/0")
+        self.client = client
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return await self.client.mget(keys)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        await self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(await self.client.set(key, value, px=int(ttl * 1000) if ttl else None, nx=True))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def delete_if(self, key: str, value: bytes) -> bool:
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.get(key) != value:
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.delete(key)
+                await pipe.execute()
+                return True
+            except WatchError:
+                # Changed between the read and the delete, so no longer ours
+                return False
+
+    async def close(self):
+        await self.client.aclose()
+
+def _decode(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
+
+def _encode(value) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not cacheable")
+
+class CacheStats:
+    """Lookups per key family, read by the metrics endpoint"""
+
+    RESULTS = ("hit", "miss", "coalesced", "error")
+
+    def __init__(self):
+        self.lookups: Dict[str, Dict[str, int]] = {}
+        self.compute_seconds: Dict[str, float] = {}
+
+    def record(self, family: str, result: str):
+        counts = self.lookups.setdefault(family, {name: 0 for name in self.RESULTS})
+        counts[result] += 1
+
+    def hit_ratio(self, family: Optional[str] = None) -> float:
+        families = [self.lookups.get(family, {})] if family else list(self.lookups.values())
+        hits = sum(counts.get("hit", 0) + counts.get("coalesced", 0) for counts in families)
+        total = hits + sum(counts.get("miss", 0) for counts in families)
+        return round(hits / total, 4) if total else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "hit_ratio": self.hit_ratio(),
+            "families": {
+                family: {**counts, "hit_ratio": self.hit_ratio(family),
+                         "compute_seconds": round(self.compute_seconds.get(family, 0.0), 4)}
+                for family, counts in sorted(self.lookups.items())
+            }
+        }
+
+class SharedCache:
+    """JSON values under a namespace, invalidated by tag, computed once per key
+
+    An entry remembers the token of each of its tags when it was computed;
+    invalidating a tag gives it a new token, so every entry stored under the
+    old one misses from then on, in every worker sharing the backend. Tags
+    get a token when the first entry using them is stored, and an entry whose
+    tag token is missing, e.g. evicted, misses too. A
+    MemoryBackend is private to its worker, so with several workers only
+    CACHE_BACKEND=redis makes an invalidation reach all of them. A missing key
+    is computed by one caller: others in the worker wait for its result, others
+    in other workers wait on a lock key until the value appears. The lock holds
+    a token of its owner, so a computation outliving the lock TTL does not
+    release a lock another worker has taken since.
+    """
+
+    def __init__(self, backend=None, namespace: Optional[str] = None):
+        self.enabled = os.environ.get('SHARED_CACHE_ENABLED', 'true').lower() == 'true'
+        self.namespace = namespace or os.environ.get('CACHE_NAMESPACE', 'dsp')
+        self.default_ttl = float(os.environ.get('CACHE_DEFAULT_TTL_SECONDS', '60'))
+        self.lock_ttl = float(os.environ.get('CACHE_LOCK_TTL_SECONDS', '30'))
+        self.lock_poll = float(os.environ.get('CACHE_LOCK_POLL_SECONDS', '0.05'))
+        if backend is None:
+            backend = self.backend_from_env()
+        self.backend = backend
+        self.stats = CacheStats()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def backend_from_env():
+        if os.environ.get('CACHE_BACKEND', 'memory').lower() == 'redis':
+            return RedisBackend(os.environ.get('CACHE_REDIS_URL'))
+        return MemoryBackend(int(os.environ.get('CACHE_MAX_ENTRIES', '1024')))
+
+    def _key(self, kind: str, name: str) -> str:
+        return f"{self.namespace}:{kind}:{name}"
+
+    @staticmethod
+    def _family(key: str) -> str:
+        return key.split(":", 1)[0]
+
+    async def _tag_tokens(self, tags: List[str], seed: bool = False) -> List[Optional[str]]:
+        """Current token of each tag; with seed, tags without one get a fresh token"""
+        if not tags:
+            return []
+        keys = [self._key("tag", tag) for tag in tags]
+        tokens = [_decode(token) for token in await self.backend.get_many(keys)]
+        if seed:
+            for i, key in enumerate(keys):
+                if tokens[i] is None:
+                    token = uuid.uuid4().hex
+                    if await self.backend.add(key, token.encode()):
+                        tokens[i] = token
+                    else:
+                        # Another caller seeded it first
+                        tokens[i] = _decode((await self.backend.get_many([key]))[0])
+        return tokens
+
+    async def _read(self, key: str):
+        """(True, value) for a live entry whose tags are unchanged, else (False, None)"""
+        raw = (await self.backend.get_many([self._key("value", key)]))[0]
+        if raw is None:
+            return False, None
+        entry = json.loads(raw)
+        stored_tokens = list(entry["tags"].values())
+        if None in stored_tokens or (stored_tokens and await self._tag_tokens(list(entry["tags"])) != stored_tokens):
+            return False, None
+        return True, entry["value"]
+
+    async def get(self, key: str):
+        """Cached value or None"""
+        found, value = await self._read(key)
+        return value if found else None
+
+    async def set(self, key: str, value, ttl: Optional[float] = None, tags: Iterable[str] = (),
+                  tokens: Optional[List[Optional[str]]] = None):
+        tags = list(tags)
+        if tokens is None:
+            tokens = await self._tag_tokens(tags, seed=True)
+        entry = json.dumps({"tags": dict(zip(tags, tokens)), "value": value}, default=_encode)
+        await self.backend.set(self._key("value", key), entry.encode(), ttl or self.default_ttl)
+
+    async def invalidate(self, *tags: str):
+        """Call after writing data that cached values depend on"""
+        for tag in tags:
+            await self.backend.set(self._key("tag", tag), uuid.uuid4().hex.encode())
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable], ttl: Optional[float] = None,
+                             tags: Iterable[str] = ()):
+        """Cached value of key, or the result of compute() stored for later callers"""
+        if not self.enabled:
+            return await compute()
+        family = self._family(key)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats.record(family, "coalesced")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The caller computing it was cancelled, not this one
+                return await self.get_or_compute(key, compute, ttl, tags)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._lookup_or_compute(key, family, compute, ttl, list(tags))
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters get the error too; mark it retrieved for when there are none
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def _lookup_or_compute(self, key: str, family: str, compute, ttl, tags: List[str]):
+        lock_key = self._key("lock", key)
+        try:
+            found, value = await self._read(key)
+            if found:
+                self.stats.record(family, "hit")
+                return value
+
+            lock_token = uuid.uuid4().hex.encode()
+            deadline = time.monotonic() + self.lock_ttl
+            while not await self.backend.add(lock_key, lock_token, self.lock_ttl):
+                # Another worker is computing it, wait for its value
+                if time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(self.lock_poll)
+                found, value = await self._read(key)
+                if found:
+                    self.stats.record(family, "coalesced")
+                    return value
+            # Tokens from before computing, so an invalidation meanwhile leaves the value stale
+            tokens = await self._tag_tokens(tags, seed=True)
+        except Exception as e:
+            # A cache outage must not take the endpoint down with it
+            logger.error(f"Shared cache error for {key}: {str(e)}")
+            self.stats.record(family, "error")
+            return await compute()
+
+        self.stats.record(family, "miss")
+        try:
+            started = time.perf_counter()
+            value = await compute()
+            self.stats.compute_seconds[family] = self.stats.compute_seconds.get(family, 0.0) + time.perf_counter() - started
+            try:
+                await self.set(key, value, ttl, tags, tokens)
+            except (TypeError, ValueError):
+                raise
+            except Exception as e:
+                logger.error(f"Shared cache write error for {key}: {str(e)}")
+        finally:
+            try:
+                await self.backend.delete_if(lock_key, lock_token)
+            except Exception as e:
+                logger.error(f"Shared cache unlock error for {key}: {str(e)}")
+        return value
+
+    def collector(self):
+        """Prometheus lines for MetricsRegistry.add_collector"""
+        yield "# HELP shared_cache_lookups_total Shared cache lookups by key family and result"
+        yield "# TYPE shared_cache_lookups_total counter"
+        for family, counts in sorted(self.stats.lookups.items()):
+            for result, count in counts.items():
+                yield f'shared_cache_lookups_total{{family="{family}",result="{result}"}} {count}'
+        yield "# HELP shared_cache_hit_ratio Share of lookups served without computing"
+        yield "# TYPE shared_cache_hit_ratio gauge"
+        for family in sorted(self.stats.lookups):
+            yield f'shared_cache_hit_ratio{{family="{family}"}} {self.stats.hit_ratio(family)}'
+
+    async def close(self):
+        await self.backend.close()
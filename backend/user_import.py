@@ -0,0 +1,394 @@
+# Bulk User Import for Driving School Platform
+import os
+import re
+import csv
+import uuid
+import asyncio
+import logging
+import secrets
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from course_state import CourseStateMachine
+
+logger = logging.getLogger(__name__)
+
+IMPORT_ROLES = ["teacher", "student"]
+# Cache tag of the data each role's import creates
+IMPORT_CACHE_TAGS = {"teacher": "teachers", "student": "enrollments"}
+REQUIRED_COLUMNS = ["email", "first_name", "last_name"]
+
+DEFAULT_BIRTH_DATE = datetime(1990, 1, 1)
+
+# Row values that are not user fields
+USER_EXCLUDED_FIELDS = ["password", "password_generated", "can_teach_male", "can_teach_female"]
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+TRUE_VALUES = {"1", "true", "yes", "y"}
+FALSE_VALUES = {"0", "false", "no", "n"}
+
+class ImportRowError(ValueError):
+    pass
+
+class UserImportService:
+    """Streams a CSV of teachers or students into a school as a background job"""
+
+    def __init__(self, db_client, password_hasher: Callable[[str], str], states: Iterable[str],
+                 invalidate: Optional[Callable[..., Awaitable]] = None):
+        self.db = db_client.driving_school_platform
+        self.password_hasher = password_hasher
+        self.states = set(states)
+        # Called with the cache tag of the rows a chunk created
+        self.invalidate = invalidate
+
+        self.chunk_size = int(os.environ.get('USER_IMPORT_CHUNK_SIZE', '200'))
+        self.hash_workers = int(os.environ.get('USER_IMPORT_HASH_WORKERS', '4'))
+        self.max_upload_bytes = int(os.environ.get('USER_IMPORT_MAX_UPLOAD_MB', '20')) * 1024 * 1024
+        self.upload_dir = os.environ.get('USER_IMPORT_DIR', tempfile.gettempdir())
+        # Generated passwords are deleted once downloaded, or expire after this long if never fetched
+        self.credentials_ttl = timedelta(hours=float(os.environ.get('USER_IMPORT_CREDENTIALS_TTL_HOURS', '24')))
+
+        # bcrypt releases the GIL, so threads hash in parallel without blocking the loop
+        self._executor = ThreadPoolExecutor(max_workers=self.hash_workers, thread_name_prefix="import-hash")
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def ensure_indexes(self):
+        await self.db.import_jobs.create_index("id", unique=True)
+        await self.db.import_jobs.create_index([("manager_id", ASCENDING), ("created_at", ASCENDING)])
+        await self.db.import_job_errors.create_index([("job_id", ASCENDING), ("row", ASCENDING)])
+        await self.db.import_job_credentials.create_index([("job_id", ASCENDING), ("row", ASCENDING)])
+        await self.db.import_job_credentials.create_index("expires_at", expireAfterSeconds=0)
+        try:
+            await self.db.users.create_index("email", unique=True)
+        except OperationFailure as e:
+            # Existing duplicates block the index; imports then rely on the email lookup alone
+            logger.error(f"Unique users.email index not created: {str(e)}")
+
+    async def start_import(self, upload, role: str, school: dict, manager_id: str) -> dict:
+        """Spool the upload to disk, record the job and process it in the background"""
+        if role not in IMPORT_ROLES:
+            raise ValueError(f"Role must be one of {', '.join(IMPORT_ROLES)}")
+
+        job_id = str(uuid.uuid4())
+        path = os.path.join(self.upload_dir, f"user-import-{job_id}.csv")
+        size = 0
+        try:
+            with open(path, "wb") as spool:
+                while True:
+                    chunk = await upload.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise ValueError(f"File exceeds {self.max_upload_bytes // (1024 * 1024)}MB")
+                    spool.write(chunk)
+            self._check_header(path)
+        except Exception:
+            os.remove(path)
+            raise
+
+        job = {
+            "id": job_id,
+            "role": role,
+            "driving_school_id": school["id"],
+            "manager_id": manager_id,
+            "file_name": upload.filename,
+            "file_bytes": size,
+            "status": "queued",
+            "processed": 0,
+            "created": 0,
+            "failed": 0,
+            "generated_passwords": 0,
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None
+        }
+        await self.db.import_jobs.insert_one(job)
+
+        task = asyncio.create_task(self._run(job, school, path))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+        job.pop("_id", None)
+        return job
+
+    async def get_job(self, job_id: str, manager_id: str) -> Optional[dict]:
+        return await self.db.import_jobs.find_one({"id": job_id, "manager_id": manager_id}, {"_id": 0})
+
+    async def error_report(self, job_id: str, batch_size: int = 500) -> AsyncIterator[str]:
+        """CSV lines of the rows that were not imported, streamed from the cursor"""
+        yield "row,email,error\r\n"
+        errors_cursor = self.db.import_job_errors.find(
+            {"job_id": job_id}, {"_id": 0, "row": 1, "email": 1, "error": 1}
+        ).sort("row", ASCENDING).batch_size(batch_size)
+        async for error in errors_cursor:
+            yield _csv_line([error["row"], error.get("email", ""), error["error"]])
+
+    async def credentials_report(self, job_id: str, batch_size: int = 500) -> AsyncIterator[str]:
+        """CSV lines of the passwords generated for rows without one, for the manager to hand out once"""
+        yield "row,email,password\r\n"
+        credentials_cursor = self.db.import_job_credentials.find(
+            {"job_id": job_id}, {"_id": 0, "row": 1, "email": 1, "password": 1}
+        ).sort("row", ASCENDING).batch_size(batch_size)
+        async for credential in credentials_cursor:
+            yield _csv_line([credential["row"], credential["email"], credential["password"]])
+        # Only reached once the whole file was sent, so an interrupted download can be retried
+        await self.db.import_job_credentials.delete_many({"job_id": job_id})
+
+    async def shutdown(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    @staticmethod
+    def _check_header(path: str):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            try:
+                header = next(csv.reader(f))
+            except StopIteration:
+                raise ValueError("File is empty")
+            except UnicodeDecodeError:
+                raise ValueError("File must be UTF-8 encoded CSV")
+        missing = [column for column in REQUIRED_COLUMNS if column not in [name.strip() for name in header]]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    async def _run(self, job: dict, school: dict, path: str):
+        await self.db.import_jobs.update_one(
+            {"id": job["id"]}, {"$set": {"status": "running", "started_at": datetime.utcnow()}}
+        )
+        seen_emails = set()
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.DictReader(f)
+                chunk: List[Tuple[int, dict]] = []
+                # Line 1 is the header
+                for line, row in enumerate(reader, start=2):
+                    chunk.append((line, row))
+                    if len(chunk) >= self.chunk_size:
+                        await self._import_chunk(job, school, chunk, seen_emails)
+                        chunk = []
+                if chunk:
+                    await self._import_chunk(job, school, chunk, seen_emails)
+
+            await self.db.import_jobs.update_one(
+                {"id": job["id"]}, {"$set": {"status": "completed", "finished_at": datetime.utcnow()}}
+            )
+            logger.info(f"User import {job['id']} completed")
+        except asyncio.CancelledError:
+            await self.db.import_jobs.update_one(
+                {"id": job["id"]}, {"$set": {"status": "interrupted", "finished_at": datetime.utcnow()}}
+            )
+            raise
+        except Exception as e:
+            logger.error(f"User import {job['id']} error: {str(e)}")
+            await self.db.import_jobs.update_one(
+                {"id": job["id"]},
+                {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}}
+            )
+        finally:
+            os.remove(path)
+
+    def _parse_row(self, row: dict, role: str, school: dict) -> dict:
+        values = {(key or "").strip(): (value or "").strip() for key, value in row.items() if isinstance(value, str)}
+
+        email = values.get("email", "")
+        if not EMAIL_PATTERN.match(email):
+            raise ImportRowError("Invalid email")
+        for column in ["first_name", "last_name"]:
+            if not values.get(column):
+                raise ImportRowError(f"Missing {column}")
+
+        gender = values.get("gender", "").lower() or "male"
+        if gender not in ["male", "female"]:
+            raise ImportRowError("Invalid gender")
+
+        state = values.get("state") or school.get("state", "Alger")
+        if state not in self.states:
+            raise ImportRowError("Invalid state")
+
+        birth_date = DEFAULT_BIRTH_DATE
+        if values.get("date_of_birth"):
+            try:
+                birth_date = datetime.fromisoformat(values["date_of_birth"])
+            except ValueError:
+                raise ImportRowError("Invalid date format. Use YYYY-MM-DD")
+
+        # No shared default: a row without a password gets its own, and must change it
+        password = values.get("password")
+        if password and len(password) < 6:
+            raise ImportRowError("Password must be at least 6 characters")
+
+        parsed = {
+            "email": email,
+            "password": password or secrets.token_urlsafe(12),
+            "password_generated": not password,
+            "first_name": values["first_name"],
+            "last_name": values["last_name"],
+            "phone": values.get("phone", ""),
+            "address": values.get("address", ""),
+            "date_of_birth": birth_date,
+            "gender": gender,
+            "state": state
+        }
+        if role == "teacher":
+            parsed["can_teach_male"] = _parse_bool(values.get("can_teach_male"), "can_teach_male")
+            parsed["can_teach_female"] = _parse_bool(values.get("can_teach_female"), "can_teach_female")
+        return parsed
+
+    async def _import_chunk(self, job: dict, school: dict, chunk: List[Tuple[int, dict]], seen_emails: set):
+        errors = []
+        valid: List[Tuple[int, dict]] = []
+        for line, row in chunk:
+            try:
+                parsed = self._parse_row(row, job["role"], school)
+            except ImportRowError as e:
+                errors.append({"row": line, "email": (row.get("email") or "").strip(), "error": str(e)})
+                continue
+            if parsed["email"] in seen_emails:
+                errors.append({"row": line, "email": parsed["email"], "error": "Duplicate email in file"})
+                continue
+            seen_emails.add(parsed["email"])
+            valid.append((line, parsed))
+
+        # One query per chunk for emails that already have an account
+        existing = set()
+        if valid:
+            existing = set(await self.db.users.distinct("email", {"email": {"$in": [parsed["email"] for _, parsed in valid]}}))
+        new_rows = []
+        for line, parsed in valid:
+            if parsed["email"] in existing:
+                errors.append({"row": line, "email": parsed["email"], "error": "Email already registered"})
+            else:
+                new_rows.append((line, parsed))
+
+        created = 0
+        if new_rows:
+            loop = asyncio.get_running_loop()
+            password_hashes = await asyncio.gather(*[
+                loop.run_in_executor(self._executor, self.password_hasher, parsed["password"])
+                for _, parsed in new_rows
+            ])
+            created, generated, insert_errors = await self._insert_users(job, school, new_rows, password_hashes)
+            errors.extend(insert_errors)
+        else:
+            generated = 0
+
+        if created and self.invalidate:
+            await self.invalidate(IMPORT_CACHE_TAGS[job["role"]])
+        if errors:
+            await self.db.import_job_errors.insert_many([{"job_id": job["id"], **error} for error in errors])
+        await self.db.import_jobs.update_one(
+            {"id": job["id"]},
+            {"$inc": {"processed": len(chunk), "created": created, "failed": len(errors), "generated_passwords": generated}}
+        )
+
+    async def _insert_users(self, job: dict, school: dict, rows: List[Tuple[int, dict]],
+                            password_hashes: List[str]) -> Tuple[int, int, List[dict]]:
+        now = datetime.utcnow()
+        users = []
+        for (_, parsed), password_hash in zip(rows, password_hashes):
+            user = {key: value for key, value in parsed.items() if key not in USER_EXCLUDED_FIELDS}
+            user.update({
+                "id": str(uuid.uuid4()),
+                "password_hash": password_hash,
+                "must_reset_password": parsed["password_generated"],
+                "role": job["role"],
+                "profile_photo_url": None,
+                "created_at": now,
+                "is_active": True,
+                "import_job_id": job["id"]
+            })
+            users.append(user)
+
+        errors = []
+        failed_indexes = set()
+        try:
+            await self.db.users.insert_many(users, ordered=False)
+        except BulkWriteError as e:
+            # The unique email index rejects rows created since the lookup
+            for write_error in e.details.get("writeErrors", []):
+                failed_indexes.add(write_error["index"])
+                line, parsed = rows[write_error["index"]]
+                errors.append({"row": line, "email": parsed["email"], "error": "Email already registered"})
+
+        inserted = [(line, parsed, user) for i, ((line, parsed), user) in enumerate(zip(rows, users)) if i not in failed_indexes]
+        if not inserted:
+            return 0, 0, errors
+
+        credentials = [
+            {"job_id": job["id"], "row": line, "email": parsed["email"], "password": parsed["password"],
+             "expires_at": now + self.credentials_ttl}
+            for line, parsed, _ in inserted if parsed["password_generated"]
+        ]
+        if credentials:
+            await self.db.import_job_credentials.insert_many(credentials, ordered=False)
+
+        if job["role"] == "teacher":
+            await self.db.teachers.insert_many([
+                {
+                    "id": str(uuid.uuid4()),
+                    "user_id": user["id"],
+                    "driving_school_id": school["id"],
+                    "driving_license_url": "",
+                    "teaching_license_url": "",
+                    "photo_url": "",
+                    "can_teach_male": parsed["can_teach_male"],
+                    "can_teach_female": parsed["can_teach_female"],
+                    "rating": 0.0,
+                    "total_reviews": 0,
+                    "is_approved": True,
+                    "created_at": now
+                }
+                for _, parsed, user in inserted
+            ], ordered=False)
+        else:
+            # Imported students join the school the way a self enrollment does
+            enrollments = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "student_id": user["id"],
+                    "driving_school_id": school["id"],
+                    "enrollment_status": "pending_documents",
+                    "created_at": now,
+                    "approved_at": None
+                }
+                for _, _, user in inserted
+            ]
+            await self.db.enrollments.insert_many(enrollments, ordered=False)
+            await self.db.courses.insert_many([
+                course
+                for enrollment in enrollments
+                for course in CourseStateMachine.sequential_course_documents(enrollment["id"], now)
+            ], ordered=False)
+
+        return len(inserted), len(credentials), errors
+
+def _parse_bool(value: Optional[str], column: str) -> bool:
+    if not value:
+        return True
+    if value.lower() in TRUE_VALUES:
+        return True
+    if value.lower() in FALSE_VALUES:
+        return False
+    raise ImportRowError(f"Invalid {column}, use true or false")
+
+class _LineBuffer:
+    def __init__(self):
+        self.value = ""
+
+    def write(self, text: str):
+        self.value = text
+
+def _csv_line(values: List) -> str:
+    buffer = _LineBuffer()
+    csv.writer(buffer).writerow(values)
+    return buffer.value
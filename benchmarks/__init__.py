@@ -0,0 +1,7 @@
+"""Concurrent load benchmarks for the Driving School Platform API
+
+Usage:
+    python -m benchmarks seed --size M --drop
+    python -m benchmarks run --mix mixed --accounts bench_accounts.json --concurrency 50 --duration 30 --output run.json
+    python -m benchmarks compare baseline.json run.json
+"""
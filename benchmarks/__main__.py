@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Command line entry point: python -m benchmarks {seed,run,compare}"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+from datetime import datetime
+
+from .runner import run_load
+from .scenarios import MIXES
+from .compare import compare_reports, format_comparison
+
+# Accounts created by setup_test_data.py. Its teacher has no sessions yet, so
+# teacher_complete_session reports check_failed until some are booked; the
+# accounts written by `seed --accounts-out` come with sessions.
+DEFAULT_ACCOUNTS = {
+    "student": [{"email": "student@test.dz", "password": "student123"}],
+    "manager": [{"email": "manager8@auto-ecoleblidacentreschool.dz", "password": "manager123"}],
+    "teacher": [{"email": "teacher@test.dz", "password": "teacher123"}]
+}
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def run_command(args):
+    accounts = load_json(args.accounts) if args.accounts else DEFAULT_ACCOUNTS
+    print(f"🚀 Running '{args.mix}' mix against {args.base_url} with {args.concurrency} users for {args.duration}s...", file=sys.stderr)
+    report = asyncio.run(run_load(args.base_url, args.mix, args.concurrency, args.duration, accounts, args.seed))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"📄 Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    totals = report["totals"]
+    print(f"✅ {totals['requests']} requests, {totals['throughput_rps']} req/s, "
+          f"p95 {totals['p95_ms']}ms, error rate {totals['error_rate']:.2%}", file=sys.stderr)
+
+def compare_command(args):
+    comparison = compare_reports(load_json(args.baseline), load_json(args.candidate), args.threshold)
+    if args.json:
+        print(json.dumps(comparison, indent=2))
+    else:
+        print(format_comparison(comparison))
+    # Non-zero exit lets CI fail on regressions
+    sys.exit(1 if comparison["regressions"] else 0)
+
+def seed_command(args):
+    # Imported here: it loads the backend modules, which run/compare do not need
+    from .dataset import SIZES, generate_dataset
+
+    sizes = SIZES[args.size]
+    print(f"🌱 Generating a {args.size} dataset ({sizes['schools']} schools, {sizes['students']} students) "
+          f"into {args.database} with seed {args.seed}...", file=sys.stderr)
+    report = asyncio.run(generate_dataset(
+        args.mongo_url, args.database, args.size, seed=args.seed,
+        anchor=datetime.fromisoformat(args.anchor) if args.anchor else None,
+        chunk_size=args.chunk_size, parallelism=args.parallel, drop=args.drop,
+        derived=not args.skip_derived, accounts_out=args.accounts_out
+    ))
+    print(json.dumps(report, indent=2))
+    print(f"✅ {report['total_rows']} rows in {report['insert_seconds']}s ({report['rows_per_second']} rows/s)", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="API load benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run a scenario mix against a server")
+    run_parser.add_argument("--base-url", default="http://localhost:8001", help="Server to load")
+    run_parser.add_argument("--mix", choices=sorted(MIXES), default="mixed", help="Scenario mix")
+    run_parser.add_argument("--concurrency", type=int, default=20, help="Concurrent virtual users")
+    run_parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    run_parser.add_argument("--accounts", help="JSON file of {role: [{email, password}]} to log in with")
+    run_parser.add_argument("--seed", type=int, default=42, help="Random seed for scenario choice")
+    run_parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    run_parser.set_defaults(handler=run_command)
+
+    compare_parser = subparsers.add_parser("compare", help="Diff two JSON reports")
+    compare_parser.add_argument("baseline", help="Report of the reference run")
+    compare_parser.add_argument("candidate", help="Report of the run to check")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    compare_parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    compare_parser.set_defaults(handler=compare_command)
+
+    seed_parser = subparsers.add_parser("seed", help="Generate a synthetic dataset")
+    seed_parser.add_argument("--size", choices=["S", "M", "L", "XL"], default="S", help="Dataset size")
+    seed_parser.add_argument("--seed", type=int, default=42, help="Random seed, same seed gives same data")
+    seed_parser.add_argument("--anchor", help="ISO date the data is relative to, defaults to today")
+    seed_parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"), help="MongoDB to write to")
+    seed_parser.add_argument("--database", default="driving_school_platform", help="Database to write to")
+    seed_parser.add_argument("--chunk-size", type=int, default=1000, help="Documents per insert_many")
+    seed_parser.add_argument("--parallel", type=int, default=4, help="Concurrent insert_many calls")
+    seed_parser.add_argument("--drop", action="store_true", help="Drop the generated collections first")
+    seed_parser.add_argument("--skip-derived", action="store_true", help="Skip rating, payment and availability rebuilds")
+    seed_parser.add_argument("--accounts-out", default="bench_accounts.json", help="Where to write login accounts for run --accounts")
+    seed_parser.set_defaults(handler=seed_command)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
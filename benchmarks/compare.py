@@ -0,0 +1,69 @@
+"""Diff two benchmark reports route by route"""
+
+from typing import Dict, Optional
+
+LATENCY_FIELDS = ["p50_ms", "p95_ms", "p99_ms"]
+
+def _change(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    if before in (None, 0) or after is None:
+        return None
+    return round((after - before) / before * 100, 1)
+
+def compare_reports(baseline: Dict, candidate: Dict, threshold: float = 10.0) -> Dict:
+    """Percent changes per route; a route regresses when a latency percentile
+    grows or throughput drops by more than `threshold` percent, or its error
+    rate increases"""
+    routes = {}
+    regressions = []
+
+    for route in sorted(set(baseline["routes"]) | set(candidate["routes"])):
+        before = baseline["routes"].get(route)
+        after = candidate["routes"].get(route)
+        if not before or not after:
+            routes[route] = {"only_in": "baseline" if before else "candidate"}
+            continue
+
+        diff = {field: {"before": before[field], "after": after[field], "change_pct": _change(before[field], after[field])}
+                for field in LATENCY_FIELDS + ["throughput_rps", "error_rate"]}
+        routes[route] = diff
+
+        slower = [field for field in LATENCY_FIELDS if (diff[field]["change_pct"] or 0) > threshold]
+        if slower or (diff["throughput_rps"]["change_pct"] or 0) < -threshold or after["error_rate"] > before["error_rate"]:
+            regressions.append(route)
+
+    return {
+        "baseline": baseline["meta"],
+        "candidate": candidate["meta"],
+        "threshold_pct": threshold,
+        "totals": {
+            field: {
+                "before": baseline["totals"][field],
+                "after": candidate["totals"][field],
+                "change_pct": _change(baseline["totals"][field], candidate["totals"][field])
+            }
+            for field in ["throughput_rps", "error_rate", "p50_ms", "p95_ms", "p99_ms"]
+        },
+        "routes": routes,
+        "regressions": regressions
+    }
+
+def format_comparison(comparison: Dict) -> str:
+    def cell(values: Dict) -> str:
+        change = values["change_pct"]
+        return f"{values['before']} -> {values['after']}" + (f" ({change:+.1f}%)" if change is not None else "")
+
+    lines = [f"{'route':<55} {'p50 ms':<28} {'p95 ms':<28} {'p99 ms':<28} {'rps':<28}"]
+    for route, diff in comparison["routes"].items():
+        if "only_in" in diff:
+            lines.append(f"{route:<55} only in {diff['only_in']}")
+            continue
+        marker = "⚠️ " if route in comparison["regressions"] else ""
+        lines.append(
+            f"{marker + route:<55} {cell(diff['p50_ms']):<28} {cell(diff['p95_ms']):<28} "
+            f"{cell(diff['p99_ms']):<28} {cell(diff['throughput_rps']):<28}"
+        )
+    lines.append("")
+    lines.append(f"Throughput: {cell(comparison['totals']['throughput_rps'])}")
+    lines.append(f"Error rate: {cell(comparison['totals']['error_rate'])}")
+    lines.append(f"Regressions over {comparison['threshold_pct']}%: {len(comparison['regressions'])}")
+    return "\n".join(lines)
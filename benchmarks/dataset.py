@@ -0,0 +1,461 @@
+"""Deterministic synthetic dataset for performance work
+
+The same seed and anchor date always produce the same documents. Schools
+are spread over ALGERIAN_STATES with a Zipf-like skew towards the big
+wilayas, student demand per school is log-normal, and every reference
+(enrollment -> student/school, course -> enrollment, session -> course and
+teacher, review -> enrollment...) points at a generated document.
+Documents are produced school by school and written in chunked, unordered
+insert_many calls with several collections in flight at once.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from accounts import ALGERIAN_STATES, hash_password
+from course_state import COURSE_SEQUENCE, COURSE_SESSIONS
+from enhanced_payments import EnhancedPaymentService, PaymentMethod
+from availability import AvailabilityService
+from ratings import RatingService
+
+SIZES = {
+    "S": {"schools": 50, "students": 2_000},
+    "M": {"schools": 500, "students": 25_000},
+    "L": {"schools": 2_000, "students": 100_000},
+    "XL": {"schools": 5_000, "students": 400_000}
+}
+
+COLLECTIONS = [
+    "users", "driving_schools", "teachers", "external_experts", "enrollments", "courses",
+    "sessions", "documents", "quizzes", "quiz_attempts", "reviews", "enhanced_payments"
+]
+
+PASSWORD = "benchmark123"
+
+ENROLLMENT_STATUSES = {"pending_documents": 10, "pending_approval": 10, "approved": 60, "completed": 15, "rejected": 5}
+# Review ratings are J-shaped: mostly happy, some very unhappy
+RATING_WEIGHTS = {5: 45, 4: 30, 3: 12, 2: 6, 1: 7}
+PAYMENT_STATUSES = {"completed": 85, "failed": 5, "pending": 5, "refunded": 5}
+PAYMENT_METHODS = [PaymentMethod.BARIDIMOB, PaymentMethod.CCP, PaymentMethod.BANK_TRANSFER, PaymentMethod.CASH]
+STUDENT_DOCUMENTS = ["profile_photo", "id_card", "medical_certificate", "residence_certificate"]
+FIRST_NAMES = ["Amine", "Yacine", "Sofiane", "Karim", "Nassim", "Walid", "Samira", "Amel", "Lina", "Meriem", "Yasmine", "Sara"]
+LAST_NAMES = ["Benali", "Haddad", "Saidi", "Boudiaf", "Mansouri", "Belkacem", "Khelifi", "Djebbar", "Zerrouki", "Touati"]
+
+class DatasetGenerator:
+    def __init__(self, size: str, seed: int = 42, anchor: Optional[datetime] = None):
+        self.size = SIZES[size]
+        self.rng = random.Random(seed)
+        # Everything is dated relative to the anchor so reruns are identical
+        self.anchor = anchor or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.password_hash = hash_password(PASSWORD)
+        self.accounts: Dict[str, List[dict]] = {"student": [], "manager": [], "teacher": [], "external_expert": []}
+        self.quizzes: List[dict] = []
+        self.counters = {"student": 0, "manager": 0, "teacher": 0, "external_expert": 0}
+
+    def _id(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _weighted(self, weights: Dict):
+        return self.rng.choices(list(weights), weights=list(weights.values()))[0]
+
+    def _past(self, max_days: int) -> datetime:
+        return self.anchor - timedelta(days=self.rng.uniform(0, max_days))
+
+    def _user(self, role: str, state: str) -> dict:
+        self.counters[role] += 1
+        number = self.counters[role]
+        gender = "female" if self.rng.random() < 0.4 else "male"
+        user = {
+            "id": self._id(),
+            "email": f"{role}{number}@bench.dz",
+            "password_hash": self.password_hash,
+            "first_name": self.rng.choice(FIRST_NAMES),
+            "last_name": self.rng.choice(LAST_NAMES),
+            "phone": f"05{self.rng.randrange(10**8):08d}",
+            "address": f"{self.rng.randint(1, 200)} Rue {self.rng.choice(LAST_NAMES)}",
+            "date_of_birth": datetime(self.rng.randint(1960, 2006), self.rng.randint(1, 12), self.rng.randint(1, 28)),
+            "gender": gender,
+            "role": role,
+            "state": state,
+            "profile_photo_url": "",
+            "created_at": self._past(720),
+            "is_active": True
+        }
+        # A bounded sample of logins for `python -m benchmarks run --accounts`
+        if len(self.accounts[role]) < 200:
+            self.accounts[role].append({"email": user["email"], "password": PASSWORD})
+        return user
+
+    def school_plan(self) -> List[dict]:
+        """States and student counts of every school"""
+        state_weights = [1 / (rank + 1) ** 0.8 for rank in range(len(ALGERIAN_STATES))]
+        states = ALGERIAN_STATES[:]
+        self.rng.shuffle(states)
+        # Keep the largest wilayas on top regardless of the shuffle
+        for big in ["Alger", "Oran", "Constantine", "Sétif", "Blida"]:
+            if big in states:
+                states.remove(big)
+                states.insert(0, big)
+
+        demand = [self.rng.lognormvariate(0, 0.8) for _ in range(self.size["schools"])]
+        total_demand = sum(demand)
+        return [
+            {
+                "state": self.rng.choices(states, weights=state_weights)[0],
+                "students": max(1, round(self.size["students"] * weight / total_demand))
+            }
+            for weight in demand
+        ]
+
+    def experts_and_quizzes(self) -> Dict[str, List[dict]]:
+        batch = {"users": [], "external_experts": [], "quizzes": []}
+        for _ in range(max(1, self.size["schools"] // 20)):
+            user = self._user("external_expert", self.rng.choice(ALGERIAN_STATES))
+            batch["users"].append(user)
+            batch["external_experts"].append({
+                "id": self._id(),
+                "user_id": user["id"],
+                "specialization": self.rng.choice(COURSE_SEQUENCE),
+                "available_states": self.rng.sample(ALGERIAN_STATES, 3),
+                "certification_number": f"EXP-{self.rng.randrange(10**6):06d}",
+                "years_of_experience": self.rng.randint(2, 30),
+                "rating": 0.0,
+                "total_exams_conducted": 0,
+                "is_available": True,
+                "created_at": self._past(720)
+            })
+
+        for i in range(30):
+            course_type = COURSE_SEQUENCE[i % len(COURSE_SEQUENCE)]
+            quiz = {
+                "id": self._id(),
+                "course_type": course_type,
+                "title": f"{course_type.title()} quiz {i + 1}",
+                "description": "Generated quiz",
+                "difficulty": self.rng.choice(["easy", "medium", "hard"]),
+                "questions": [
+                    {"question": f"Question {q + 1}", "options": ["A", "B", "C", "D"], "correct_answer": self.rng.choice("ABCD")}
+                    for q in range(10)
+                ],
+                "passing_score": 70,
+                "time_limit_minutes": 20,
+                "is_active": True,
+                "created_by": batch["external_experts"][0]["user_id"],
+                "created_at": self._past(365)
+            }
+            batch["quizzes"].append(quiz)
+        self.quizzes = batch["quizzes"]
+        return batch
+
+    def _course_docs(self, enrollment: dict, teachers: List[dict]) -> List[dict]:
+        """Courses consistent with the enrollment's progress through the sequence"""
+        status = enrollment["enrollment_status"]
+        if status == "completed":
+            passed = len(COURSE_SEQUENCE)
+        elif status == "approved":
+            passed = self.rng.randint(0, len(COURSE_SEQUENCE) - 1)
+        else:
+            passed = 0
+
+        courses = []
+        for i, course_type in enumerate(COURSE_SEQUENCE):
+            total = COURSE_SESSIONS[course_type]
+            if i < passed:
+                completed, course_status, exam_status = total, "completed", "passed"
+            elif i == passed and status == "approved":
+                completed = self.rng.randint(0, total)
+                course_status = "completed" if completed >= total else "in_progress" if completed else "available"
+                exam_status = "available" if completed >= total else "not_available"
+            else:
+                completed, course_status, exam_status = 0, "available" if i == 0 and status != "rejected" else "locked", "not_available"
+
+            courses.append({
+                "id": self._id(),
+                "enrollment_id": enrollment["id"],
+                "course_type": course_type,
+                "status": course_status,
+                "teacher_id": self.rng.choice(teachers)["id"] if completed else None,
+                "scheduled_sessions": [],
+                "completed_sessions": completed,
+                "total_sessions": total,
+                "exam_status": exam_status,
+                "exam_score": self.rng.randint(70, 100) if exam_status == "passed" else None,
+                "created_at": enrollment["created_at"],
+                "updated_at": enrollment["created_at"]
+            })
+        return courses
+
+    def _session_docs(self, course: dict, student: dict, teachers: List[dict], enrollment: dict) -> List[dict]:
+        sessions = []
+        teacher = next(teacher for teacher in teachers if teacher["id"] == course["teacher_id"]) if course["teacher_id"] else self.rng.choice(teachers)
+        started = enrollment["approved_at"] or enrollment["created_at"]
+        for n in range(course["completed_sessions"]):
+            scheduled_at = started + timedelta(days=2 * n + 1, hours=self.rng.choice([8, 9, 10, 11, 13, 14, 15]))
+            sessions.append(self._session(course, student, teacher, min(scheduled_at, self.anchor - timedelta(hours=2)), "completed"))
+
+        # Students in the middle of a course have a few upcoming sessions
+        if course["status"] in ["available", "in_progress"] and enrollment["enrollment_status"] == "approved":
+            for n in range(self.rng.randint(0, 2)):
+                scheduled_at = self.anchor + timedelta(days=n + 1 + self.rng.randint(0, 10), hours=self.rng.choice([8, 9, 10, 11, 13, 14, 15]))
+                sessions.append(self._session(course, student, teacher, scheduled_at, "scheduled"))
+        return sessions
+
+    def _session(self, course: dict, student: dict, teacher: dict, scheduled_at: datetime, status: str) -> dict:
+        return {
+            "id": self._id(),
+            "course_id": course["id"],
+            "teacher_id": teacher["id"],
+            "student_id": student["id"],
+            "session_type": course["course_type"],
+            "scheduled_at": scheduled_at,
+            "duration_minutes": 60,
+            "location": "School",
+            "status": status,
+            "notes": None,
+            "created_at": scheduled_at - timedelta(days=3),
+            "updated_at": scheduled_at
+        }
+
+    def school_batch(self, plan: dict) -> Dict[str, List[dict]]:
+        """One school with its manager, teachers, students and their activity"""
+        batch = {name: [] for name in COLLECTIONS}
+        state = plan["state"]
+
+        manager = self._user("manager", state)
+        price = round(self.rng.gauss(30000, 6000) / 500) * 500
+        school = {
+            "id": self._id(),
+            "name": f"Auto Ecole {self.rng.choice(LAST_NAMES)} {self.counters['manager']}",
+            "address": f"{self.rng.randint(1, 200)} Boulevard {self.rng.choice(LAST_NAMES)}, {state}",
+            "state": state,
+            "phone": manager["phone"],
+            "email": f"contact{self.counters['manager']}@bench.dz",
+            "description": "Generated driving school",
+            "price": max(15000, price),
+            "rating": 0.0,
+            "total_reviews": 0,
+            "manager_id": manager["id"],
+            "latitude": round(self.rng.uniform(19.0, 37.0), 6),
+            "longitude": round(self.rng.uniform(-8.0, 12.0), 6),
+            "created_at": self._past(1000)
+        }
+        batch["users"].append(manager)
+        batch["driving_schools"].append(school)
+
+        teachers = []
+        for _ in range(self.rng.randint(3, 12)):
+            user = self._user("teacher", state)
+            batch["users"].append(user)
+            teachers.append({
+                "id": self._id(),
+                "user_id": user["id"],
+                "driving_school_id": school["id"],
+                "driving_license_url": "",
+                "teaching_license_url": "",
+                "photo_url": "",
+                "can_teach_male": True,
+                "can_teach_female": user["gender"] == "female" or self.rng.random() < 0.5,
+                "rating": 0.0,
+                "total_reviews": 0,
+                "is_approved": True,
+                "created_at": school["created_at"]
+            })
+        batch["teachers"].extend(teachers)
+
+        for _ in range(plan["students"]):
+            student = self._user("student", state)
+            batch["users"].append(student)
+
+            status = self._weighted(ENROLLMENT_STATUSES)
+            created_at = self._past(540)
+            enrollment = {
+                "id": self._id(),
+                "student_id": student["id"],
+                "driving_school_id": school["id"],
+                "enrollment_status": status,
+                "created_at": created_at,
+                "approved_at": min(created_at + timedelta(days=self.rng.randint(1, 10)), self.anchor) if status in ["approved", "completed"] else None
+            }
+            batch["enrollments"].append(enrollment)
+
+            courses = self._course_docs(enrollment, teachers)
+            batch["courses"].extend(courses)
+            for course in courses:
+                batch["sessions"].extend(self._session_docs(course, student, teachers, enrollment))
+
+            for document_type in STUDENT_DOCUMENTS:
+                if status == "pending_documents" and self.rng.random() < 0.5:
+                    continue
+                document_status = "accepted" if status in ["approved", "completed"] else self.rng.choice(["pending", "accepted", "refused"])
+                batch["documents"].append({
+                    "id": self._id(),
+                    "user_id": student["id"],
+                    "document_type": document_type,
+                    "file_url": f"/demo-uploads/documents/{document_type}/{student['id']}.jpg",
+                    "file_name": f"{document_type}.jpg",
+                    "file_size": self.rng.randint(50_000, 2_000_000),
+                    "upload_date": created_at,
+                    "is_verified": document_status == "accepted",
+                    "status": document_status,
+                    "refusal_reason": "Unreadable scan" if document_status == "refused" else None
+                })
+
+            if status not in ["approved", "completed"]:
+                continue
+
+            for quiz in self.rng.sample(self.quizzes, self.rng.randint(0, 5)):
+                score = max(0, min(100, round(self.rng.gauss(72, 15))))
+                taken_at = created_at + timedelta(days=self.rng.randint(1, 60))
+                batch["quiz_attempts"].append({
+                    "id": self._id(),
+                    "quiz_id": quiz["id"],
+                    "student_id": student["id"],
+                    "answers": {},
+                    "score": score,
+                    "passed": score >= quiz["passing_score"],
+                    "started_at": taken_at,
+                    "completed_at": taken_at + timedelta(minutes=self.rng.randint(5, 20)),
+                    "time_taken_minutes": self.rng.randint(5, 20)
+                })
+
+            payment_status = self._weighted(PAYMENT_STATUSES)
+            payment_created = enrollment["approved_at"]
+            batch["enhanced_payments"].append({
+                "id": self._id(),
+                "user_id": student["id"],
+                "enrollment_id": enrollment["id"],
+                "school_id": school["id"],
+                "amount": float(school["price"]),
+                "currency": "DZD",
+                "payment_method": self.rng.choice([method.value for method in PAYMENT_METHODS]),
+                "status": payment_status,
+                "description": f"Enrollment payment for {school['name']}",
+                "metadata": {},
+                "expires_at": payment_created + timedelta(hours=24),
+                "created_at": payment_created,
+                "updated_at": payment_created,
+                "payment_attempts": []
+            })
+            enrollment["payment_status"] = payment_status
+
+            if self.rng.random() < 0.35:
+                batch["reviews"].append({
+                    "id": self._id(),
+                    "student_id": student["id"],
+                    "enrollment_id": enrollment["id"],
+                    "driving_school_id": school["id"],
+                    "teacher_id": self.rng.choice(teachers)["id"] if self.rng.random() < 0.5 else None,
+                    "rating": self._weighted(RATING_WEIGHTS),
+                    "comment": "Generated review",
+                    "created_at": created_at + timedelta(days=self.rng.randint(10, 120))
+                })
+        return batch
+
+class ChunkedWriter:
+    """Buffers documents per collection and flushes chunks concurrently"""
+
+    def __init__(self, db, chunk_size: int, parallelism: int):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.semaphore = asyncio.Semaphore(parallelism)
+        self.buffers: Dict[str, List[dict]] = {name: [] for name in COLLECTIONS}
+        self.written: Dict[str, int] = {name: 0 for name in COLLECTIONS}
+        self.pending: set = set()
+        self.max_pending = 4 * parallelism
+
+    async def _insert(self, collection: str, documents: List[dict]):
+        async with self.semaphore:
+            await self.db[collection].insert_many(documents, ordered=False)
+            self.written[collection] += len(documents)
+
+    def _flush(self, collection: str, documents: List[dict]):
+        task = asyncio.ensure_future(self._insert(collection, documents))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def add(self, batch: Dict[str, List[dict]]):
+        for collection, documents in batch.items():
+            buffer = self.buffers[collection]
+            buffer.extend(documents)
+            while len(buffer) >= self.chunk_size:
+                self._flush(collection, buffer[:self.chunk_size])
+                del buffer[:self.chunk_size]
+        # Bound memory: let the writes catch up with generation
+        while len(self.pending) > self.max_pending:
+            await asyncio.wait(self.pending, return_when=asyncio.FIRST_COMPLETED)
+
+    async def close(self):
+        for collection in COLLECTIONS:
+            if self.buffers[collection]:
+                self._flush(collection, self.buffers[collection])
+                self.buffers[collection] = []
+        if self.pending:
+            await asyncio.gather(*self.pending)
+
+class DatasetClient:
+    """Points the services at the seeded database"""
+
+    def __init__(self, client, name):
+        self.driving_school_platform = client[name]
+
+async def generate_dataset(mongo_url: str, database: str, size: str, seed: int = 42, anchor: Optional[datetime] = None,
+                           chunk_size: int = 1000, parallelism: int = 4, drop: bool = False,
+                           derived: bool = True, accounts_out: Optional[str] = None) -> Dict:
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[database]
+    try:
+        if drop:
+            for collection in COLLECTIONS:
+                await db[collection].drop()
+        elif await db.users.estimated_document_count():
+            raise RuntimeError(f"Database {database} is not empty, pass --drop to replace its data")
+
+        generator = DatasetGenerator(size, seed, anchor)
+        writer = ChunkedWriter(db, chunk_size, parallelism)
+        started = time.perf_counter()
+
+        await writer.add(generator.experts_and_quizzes())
+        for plan in generator.school_plan():
+            await writer.add(generator.school_batch(plan))
+        await writer.close()
+        insert_seconds = time.perf_counter() - started
+
+        # Aggregates the API maintains incrementally
+        derived_seconds = 0.0
+        if derived:
+            derived_started = time.perf_counter()
+            services_client = DatasetClient(client, database)
+            await RatingService(services_client).reconcile()
+            await EnhancedPaymentService(services_client).rebuild_payment_rollups()
+            await AvailabilityService(services_client).rebuild(generator.anchor)
+            derived_seconds = time.perf_counter() - derived_started
+
+        if accounts_out:
+            with open(accounts_out, "w") as f:
+                json.dump(generator.accounts, f, indent=2)
+
+        total = sum(writer.written.values())
+        return {
+            "size": size,
+            "seed": seed,
+            "anchor": generator.anchor.isoformat(),
+            "database": database,
+            "rows": writer.written,
+            "total_rows": total,
+            "insert_seconds": round(insert_seconds, 2),
+            "rows_per_second": round(total / insert_seconds) if insert_seconds else None,
+            "derived_seconds": round(derived_seconds, 2)
+        }
+    finally:
+        client.close()
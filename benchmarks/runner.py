@@ -0,0 +1,143 @@
+"""Async load runner: virtual users replay scenarios and record per-route latency"""
+
+import time
+import random
+import asyncio
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from .scenarios import MIXES, SCENARIOS
+
+def percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+class RouteStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.statuses: Dict[str, int] = {}
+
+    def record(self, latency_ms: float, status: Optional[int], checked: bool = True):
+        self.latencies.append(latency_ms)
+        key = str(status) if status is not None else "transport_error"
+        if not checked:
+            key = "check_failed"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        if status is None or status >= 500 or not checked:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        count = len(self.latencies)
+        return {
+            "count": count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 4) if count else 0,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0,
+            "p50_ms": round(percentile(self.latencies, 50), 2) if count else None,
+            "p95_ms": round(percentile(self.latencies, 95), 2) if count else None,
+            "p99_ms": round(percentile(self.latencies, 99), 2) if count else None,
+            "mean_ms": round(sum(self.latencies) / count, 2) if count else None,
+            "statuses": dict(sorted(self.statuses.items()))
+        }
+
+class VirtualUser:
+    """One simulated client; scenarios call request() with a route label"""
+
+    def __init__(self, http: httpx.AsyncClient, stats: Dict[str, RouteStats], accounts: Dict[str, list],
+                 tokens: Dict[str, str], rng: random.Random):
+        self.http = http
+        self.stats = stats
+        self.accounts = accounts
+        self.tokens = tokens
+        self.rng = rng
+        self.token: Optional[str] = None
+
+    async def request(self, method: str, path: str, route: str,
+                      check: Optional[Callable[[httpx.Response], bool]] = None, **kwargs) -> Optional[httpx.Response]:
+        """Timed request; a 200 failing `check` counts as an error, the route did no real work"""
+        headers = kwargs.pop("headers", {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, path, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        checked = check is None or response is None or response.status_code != 200 or check(response)
+        self.stats.setdefault(f"{method} {route}", RouteStats()).record(
+            latency_ms, response.status_code if response is not None else None, checked
+        )
+        return response
+
+    async def login(self, role: str, fresh: bool = False) -> bool:
+        """Log in as a random account of the role, reusing tokens unless fresh"""
+        if not self.accounts.get(role):
+            return False
+        account = self.rng.choice(self.accounts[role])
+        if not fresh and account["email"] in self.tokens:
+            self.token = self.tokens[account["email"]]
+            return True
+
+        self.token = None
+        response = await self.request("POST", "/api/auth/login", "/api/auth/login", json=account)
+        if response is None or response.status_code != 200:
+            return False
+        self.token = self.tokens[account["email"]] = response.json()["access_token"]
+        return True
+
+async def run_load(base_url: str, mix: str, concurrency: int, duration: float,
+                   accounts: Dict[str, list], seed: int = 42) -> Dict:
+    """Drive `concurrency` virtual users through a scenario mix for `duration` seconds"""
+    weights = MIXES[mix]
+    names = list(weights)
+    stats: Dict[str, RouteStats] = {}
+    scenario_runs: Dict[str, int] = {name: 0 for name in names}
+    tokens: Dict[str, str] = {}
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as http:
+        deadline = time.perf_counter() + duration
+
+        async def worker(index: int):
+            rng = random.Random(seed + index)
+            user = VirtualUser(http, stats, accounts, tokens, rng)
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights=[weights[name] for name in names])[0]
+                await SCENARIOS[name](user)
+                scenario_runs[name] += 1
+
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(i) for i in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    total_requests = sum(len(route.latencies) for route in stats.values())
+    total_errors = sum(route.errors for route in stats.values())
+    all_latencies = [latency for route in stats.values() for latency in route.latencies]
+    return {
+        "meta": {
+            "base_url": base_url,
+            "mix": mix,
+            "concurrency": concurrency,
+            "duration_seconds": round(elapsed, 2),
+            "started_at": started_at.isoformat(),
+            "seed": seed
+        },
+        "totals": {
+            "requests": total_requests,
+            "errors": total_errors,
+            "error_rate": round(total_errors / total_requests, 4) if total_requests else 0,
+            "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0,
+            "p50_ms": round(percentile(all_latencies, 50), 2) if all_latencies else None,
+            "p95_ms": round(percentile(all_latencies, 95), 2) if all_latencies else None,
+            "p99_ms": round(percentile(all_latencies, 99), 2) if all_latencies else None
+        },
+        "scenarios": scenario_runs,
+        "routes": {route: route_stats.summary(elapsed) for route, route_stats in sorted(stats.items())}
+    }
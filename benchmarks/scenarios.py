@@ -0,0 +1,89 @@
+"""Traffic scenarios and the mixes that weight them
+
+Each scenario is one visit by a virtual user. Requests are labelled with
+their route template so runs aggregate per endpoint, not per URL.
+"""
+
+STATES = ["Alger", "Oran", "Constantine", "Blida", "Setif", "Tizi Ouzou"]
+
+async def student_morning_login(user):
+    """A student logs in and opens their dashboard and notifications"""
+    if not await user.login("student", fresh=True):
+        return
+    await user.request("GET", "/api/users/me", "/api/users/me")
+    await user.request("GET", "/api/dashboard", "/api/dashboard")
+    await user.request("GET", "/api/dashboard/role/student", "/api/dashboard/role/{role}")
+    await user.request("GET", "/api/notifications/my", "/api/notifications/my")
+    await user.request("GET", "/api/quizzes", "/api/quizzes")
+
+async def manager_review_enrollments(user):
+    """A manager goes through pending enrollments and opens one of them"""
+    if not await user.login("manager"):
+        return
+    response = await user.request("GET", "/api/manager/enrollments", "/api/manager/enrollments")
+    await user.request("GET", "/api/dashboard/role/manager", "/api/dashboard/role/{role}")
+    if response is None or response.status_code != 200:
+        return
+
+    pending = [
+        enrollment for enrollment in response.json().get("enrollments", [])
+        if enrollment.get("enrollment_status") == "pending_approval"
+    ]
+    if pending:
+        student_id = user.rng.choice(pending)["student_id"]
+        await user.request("GET", f"/api/manager/student-details/{student_id}", "/api/manager/student-details/{student_id}")
+
+async def teacher_complete_session(user):
+    """A teacher checks their sessions and completes a scheduled one"""
+    if not await user.login("teacher"):
+        return
+    # An empty list means the account has no sessions and the timing measures nothing
+    response = await user.request("GET", "/api/sessions/my", "/api/sessions/my", check=lambda r: bool(r.json()))
+    await user.request("GET", "/api/dashboard/role/teacher", "/api/dashboard/role/{role}")
+    if response is None or response.status_code != 200:
+        return
+
+    scheduled = [session for session in response.json() if session.get("status") == "scheduled"]
+    if scheduled:
+        session_id = user.rng.choice(scheduled)["id"]
+        await user.request(
+            "POST", f"/api/sessions/{session_id}/complete", "/api/sessions/{session_id}/complete",
+            data={"notes": "Completed during load test"}
+        )
+
+async def catalog_browse(user):
+    """An anonymous visitor searches schools and reads one school's reviews"""
+    user.token = None
+    await user.request("GET", "/api/states", "/api/states")
+    response = await user.request(
+        "GET", "/api/driving-schools", "/api/driving-schools",
+        params={"state": user.rng.choice(STATES)}
+    )
+    if response is None or response.status_code != 200:
+        return
+
+    schools = response.json().get("schools", [])
+    if schools:
+        school_id = user.rng.choice(schools)["id"]
+        await user.request("GET", f"/api/driving-schools/{school_id}", "/api/driving-schools/{school_id}")
+        await user.request("GET", f"/api/reviews/school/{school_id}", "/api/reviews/school/{school_id}")
+
+SCENARIOS = {
+    "student_morning_login": student_morning_login,
+    "manager_review_enrollments": manager_review_enrollments,
+    "teacher_complete_session": teacher_complete_session,
+    "catalog_browse": catalog_browse
+}
+
+# Relative weights of each scenario in a mix
+MIXES = {
+    "morning": {"student_morning_login": 7, "catalog_browse": 2, "manager_review_enrollments": 1},
+    "catalog": {"catalog_browse": 1},
+    "staff": {"manager_review_enrollments": 1, "teacher_complete_session": 1},
+    "mixed": {
+        "student_morning_login": 4,
+        "catalog_browse": 4,
+        "manager_review_enrollments": 1,
+        "teacher_complete_session": 1
+    }
+}
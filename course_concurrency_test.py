@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Concurrency test for atomic course progress updates
+
+Fires parallel session completions at one course through the backend's
+course state machine and checks that no increment is lost. Needs a
+MongoDB at MONGO_URL; uses a throwaway database.
+"""
+
+import os
+import sys
+import uuid
+import asyncio
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+from course_state import CourseStateMachine
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+COMPLETIONS = 100
+
+class ScratchClient:
+    """Points the service at a scratch database instead of the real one"""
+
+    def __init__(self, client, name):
+        self.driving_school_platform = client[name]
+
+async def test_parallel_completions():
+    print(f"🔍 Firing {COMPLETIONS} parallel session completions...")
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    database_name = f"course_concurrency_test_{uuid.uuid4().hex[:8]}"
+    state_machine = CourseStateMachine(ScratchClient(client, database_name))
+    courses = client[database_name].courses
+
+    try:
+        course_id = str(uuid.uuid4())
+        await courses.insert_one({
+            "id": course_id,
+            "enrollment_id": str(uuid.uuid4()),
+            "course_type": "theory",
+            "status": "available",
+            "completed_sessions": 0,
+            "total_sessions": COMPLETIONS // 2,
+            "exam_status": "not_available",
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        })
+
+        results = await asyncio.gather(*[
+            state_machine.complete_session(course_id) for _ in range(COMPLETIONS)
+        ])
+
+        course = await courses.find_one({"id": course_id})
+        counts = sorted(result["completed_sessions"] for result in results)
+
+        assert course["completed_sessions"] == COMPLETIONS, f"Lost increments: {course['completed_sessions']}"
+        assert counts == list(range(1, COMPLETIONS + 1)), "Each completion should observe a distinct count"
+        assert course["status"] == "completed", f"Unexpected status: {course['status']}"
+        assert course["exam_status"] == "available", f"Unexpected exam status: {course['exam_status']}"
+
+        # Threshold flips exactly at total_sessions
+        flipped = [result for result in results if result["status"] == "completed"]
+        assert len(flipped) == COMPLETIONS - COMPLETIONS // 2 + 1, f"Status flipped {len(flipped)} times"
+
+        print(f"✅ {course['completed_sessions']} completions recorded, course completed at threshold")
+        return True
+    finally:
+        await client.drop_database(database_name)
+        client.close()
+
+if __name__ == "__main__":
+    try:
+        passed = asyncio.run(test_parallel_completions())
+    except AssertionError as e:
+        print(f"❌ {e}")
+        passed = False
+    sys.exit(0 if passed else 1)
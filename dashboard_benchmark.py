@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Latency benchmark for the dashboard endpoints
+
+Seeds a scratch database with a student enrolled in several schools and
+compares the previous sequential dashboard queries with the concurrent
+DashboardService on identical data. Needs a MongoDB at MONGO_URL.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+from dashboard import DashboardService
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+
+class ScratchClient:
+    """Points the service at a scratch database instead of the real one"""
+
+    def __init__(self, client, name):
+        self.driving_school_platform = client[name]
+
+async def seed(db, enrollments, courses_per_enrollment, documents, notifications):
+    student_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+
+    schools = [{
+        "id": str(uuid.uuid4()),
+        "name": f"School {i}",
+        "address": f"{i} Rue Didouche Mourad",
+        "state": "Alger",
+        "price": 30000,
+        "manager_id": str(uuid.uuid4())
+    } for i in range(enrollments)]
+    enrollment_docs = [{
+        "id": str(uuid.uuid4()),
+        "student_id": student_id,
+        "driving_school_id": school["id"],
+        "enrollment_status": "approved",
+        "created_at": now
+    } for school in schools]
+    course_docs = [{
+        "id": str(uuid.uuid4()),
+        "enrollment_id": enrollment["id"],
+        "course_type": ["theory", "park", "road"][i % 3],
+        "status": "available",
+        "completed_sessions": 0,
+        "total_sessions": 10
+    } for enrollment in enrollment_docs for i in range(courses_per_enrollment)]
+
+    await db.driving_schools.insert_many(schools)
+    await db.enrollments.insert_many(enrollment_docs)
+    await db.courses.insert_many(course_docs)
+    await db.documents.insert_many([
+        {"id": str(uuid.uuid4()), "user_id": student_id, "document_type": "id_card"} for _ in range(documents)
+    ])
+    await db.notifications.insert_many([
+        {"id": str(uuid.uuid4()), "user_id": student_id, "created_at": now - timedelta(minutes=i)} for i in range(notifications)
+    ])
+
+    for collection, field in [("enrollments", "student_id"), ("courses", "enrollment_id"), ("driving_schools", "id"),
+                              ("documents", "user_id"), ("notifications", "user_id")]:
+        await db[collection].create_index(field)
+
+    return {"id": student_id, "role": "student"}
+
+async def legacy_overview(db, user):
+    """The sequential /dashboard implementation before the composition layer"""
+    data = {"enrollments": [], "documents": [], "notifications": []}
+    enrollments = await db.enrollments.find({"student_id": user["id"]}).to_list(length=None)
+    for enrollment in enrollments:
+        school = await db.driving_schools.find_one({"id": enrollment["driving_school_id"]})
+        if school:
+            enrollment["school_name"] = school["name"]
+            enrollment["school_address"] = school["address"]
+            enrollment["school_state"] = school["state"]
+        data["enrollments"].append(enrollment)
+    data["documents"] = await db.documents.find({"user_id": user["id"]}).to_list(length=None)
+    data["notifications"] = await db.notifications.find({"user_id": user["id"]}).sort("created_at", -1).limit(10).to_list(length=None)
+    return data
+
+async def legacy_student_dashboard(db, user):
+    """The sequential /dashboard/role/student implementation"""
+    enrollments = await db.enrollments.find({"student_id": user["id"]}).to_list(length=None)
+    for enrollment in enrollments:
+        school = await db.driving_schools.find_one({"id": enrollment["driving_school_id"]})
+        enrollment["school_name"] = school["name"] if school else "Unknown School"
+        enrollment["courses"] = await db.courses.find({"enrollment_id": enrollment["id"]}).to_list(length=None)
+    return {"enrollments": enrollments}
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+async def measure(label, func, iterations):
+    await func()  # Warm up connections and caches
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await func()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "name": label,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2)
+    }
+
+async def run_benchmark(args):
+    client = AsyncIOMotorClient(MONGO_URL)
+    database_name = f"dashboard_benchmark_{uuid.uuid4().hex[:8]}"
+    db = client[database_name]
+    service = DashboardService(ScratchClient(client, database_name))
+
+    try:
+        print(f"🌱 Seeding {args.enrollments} enrollments in {database_name}...")
+        user = await seed(db, args.enrollments, args.courses, args.documents, args.notifications)
+
+        # Both implementations must return the same data
+        legacy = await legacy_student_dashboard(db, user)
+        composed = await service.for_role(user, "student")
+        assert [e["id"] for e in legacy["enrollments"]] == [e["id"] for e in composed["enrollments"]]
+        assert all(
+            sorted(c["id"] for c in a["courses"]) == sorted(c["id"] for c in b["courses"])
+            for a, b in zip(legacy["enrollments"], composed["enrollments"])
+        )
+
+        results = [
+            await measure("overview_legacy", lambda: legacy_overview(db, user), args.iterations),
+            await measure("overview_composed", lambda: service.overview(user), args.iterations),
+            await measure("student_legacy", lambda: legacy_student_dashboard(db, user), args.iterations),
+            await measure("student_composed", lambda: service.for_role(user, "student"), args.iterations)
+        ]
+        report = {
+            "enrollments": args.enrollments,
+            "iterations": args.iterations,
+            "results": results,
+            "speedup_p50": {
+                "overview": round(results[0]["p50_ms"] / results[1]["p50_ms"], 2),
+                "student": round(results[2]["p50_ms"] / results[3]["p50_ms"], 2)
+            }
+        }
+        print(json.dumps(report, indent=2))
+        return report
+    finally:
+        await client.drop_database(database_name)
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dashboard latency benchmark")
+    parser.add_argument("--enrollments", type=int, default=20, help="Enrollments for the seeded student")
+    parser.add_argument("--courses", type=int, default=3, help="Courses per enrollment")
+    parser.add_argument("--documents", type=int, default=8, help="Documents for the seeded student")
+    parser.add_argument("--notifications", type=int, default=50, help="Notifications for the seeded student")
+    parser.add_argument("--iterations", type=int, default=200, help="Measured runs per implementation")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args))
@@ -981,7 +981,7 @@ const ManagerDashboard = ({ user, token }) => {
                         <div className="quiz-stats mb-3">
                           <div className="row text-center">
                             <div className="col">
-                              <div className="fw-bold">{quiz.questions?.length || 0}</div>
+                              <div className="fw-bold">{quiz.question_count ?? quiz.questions?.length ?? 0}</div>
                               <div className="small text-muted">Questions</div>
                             </div>
                             <div className="col">
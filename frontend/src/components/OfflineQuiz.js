@@ -1,5 +1,8 @@
 import React, { useState, useEffect, useCallback } from 'react';
 
+// Matches the backend QUIZ_ATTEMPT_BATCH_LIMIT default
+const SYNC_BATCH_SIZE = 200;
+
 const OfflineQuiz = ({ onClose }) => {
   const [quizzes, setQuizzes] = useState([]);
   const [selectedQuiz, setSelectedQuiz] = useState(null);
@@ -8,7 +11,11 @@ const OfflineQuiz = ({ onClose }) => {
   const [timeLeft, setTimeLeft] = useState(0);
   const [quizStarted, setQuizStarted] = useState(false);
   const [quizCompleted, setQuizCompleted] = useState(false);
-  const [score, setScore] = useState(0);
+  // Local result of the built-in practice quiz, server quizzes are graded on sync
+  const [localResult, setLocalResult] = useState(null);
+  const [lastAttemptId, setLastAttemptId] = useState(null);
+  // Server results of synced attempts, keyed by idempotency key
+  const [gradedResults, setGradedResults] = useState({});
   const [isOnline, setIsOnline] = useState(navigator.onLine);
   const [syncStatus, setSyncStatus] = useState('idle'); // idle, syncing, synced, error
 
@@ -53,12 +60,19 @@ const OfflineQuiz = ({ onClose }) => {
       // First try to load from network
       if (isOnline) {
         const token = localStorage.getItem('auth_token');
-        const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/quizzes/theory`, {
-          headers: token ? { 'Authorization': `Bearer ${token}` } : {}
+        const headers = token ? { 'Authorization': `Bearer ${token}` } : {};
+        const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/quizzes?course_type=theory`, {
+          headers
         });
         
         if (response.ok) {
-          const data = await response.json();
+          // The list has summaries only, fetch the questions to take quizzes offline
+          const summaries = await response.json();
+          const loaded = await Promise.all(summaries.map(async (summary) => {
+            const quizResponse = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/quizzes/${summary.id}`, { headers });
+            return quizResponse.ok ? quizResponse.json() : null;
+          }));
+          const data = loaded.filter(Boolean);
           setQuizzes(data);
           // Store in localStorage for offline use
           localStorage.setItem('offline_quizzes', JSON.stringify(data));
@@ -136,13 +150,15 @@ const OfflineQuiz = ({ onClose }) => {
     setTimeLeft(quiz.time_limit_minutes * 60);
     setQuizStarted(true);
     setQuizCompleted(false);
-    setScore(0);
+    setLocalResult(null);
+    setLastAttemptId(null);
   };
 
-  const handleAnswerSelect = (questionId, answer) => {
+  // Answers are keyed by question index, the way the server grades them
+  const handleAnswerSelect = (questionIndex, answer) => {
     setAnswers(prev => ({
       ...prev,
-      [questionId]: answer
+      [questionIndex]: answer
     }));
   };
 
@@ -161,30 +177,29 @@ const OfflineQuiz = ({ onClose }) => {
   const handleQuizSubmit = useCallback(() => {
     if (!selectedQuiz || quizCompleted) return;
 
-    // Calculate score
-    let correctAnswers = 0;
-    selectedQuiz.questions.forEach(question => {
-      if (answers[question.id] === question.correct_answer) {
-        correctAnswers++;
-      }
-    });
-
-    const finalScore = Math.round((correctAnswers / selectedQuiz.questions.length) * 100);
-    setScore(finalScore);
     setQuizCompleted(true);
     setQuizStarted(false);
 
-    // Store result locally for sync when online
+    // Only the built-in practice quiz carries its answers, it never leaves the device
+    if (selectedQuiz.offline) {
+      const correctAnswers = selectedQuiz.questions.filter(
+        (question, index) => answers[index] === question.correct_answer
+      ).length;
+      const finalScore = Math.round((correctAnswers / selectedQuiz.questions.length) * 100);
+      setLocalResult({ score: finalScore, passed: finalScore >= selectedQuiz.passing_score });
+      return;
+    }
+
+    // Students never receive the answer key: the attempt is graded by the server on sync
     const result = {
       id: Date.now().toString(),
       quiz_id: selectedQuiz.id,
       answers: answers,
-      score: finalScore,
-      passed: finalScore >= selectedQuiz.passing_score,
       completed_at: new Date().toISOString(),
       time_taken: (selectedQuiz.time_limit_minutes * 60) - timeLeft,
       offline: !isOnline
     };
+    setLastAttemptId(result.id);
 
     // Store in localStorage for sync
     const storedResults = JSON.parse(localStorage.getItem('offline_quiz_results') || '[]');
@@ -210,27 +225,44 @@ const OfflineQuiz = ({ onClose }) => {
         return;
       }
 
-      for (const result of storedResults) {
-        try {
-          const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/quiz-attempts`, {
-            method: 'POST',
-            headers: {
-              'Authorization': `Bearer ${token}`,
-              'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(result)
-          });
-
-          if (response.ok) {
-            // Remove synced result
-            const updatedResults = storedResults.filter(r => r.id !== result.id);
-            localStorage.setItem('offline_quiz_results', JSON.stringify(updatedResults));
-          }
-        } catch (error) {
-          console.error('Failed to sync individual result:', error);
-        }
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/quizzes/attempts/batch`, {
+        method: 'POST',
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          attempts: storedResults.slice(0, SYNC_BATCH_SIZE).map(result => ({
+            quiz_id: result.quiz_id,
+            answers: result.answers,
+            idempotency_key: result.id,
+            completed_at: result.completed_at,
+            time_taken_minutes: Math.round(result.time_taken / 60)
+          }))
+        })
+      });
+
+      if (!response.ok) {
+        setSyncStatus('error');
+        return;
       }
 
+      // Results are keyed by idempotency key, so a retried sync never double counts.
+      // Only stored attempts leave the queue, rejected ones are kept for a later sync
+      const data = await response.json();
+      setGradedResults(prev => ({
+        ...prev,
+        ...Object.fromEntries(data.results.map(r => [r.idempotency_key, r]))
+      }));
+      const settledIds = new Set(
+        data.results
+          .filter(r => r.status === 'created' || r.status === 'duplicate')
+          .map(r => r.idempotency_key)
+      );
+      const remainingResults = JSON.parse(localStorage.getItem('offline_quiz_results') || '[]')
+        .filter(r => !settledIds.has(r.id));
+      localStorage.setItem('offline_quiz_results', JSON.stringify(remainingResults));
+
       setSyncStatus('synced');
       setTimeout(() => setSyncStatus('idle'), 3000);
     } catch (error) {
@@ -383,7 +415,55 @@ const OfflineQuiz = ({ onClose }) => {
   }
 
   if (quizCompleted) {
-    const passed = score >= selectedQuiz.passing_score;
+    const graded = lastAttemptId ? gradedResults[lastAttemptId] : null;
+    const result = localResult || (graded && graded.score !== undefined
+      ? { score: Math.round(graded.score), passed: graded.passed }
+      : null);
+
+    if (!result) {
+      return (
+        <div className="modal show d-block" style={{backgroundColor: 'rgba(0, 0, 0, 0.5)', zIndex: 9999}}>
+          <div className="modal-dialog modal-dialog-centered">
+            <div className="modal-content">
+              <div className="modal-header bg-secondary text-white">
+                <div className="text-center w-100">
+                  <div style={{fontSize: '4rem'}} className="mb-3">📤</div>
+                  <h2 className="modal-title fs-4 fw-bold">Quiz Submitted</h2>
+                  <p className="mb-0">Result pending sync</p>
+                </div>
+              </div>
+
+              <div className="modal-body text-center">
+                <div className="alert alert-warning d-flex align-items-center">
+                  {syncStatus === 'syncing' ? (
+                    <div className="spinner-border spinner-border-sm me-2"></div>
+                  ) : (
+                    <i className="bi bi-cloud-arrow-up me-2"></i>
+                  )}
+                  <small>
+                    {graded && graded.status === 'not_found'
+                      ? 'This quiz is no longer available, your answers could not be graded.'
+                      : 'Your answers are saved and will be graded once they sync with the server.'}
+                  </small>
+                </div>
+
+                <button
+                  onClick={() => {
+                    setSelectedQuiz(null);
+                    setQuizCompleted(false);
+                  }}
+                  className="btn btn-secondary"
+                >
+                  Back to Quizzes
+                </button>
+              </div>
+            </div>
+          </div>
+        </div>
+      );
+    }
+
+    const { score, passed } = result;
     
     return (
       <div className="modal show d-block" style={{backgroundColor: 'rgba(0, 0, 0, 0.5)', zIndex: 9999}}>
@@ -407,13 +487,6 @@ const OfflineQuiz = ({ onClose }) => {
                 }
               </p>
 
-              {!isOnline && (
-                <div className="alert alert-warning d-flex align-items-center">
-                  <i className="bi bi-phone me-2"></i>
-                  <small>Your result is saved offline and will sync when you're back online.</small>
-                </div>
-              )}
-
               <div className="d-grid gap-2 d-md-flex justify-content-md-center">
                 <button
                   onClick={() => startQuiz(selectedQuiz)}
@@ -479,7 +552,7 @@ const OfflineQuiz = ({ onClose }) => {
                   <label
                     key={index}
                     className={`d-flex align-items-center p-3 border rounded cursor-pointer ${
-                      answers[currentQuestion.id] === option
+                      answers[currentQuestionIndex] === option
                         ? 'border-primary bg-primary bg-opacity-10'
                         : 'border-secondary'
                     }`}
@@ -487,10 +560,10 @@ const OfflineQuiz = ({ onClose }) => {
                   >
                     <input
                       type="radio"
-                      name={`question-${currentQuestion.id}`}
+                      name={`question-${currentQuestionIndex}`}
                       value={option}
-                      checked={answers[currentQuestion.id] === option}
-                      onChange={() => handleAnswerSelect(currentQuestion.id, option)}
+                      checked={answers[currentQuestionIndex] === option}
+                      onChange={() => handleAnswerSelect(currentQuestionIndex, option)}
                       className="form-check-input me-3"
                     />
                     <span>{option}</span>
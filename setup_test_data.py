@@ -90,9 +90,39 @@ def setup_test_data():
         print(f"❌ Driving school creation failed: {school_response.text}")
         return False
     
+    # 4. Add and approve a teacher of the school
+    print("\n4️⃣ Adding teacher...")
+    teacher_data = {
+        "email": "teacher@test.dz",
+        "password": "teacher123",
+        "first_name": "Test",
+        "last_name": "Teacher",
+        "phone": "1234567892",
+        "address": "789 Teacher Street",
+        "date_of_birth": "1985-01-01",
+        "gender": "male",
+        "can_teach_male": True,
+        "can_teach_female": True
+    }
+    
+    teacher_response = requests.post(f"{BASE_URL}/teachers/add",
+                                    json=teacher_data, headers=manager_headers)
+    if teacher_response.status_code != 200:
+        print(f"❌ Teacher creation failed: {teacher_response.text}")
+        return False
+    teacher_id = teacher_response.json()['teacher']['id']
+    
+    approve_response = requests.post(f"{BASE_URL}/teachers/{teacher_id}/approve", headers=manager_headers)
+    if approve_response.status_code == 200:
+        print(f"✅ Teacher added and approved: {teacher_data['email']}")
+    else:
+        print(f"❌ Teacher approval failed: {approve_response.text}")
+        return False
+    
     print("\n✅ Test data setup completed!")
     print(f"Student: {student_data['email']} / student123")
     print(f"Manager: {manager_data['email']} / manager123")
+    print(f"Teacher: {teacher_data['email']} / teacher123")
     print(f"School ID: {school_id}")
     
     return True
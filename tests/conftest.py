@@ -0,0 +1,154 @@
+"""In-process test harness for the Driving School Platform API
+
+Drives the FastAPI app with a TestClient against mongomock, or against a
+scratch database on a real MongoDB when TEST_MONGO_URL is set, and counts
+the MongoDB commands issued so tests can hold endpoints to a query budget.
+"""
+
+import os
+import sys
+import uuid
+from contextlib import contextmanager
+
+import pytest
+import motor.motor_asyncio
+from pymongo import monitoring
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+os.environ.setdefault("PAYMENT_WEBHOOK_WORKER_ENABLED", "false")
+os.environ.setdefault("HTTP_CACHE_ENABLED", "false")
+os.environ.setdefault("ENROLLMENT_CONSISTENCY_WORKER_ENABLED", "false")
+os.environ.setdefault("SHARED_CACHE_ENABLED", "false")
+
+TEST_MONGO_URL = os.environ.get("TEST_MONGO_URL")
+
+# Collection methods that send one command to the server
+COMMAND_METHODS = {
+    "aggregate", "bulk_write", "count_documents", "create_index", "delete_many", "delete_one",
+    "distinct", "estimated_document_count", "find", "find_one", "find_one_and_delete",
+    "find_one_and_replace", "find_one_and_update", "insert_many", "insert_one",
+    "replace_one", "update_many", "update_one"
+}
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts MongoDB commands, fed by pymongo or by the mongomock proxies"""
+
+    def __init__(self):
+        self.commands = []
+
+    def record(self, command_name: str, collection: str = ""):
+        self.commands.append(f"{command_name} {collection}".strip())
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self.record(event.command_name, collection if isinstance(collection, str) else "")
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+command_counter = CommandCounter()
+
+class CountingCollection:
+    """mongomock emits no command events, so count at the collection API"""
+
+    def __init__(self, collection, counter: CommandCounter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name not in COMMAND_METHODS:
+            return attribute
+
+        def counted(*args, **kwargs):
+            self._counter.record(name, self._collection.name)
+            return attribute(*args, **kwargs)
+        return counted
+
+class CountingDatabase:
+    def __init__(self, database, counter: CommandCounter):
+        self._database = database
+        self._counter = counter
+
+    def __getitem__(self, name):
+        return CountingCollection(self._database[name], self._counter)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+class TestDatabaseClient:
+    """Stands in for the Motor client the server and services are built with"""
+
+    def __init__(self, database, motor_client=None):
+        self.driving_school_platform = database
+        self._motor_client = motor_client
+
+    def __getitem__(self, name):
+        return self.driving_school_platform
+
+    def get_database(self, name, **kwargs):
+        if self._motor_client:
+            return self._motor_client.get_database(self.driving_school_platform.name, **kwargs)
+        return self.driving_school_platform
+
+    def close(self):
+        if self._motor_client:
+            self._motor_client.close()
+
+_MotorClient = motor.motor_asyncio.AsyncIOMotorClient
+
+def make_test_client(*args, **kwargs):
+    if TEST_MONGO_URL:
+        listeners = list(kwargs.pop("event_listeners", [])) + [command_counter]
+        motor_client = _MotorClient(TEST_MONGO_URL, event_listeners=listeners, **kwargs)
+        return TestDatabaseClient(motor_client[f"platform_test_{uuid.uuid4().hex[:8]}"], motor_client)
+    return TestDatabaseClient(CountingDatabase(AsyncMongoMockClient().driving_school_platform, command_counter))
+
+# server.py builds its client at import time
+motor.motor_asyncio.AsyncIOMotorClient = make_test_client
+
+class API:
+    def __init__(self, server, client):
+        self.server = server
+        self.client = client
+        self.db = server.db
+
+    def run(self, coroutine_function, *args):
+        """Run a coroutine on the app's event loop, e.g. to seed data"""
+        return self.client.portal.call(coroutine_function, *args)
+
+    def auth_headers(self, user: dict) -> dict:
+        token = self.server.create_access_token({"sub": user["id"]})
+        return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture(scope="session")
+def api():
+    import server
+    from fastapi.testclient import TestClient
+
+    with TestClient(server.app) as client:
+        yield API(server, client)
+        if TEST_MONGO_URL:
+            client.portal.call(server.client._motor_client.drop_database, server.db.name)
+
+@pytest.fixture
+def query_budget():
+    """Fail the test when the block issues more than `budget` MongoDB commands"""
+
+    @contextmanager
+    def within(budget: int):
+        start = len(command_counter.commands)
+        yield
+        issued = command_counter.commands[start:]
+        assert len(issued) <= budget, (
+            f"{len(issued)} MongoDB commands for a budget of {budget}: {issued}"
+        )
+
+    return within
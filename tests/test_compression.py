@@ -0,0 +1,40 @@
+"""Compressed responses carry validators of their own encoding"""
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware
+from http_cache import etag_matches
+
+def make_client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/catalog")
+    async def catalog(request: Request):
+        if etag_matches('"abc123"', request.headers.get("if-none-match", "")):
+            return Response(status_code=304, headers={"etag": '"abc123"'})
+        return JSONResponse({"items": ["x" * 40] * 100}, headers={"etag": '"abc123"'})
+
+    app.add_middleware(CompressionMiddleware)
+    return TestClient(app)
+
+def test_compressed_response_gets_encoded_etag():
+    client = make_client()
+
+    gzipped = client.get("/catalog", headers={"accept-encoding": "gzip"})
+    identity = client.get("/catalog", headers={"accept-encoding": "identity"})
+
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == '"abc123-gzip"'
+    assert identity.headers["etag"] == '"abc123"'
+
+    revalidated = client.get("/catalog", headers={"accept-encoding": "gzip", "if-none-match": gzipped.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == '"abc123-gzip"'
+
+def test_if_none_match_accepts_encoded_etags():
+    assert etag_matches('"abc123"', '"abc123-gzip"')
+    assert etag_matches('"abc123"', '"other", "abc123-br"')
+    assert etag_matches('"abc123"', "*")
+    assert not etag_matches('"abc123"', '"abc124-gzip"')
@@ -0,0 +1,92 @@
+"""Per-user document_state kept in step with document writes"""
+
+import uuid
+from datetime import datetime
+
+from document_state import type_mask
+from tests.test_query_budgets import STUDENT_DOCUMENTS, make_user, seed_school
+
+async def seed_student_with_documents(db, manager: dict) -> dict:
+    """Student enrolled at the manager's school with one pending document per required type"""
+    school = await db.driving_schools.find_one({"manager_id": manager["id"]})
+    student = make_user("student")
+    await db.users.insert_one(student)
+    await db.enrollments.insert_one({
+        "id": str(uuid.uuid4()),
+        "student_id": student["id"],
+        "driving_school_id": school["id"],
+        "enrollment_status": "pending_documents",
+        "created_at": datetime.utcnow()
+    })
+    documents = [
+        {"id": str(uuid.uuid4()), "user_id": student["id"], "document_type": document_type, "status": "pending"}
+        for document_type in STUDENT_DOCUMENTS
+    ]
+    await db.documents.insert_many(documents)
+    student["documents"] = {document["document_type"]: document["id"] for document in documents}
+    return student
+
+def stored_state(api, user_id: str) -> dict:
+    async def read():
+        user = await api.db.users.find_one({"id": user_id})
+        return user["document_state"]
+    return api.run(read)
+
+def test_state_follows_accept_and_refuse(api):
+    manager = api.run(seed_school, api.db, 0)
+    student = api.run(seed_student_with_documents, api.db, manager)
+    headers = api.auth_headers(manager)
+
+    for document_type in STUDENT_DOCUMENTS:
+        response = api.client.post(f"/api/documents/accept/{student['documents'][document_type]}", headers=headers)
+        assert response.status_code == 200
+
+    state = stored_state(api, student["id"])
+    assert state["accepted"] == type_mask(STUDENT_DOCUMENTS)
+    assert (state["pending"], state["refused"]) == (0, 0)
+    assert response.json()["documents_complete"] is True
+
+    response = api.client.post(
+        f"/api/documents/refuse/{student['documents']['id_card']}", data={"reason": "Blurry"}, headers=headers
+    )
+    assert response.status_code == 200
+
+    state = stored_state(api, student["id"])
+    assert state["accepted"] == type_mask(STUDENT_DOCUMENTS) & ~type_mask(["id_card"])
+    assert state["refused"] == type_mask(["id_card"])
+    assert state["counts"]["id_card"] == {"accepted": 0, "pending": 0, "refused": 1}
+
+    # The incremental deltas agree with a rebuild from the documents
+    rebuilt = api.run(api.server.document_states.refresh, [student["id"]])[student["id"]]
+    assert {status: rebuilt[status] for status in ["accepted", "pending", "refused"]} == \
+        {status: state[status] for status in ["accepted", "pending", "refused"]}
+
+def test_enrollment_status_reads_state_once(api, query_budget):
+    manager = api.run(seed_school, api.db, 0)
+    student = api.run(seed_student_with_documents, api.db, manager)
+    api.client.post(
+        f"/api/documents/refuse/{student['documents']['medical_certificate']}",
+        data={"reason": "Expired"},
+        headers=api.auth_headers(manager)
+    )
+
+    # auth, enrollments, refused documents and one school per enrollment
+    with query_budget(4):
+        response = api.client.get("/api/student/enrollment-status", headers=api.auth_headers(student))
+
+    assert response.status_code == 200
+    summary = response.json()["enrollments"][0]["document_summary"]
+    assert (summary["total_uploaded"], summary["total_accepted"], summary["total_refused"]) == (4, 0, 1)
+    assert summary["refused_documents"][0]["refusal_reason"] == "Expired"
+
+def test_rebuild_repairs_drifted_state(api):
+    manager = api.run(seed_school, api.db, 0)
+    student = api.run(seed_student_with_documents, api.db, manager)
+
+    async def drift():
+        await api.db.users.update_one({"id": student["id"]}, {"$set": {"document_state.pending": 0}})
+    api.run(drift)
+
+    api.run(api.server.document_states.rebuild)
+
+    assert stored_state(api, student["id"])["pending"] == type_mask(STUDENT_DOCUMENTS)
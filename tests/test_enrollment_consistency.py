@@ -0,0 +1,85 @@
+"""Set-based repair of pending_documents enrollments"""
+
+import uuid
+from datetime import datetime
+
+import pytest
+
+from tests.test_query_budgets import STUDENT_DOCUMENTS, make_user
+
+async def seed_pending(db, students: int) -> dict:
+    """Students with pending_documents enrollments, every other one with all documents accepted"""
+    admin = make_user("admin")
+    await db.users.insert_one(admin)
+    complete, incomplete = [], []
+    for i in range(students):
+        student = make_user("student")
+        await db.users.insert_one(student)
+        # Some students are enrolled at two schools
+        await db.enrollments.insert_many([
+            {
+                "id": str(uuid.uuid4()),
+                "student_id": student["id"],
+                "driving_school_id": str(uuid.uuid4()),
+                "enrollment_status": "pending_documents",
+                "created_at": datetime.utcnow()
+            }
+            for _ in range(1 + i % 3 // 2)
+        ])
+        document_types = STUDENT_DOCUMENTS if i % 2 == 0 else STUDENT_DOCUMENTS[:-1]
+        await db.documents.insert_many([
+            {"id": str(uuid.uuid4()), "user_id": student["id"], "document_type": document_type, "status": "accepted"}
+            for document_type in document_types
+        ])
+        (complete if i % 2 == 0 else incomplete).append(student["id"])
+    return {"admin": admin, "complete": complete, "incomplete": incomplete}
+
+def enrollment_statuses(api, student_ids: list) -> set:
+    async def statuses():
+        return set(await api.db.enrollments.distinct("enrollment_status", {"student_id": {"$in": student_ids}}))
+    return api.run(statuses)
+
+@pytest.mark.parametrize("students", [2, 40])
+def test_fix_enrollment_status_budget(api, query_budget, students):
+    seeded = api.run(seed_pending, api.db, students)
+    service = api.server.enrollment_consistency
+    scope = seeded["complete"] + seeded["incomplete"]
+
+    dry_run = api.run(lambda: service.repair(student_ids=scope, dry_run=True))
+    assert dry_run["eligible_students"] == len(seeded["complete"])
+    assert dry_run["fixed_enrollments"] == 0
+    assert enrollment_statuses(api, scope) == {"pending_documents"}
+
+    with query_budget(6):
+        response = api.client.post("/api/admin/fix-enrollment-status", headers=api.auth_headers(seeded["admin"]))
+
+    assert response.status_code == 200
+    assert enrollment_statuses(api, seeded["complete"]) == {"pending_approval"}
+    assert enrollment_statuses(api, seeded["incomplete"]) == {"pending_documents"}
+
+    async def notifications():
+        return await api.db.notifications.count_documents({"user_id": {"$in": scope}, "type": "status_corrected"})
+    assert api.run(notifications) == len(seeded["complete"])
+
+def test_incremental_run_picks_up_reviewed_documents(api):
+    service = api.server.enrollment_consistency
+    api.run(service.run_incremental)
+    seeded = api.run(seed_pending, api.db, 2)
+    student_id = seeded["incomplete"][0]
+
+    assert api.run(service.run_incremental)["fixed_enrollments"] == 1
+    assert api.run(service.run_incremental)["eligible_enrollments"] == 0
+
+    async def accept_last_document():
+        await api.db.documents.insert_one({
+            "id": str(uuid.uuid4()),
+            "user_id": student_id,
+            "document_type": STUDENT_DOCUMENTS[-1],
+            "status": "accepted",
+            "reviewed_at": datetime.utcnow()
+        })
+    api.run(accept_last_document)
+
+    report = api.run(service.run_incremental)
+    assert report["fixed_enrollments"] == 1
+    assert enrollment_statuses(api, [student_id]) == {"pending_approval"}
@@ -0,0 +1,51 @@
+"""Expert calendars"""
+
+import uuid
+from datetime import datetime, timedelta
+
+def exam(expert_id: str, scheduled_at: datetime, status: str = "available") -> dict:
+    return {
+        "id": str(uuid.uuid4()), "external_expert_id": expert_id, "scheduled_at": scheduled_at,
+        "duration_minutes": 90, "status": status, "created_at": datetime.utcnow() - timedelta(days=1)
+    }
+
+def test_reserve_checks_the_next_day_across_midnight(api):
+    service = api.server.expert_assignment
+    expert_id = str(uuid.uuid4())
+    midnight = datetime(2031, 5, 2)
+
+    assert api.run(service.reserve, expert_id, "early", midnight + timedelta(minutes=30), midnight + timedelta(hours=2))
+    # 23:00 to 00:30 runs into the exam of the next day
+    assert not api.run(service.reserve, expert_id, "late", midnight - timedelta(hours=1), midnight + timedelta(minutes=31))
+    # Its reservation of the first day was rolled back
+    assert api.run(api.db.expert_calendars.find_one, {"_id": f"{expert_id}:2031-05-01"})["slots"] == []
+
+    assert api.run(service.reserve, expert_id, "late", midnight - timedelta(hours=1), midnight + timedelta(minutes=30))
+    api.run(service.release, expert_id, "late", midnight - timedelta(hours=1))
+    assert api.run(api.db.expert_calendars.find_one, {"_id": f"{expert_id}:2031-05-01"})["slots"] == []
+
+def test_rebuild_keeps_active_exams_only(api):
+    service = api.server.expert_assignment
+    expert_id = str(uuid.uuid4())
+    midnight = datetime(2031, 6, 2)
+    overnight = exam(expert_id, midnight - timedelta(hours=1))
+    api.run(api.db.exam_schedules.insert_many, [
+        overnight,
+        exam(expert_id, midnight + timedelta(hours=10), "passed"),
+        exam(expert_id, midnight + timedelta(hours=12), "failed")
+    ])
+
+    api.run(service.rebuild_calendars)
+
+    calendars = api.run(lambda: api.db.expert_calendars.find({"expert_id": expert_id}).sort("day", 1).to_list(length=None))
+    assert [(calendar["day"], [slot["exam_id"] for slot in calendar["slots"]]) for calendar in calendars] == [
+        (midnight - timedelta(days=1), [overnight["id"]]),
+        (midnight, [overnight["id"]])
+    ]
+    # Booked after the rebuild started, reserved on the new calendars
+    booked = exam(expert_id, midnight + timedelta(hours=14))
+    booked["created_at"] = datetime.utcnow() + timedelta(seconds=1)
+    api.run(api.db.exam_schedules.insert_one, booked)
+    api.run(service.rebuild_calendars)
+    day = api.run(api.db.expert_calendars.find_one, {"_id": f"{expert_id}:2031-06-02"})
+    assert (day["exam_count"], len(day["slots"])) == (2, 2)
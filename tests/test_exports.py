@@ -0,0 +1,105 @@
+"""Streaming exports of school operational data"""
+
+import csv
+import io
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.test_query_budgets import make_user, seed_school
+
+async def seed_sessions_and_payments(db, manager: dict, count: int):
+    school = await db.driving_schools.find_one({"manager_id": manager["id"]})
+    teacher_user = make_user("teacher")
+    teacher = {"id": str(uuid.uuid4()), "user_id": teacher_user["id"], "driving_school_id": school["id"]}
+    await db.users.insert_one(teacher_user)
+    await db.teachers.insert_one(teacher)
+
+    enrollments = await db.enrollments.find({"driving_school_id": school["id"]}).to_list(length=None)
+    start = datetime(2026, 3, 1, 9)
+    for i, enrollment in enumerate(enrollments[:count]):
+        await db.sessions.insert_one({
+            "id": str(uuid.uuid4()),
+            "teacher_id": teacher["id"],
+            "student_id": enrollment["student_id"],
+            "session_type": "theory",
+            "scheduled_at": start + timedelta(days=i),
+            "duration_minutes": 60,
+            "location": "Salle 1",
+            "status": "scheduled"
+        })
+        await db.enhanced_payments.insert_one({
+            "id": str(uuid.uuid4()),
+            "user_id": enrollment["student_id"],
+            "enrollment_id": enrollment["id"],
+            "school_id": school["id"],
+            "amount": 30000.0,
+            "currency": "DZD",
+            "payment_method": "cash",
+            "status": "completed",
+            "refund_status": "not_requested",
+            "created_at": start + timedelta(days=i)
+        })
+        course_id = str(uuid.uuid4())
+        await db.courses.insert_one({"id": course_id, "enrollment_id": enrollment["id"], "course_type": "theory"})
+        await db.exam_schedules.insert_one({
+            "id": str(uuid.uuid4()),
+            "course_id": course_id,
+            "student_id": enrollment["student_id"],
+            "exam_type": "theory",
+            "scheduled_at": start + timedelta(days=30 + i),
+            "status": "passed",
+            "score": 32
+        })
+
+def read_csv(response) -> list:
+    return list(csv.DictReader(io.StringIO(response.text)))
+
+def test_enrollment_export_batches_lookups(api, query_budget, monkeypatch):
+    monkeypatch.setattr(api.server.export_service, "batch_size", 10)
+    manager = api.run(seed_school, api.db, 25)
+
+    # auth, school, the cursor and one user lookup per batch of 10
+    with query_budget(6):
+        response = api.client.get("/api/manager/exports/enrollments", headers=api.auth_headers(manager))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = read_csv(response)
+    assert len(rows) == 25
+    assert all(row["student_name"].startswith("Student") and row["school_name"] == "Auto Ecole Test" for row in rows)
+
+def test_session_payment_and_exam_exports(api):
+    manager = api.run(seed_school, api.db, 5)
+    api.run(seed_sessions_and_payments, api.db, manager, 5)
+
+    sessions = api.client.get(
+        "/api/manager/exports/sessions?start=2026-03-02&end=2026-03-04", headers=api.auth_headers(manager)
+    )
+    payments = api.client.get("/api/manager/exports/payments", headers=api.auth_headers(manager))
+    exams = api.client.get("/api/manager/exports/exams", headers=api.auth_headers(manager))
+
+    assert [row["scheduled_at"] for row in read_csv(sessions)] == ["2026-03-02T09:00:00", "2026-03-03T09:00:00"]
+    assert all(row["teacher_name"].startswith("Teacher") for row in read_csv(sessions))
+    assert [float(row["amount"]) for row in read_csv(payments)] == [30000.0] * 5
+    assert [(row["status"], row["score"]) for row in read_csv(exams)] == [("passed", "32")] * 5
+
+def test_export_rejects_unknown_dataset(api):
+    manager = api.run(seed_school, api.db, 0)
+
+    response = api.client.get("/api/manager/exports/users", headers=api.auth_headers(manager))
+
+    assert response.status_code == 404
+
+def test_parquet_export(api, monkeypatch):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(api.server.export_service, "batch_size", 2)
+    manager = api.run(seed_school, api.db, 5)
+
+    response = api.client.get("/api/manager/exports/enrollments?format=parquet", headers=api.auth_headers(manager))
+
+    assert response.status_code == 200
+    table = parquet.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 5
+    assert parquet.ParquetFile(io.BytesIO(response.content)).num_row_groups == 3
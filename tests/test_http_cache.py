@@ -0,0 +1,25 @@
+"""Cache policies of the public catalog routes"""
+
+import uuid
+
+from http_cache import DEFAULT_POLICIES, ResponseCache
+from tests.test_query_budgets import seed_school
+
+def test_school_policy_matches_ids_only(api):
+    cache = ResponseCache(api.server.client, DEFAULT_POLICIES)
+
+    assert cache.policy_for(f"/api/driving-schools/{uuid.uuid4()}").tags == ["schools"]
+    for path in ["/api/driving-schools/search-suggestions", "/api/driving-schools/filters/stats"]:
+        assert cache.policy_for(path) is None
+
+def test_search_suggestions_not_cached(api):
+    manager = api.run(seed_school, api.db, 0)
+    school = api.run(api.db.driving_schools.find_one, {"manager_id": manager["id"]})
+
+    suggestions = api.client.get("/api/driving-schools/search-suggestions", params={"q": "Auto"})
+    details = api.client.get(f"/api/driving-schools/{school['id']}")
+
+    assert suggestions.status_code == 200
+    assert "etag" not in suggestions.headers
+    assert "public" not in suggestions.headers.get("cache-control", "")
+    assert details.headers["cache-control"] == "public, max-age=300"
@@ -0,0 +1,43 @@
+"""Daily payment rollups and their rebuild fence"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+def test_rebuild_gives_up_when_writers_do_not_drain(api, monkeypatch):
+    service = api.server.payment_service
+    monkeypatch.setattr(service, "rollup_writer_lease_seconds", 0)
+    monkeypatch.setattr(service, "rollup_fence_wait_seconds", 0)
+    stuck = {"token": str(uuid.uuid4()), "expires_at": datetime.utcnow() + timedelta(hours=1)}
+    api.run(api.db.payment_rollup_fence.update_one, {"_id": "rebuild"}, {"$push": {"writers": stuck}}, True)
+
+    try:
+        with pytest.raises(RuntimeError):
+            api.run(service.rebuild_payment_rollups)
+        assert "owner" not in api.run(api.db.payment_rollup_fence.find_one, {"_id": "rebuild"})
+    finally:
+        api.run(api.db.payment_rollup_fence.update_one, {"_id": "rebuild"}, {"$pull": {"writers": {"token": stuck["token"]}}})
+
+    # The fence came down, so payment writes go through again
+    async def write():
+        async with service._rollup_writer():
+            pass
+    api.run(write)
+
+def test_rollups_are_backfilled_once(api):
+    service = api.server.payment_service
+    school_id = str(uuid.uuid4())
+    day = datetime(2024, 3, 5)
+    payment = {"id": str(uuid.uuid4()), "school_id": school_id, "status": "completed", "amount": 1500,
+               "created_at": day + timedelta(hours=10)}
+    api.run(api.db.enhanced_payments.insert_one, payment)
+    api.run(api.db.payment_rollup_fence.update_one, {"_id": "rebuild"}, {"$unset": {"rebuilt_at": ""}})
+
+    api.run(service.backfill_payment_rollups)
+    bucket = api.run(api.db.payment_stats_daily.find_one, {"school_id": school_id})
+    assert (bucket["day"], bucket["count"], bucket["amount"]) == (day, 1, 1500)
+
+    api.run(api.db.enhanced_payments.insert_one, {**payment, "_id": str(uuid.uuid4()), "id": str(uuid.uuid4())})
+    api.run(service.backfill_payment_rollups)
+    assert api.run(api.db.payment_stats_daily.find_one, {"school_id": school_id})["count"] == 1
@@ -0,0 +1,35 @@
+"""Webhook event replay"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+def seed_events(api) -> str:
+    """A processed and a failed event of a new payment"""
+    payment_id = str(uuid.uuid4())
+    received_at = datetime.utcnow() - timedelta(hours=1)
+    api.run(api.db.payment_webhook_events.insert_many, [
+        {"id": f"{payment_id}:{status}", "event_key": f"gateway:{payment_id}:{status}", "payment_id": payment_id,
+         "status": status, "attempts": 1, "received_at": received_at}
+        for status in ["processed", "failed"]
+    ])
+    return payment_id
+
+def test_replay_requires_a_filter(api):
+    seed_events(api)
+    service = api.server.payment_service
+
+    with pytest.raises(ValueError):
+        api.run(service.replay_webhook_events)
+    with pytest.raises(ValueError):
+        api.run(service.replay_webhook_events, None, None, None, "processed")
+
+def test_replay_skips_processed_events_by_default(api):
+    payment_id = seed_events(api)
+    service = api.server.payment_service
+
+    assert api.run(service.replay_webhook_events, None, payment_id) == 1
+    assert api.run(api.db.payment_webhook_events.find_one, {"id": f"{payment_id}:processed"})["status"] == "processed"
+
+    assert api.run(service.replay_webhook_events, None, payment_id, None, None, True) == 2
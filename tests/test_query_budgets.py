@@ -0,0 +1,189 @@
+"""Query budgets: endpoints must not issue a query per returned row"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from document_state import type_mask
+
+STUDENT_DOCUMENTS = ["profile_photo", "id_card", "medical_certificate", "residence_certificate"]
+
+def accepted_state(document_types: list) -> dict:
+    """document_state of a user whose documents of these types are accepted"""
+    return {
+        "accepted": type_mask(document_types),
+        "pending": 0,
+        "refused": 0,
+        "counts": {document_type: {"accepted": 1} for document_type in document_types}
+    }
+
+def make_user(role: str) -> dict:
+    user_id = str(uuid.uuid4())
+    return {
+        "id": user_id,
+        "email": f"{role}-{user_id[:8]}@example.com",
+        "first_name": role.title(),
+        "last_name": user_id[:8],
+        "phone": "0555000000",
+        "role": role,
+        "created_at": datetime.utcnow()
+    }
+
+async def seed_school(db, students: int) -> dict:
+    manager = make_user("manager")
+    school = {
+        "id": str(uuid.uuid4()),
+        "name": "Auto Ecole Test",
+        "address": "1 Rue Didouche Mourad",
+        "state": "Alger",
+        "price": 30000,
+        "manager_id": manager["id"],
+        "created_at": datetime.utcnow()
+    }
+    await db.users.insert_one(manager)
+    await db.driving_schools.insert_one(school)
+
+    now = datetime.utcnow()
+    for i in range(students):
+        student = make_user("student")
+        # Every other student has all documents accepted
+        student["document_state"] = accepted_state(STUDENT_DOCUMENTS if i % 2 == 0 else [])
+        await db.users.insert_one(student)
+        await db.enrollments.insert_one({
+            "id": str(uuid.uuid4()),
+            "student_id": student["id"],
+            "driving_school_id": school["id"],
+            "enrollment_status": "pending_approval",
+            "created_at": now - timedelta(minutes=i)
+        })
+        if i % 2 == 0:
+            await db.documents.insert_many([
+                {"id": str(uuid.uuid4()), "user_id": student["id"], "document_type": document_type, "status": "accepted"}
+                for document_type in STUDENT_DOCUMENTS
+            ])
+    return manager
+
+async def seed_student(db, enrollments: int) -> dict:
+    student = make_user("student")
+    await db.users.insert_one(student)
+    for _ in range(enrollments):
+        school_id = str(uuid.uuid4())
+        enrollment_id = str(uuid.uuid4())
+        await db.driving_schools.insert_one({
+            "id": school_id, "name": "School", "address": "Address", "state": "Oran", "price": 25000
+        })
+        await db.enrollments.insert_one({
+            "id": enrollment_id,
+            "student_id": student["id"],
+            "driving_school_id": school_id,
+            "enrollment_status": "approved",
+            "created_at": datetime.utcnow()
+        })
+        await db.courses.insert_one({
+            "id": str(uuid.uuid4()), "enrollment_id": enrollment_id, "course_type": "theory", "status": "available"
+        })
+    return student
+
+async def school_enrollment_ids(db, manager: dict) -> list:
+    school = await db.driving_schools.find_one({"manager_id": manager["id"]})
+    return await db.enrollments.distinct("id", {"driving_school_id": school["id"]})
+
+@pytest.mark.parametrize("students", [1, 30])
+def test_manager_enrollments_budget(api, query_budget, students):
+    manager = api.run(seed_school, api.db, students)
+
+    with query_budget(4):
+        response = api.client.get("/api/manager/enrollments", headers=api.auth_headers(manager))
+
+    assert response.status_code == 200
+    enrollments = response.json()["enrollments"]
+    assert len(enrollments) == students
+    assert all(enrollment["student_name"].startswith("Student") for enrollment in enrollments)
+    assert sum(enrollment["documents_verified"] for enrollment in enrollments) == (students + 1) // 2
+
+@pytest.mark.parametrize("enrollments", [1, 20])
+def test_student_dashboard_budget(api, query_budget, enrollments):
+    student = api.run(seed_student, api.db, enrollments)
+
+    with query_budget(4):
+        response = api.client.get("/api/dashboard/role/student", headers=api.auth_headers(student))
+
+    assert response.status_code == 200
+    assert len(response.json()["enrollments"]) == enrollments
+    assert all(len(enrollment["courses"]) == 1 for enrollment in response.json()["enrollments"])
+
+def test_budget_catches_per_row_queries(api, query_budget):
+    manager = api.run(seed_school, api.db, 3)
+
+    async def per_row_lookups():
+        school = await api.db.driving_schools.find_one({"manager_id": manager["id"]})
+        enrollments = await api.db.enrollments.find({"driving_school_id": school["id"]}).to_list(length=None)
+        for enrollment in enrollments:
+            await api.db.users.find_one({"id": enrollment["student_id"]})
+
+    with pytest.raises(AssertionError, match="budget of 2"):
+        with query_budget(2):
+            api.run(per_row_lookups)
+
+@pytest.mark.parametrize("students", [1, 30])
+def test_bulk_accept_budget(api, query_budget, students):
+    manager = api.run(seed_school, api.db, students)
+    enrollment_ids = api.run(school_enrollment_ids, api.db, manager) + ["missing-id"]
+
+    # Includes the read-back of the guarded writes, the document state refresh of the
+    # accepted students and the enrollments cache version bump
+    with query_budget(12):
+        response = api.client.post(
+            "/api/manager/enrollments/bulk-decision",
+            json={"action": "accept", "enrollment_ids": enrollment_ids},
+            headers=api.auth_headers(manager)
+        )
+
+    assert response.status_code == 200
+    statuses = [result["status"] for result in response.json()["results"]]
+    assert statuses.count("accepted") == (students + 1) // 2
+    assert statuses.count("missing_documents") == students // 2
+    assert statuses[-1] == "not_found"
+
+    async def notified():
+        return await api.db.notifications.count_documents({"metadata.enrollment_id": {"$in": enrollment_ids}})
+    assert api.run(notified) == (students + 1) // 2
+
+def test_bulk_decision_skips_enrollments_decided_meanwhile(api, monkeypatch):
+    manager = api.run(seed_school, api.db, 4)
+    enrollment_ids = api.run(school_enrollment_ids, api.db, manager)
+    get_many = api.server.document_states.get_many
+
+    async def rejected_meanwhile(student_ids):
+        states = await get_many(student_ids)
+        # Another manager request rejects every enrollment after the bulk read
+        await api.db.enrollments.update_many({"id": {"$in": enrollment_ids}}, {"$set": {"enrollment_status": "rejected"}})
+        return states
+    monkeypatch.setattr(api.server.document_states, "get_many", rejected_meanwhile)
+
+    response = api.client.post(
+        "/api/manager/enrollments/bulk-decision",
+        json={"action": "accept", "enrollment_ids": enrollment_ids},
+        headers=api.auth_headers(manager)
+    )
+
+    assert response.status_code == 200
+    assert response.json()["processed"] == 0
+    assert {result["status"] for result in response.json()["results"]} == {"conflict", "missing_documents"}
+    assert api.run(api.db.enrollments.distinct, "enrollment_status", {"id": {"$in": enrollment_ids}}) == ["rejected"]
+    assert api.run(api.db.notifications.count_documents, {"metadata.enrollment_id": {"$in": enrollment_ids}}) == 0
+
+def test_bulk_decision_rejects_other_managers(api):
+    owner = api.run(seed_school, api.db, 2)
+    other = api.run(seed_school, api.db, 0)
+
+    response = api.client.post(
+        "/api/manager/enrollments/bulk-decision",
+        json={"action": "refuse", "enrollment_ids": api.run(school_enrollment_ids, api.db, owner), "reason": "Incomplete file"},
+        headers=api.auth_headers(other)
+    )
+
+    assert response.status_code == 200
+    assert response.json()["processed"] == 0
+    assert {result["status"] for result in response.json()["results"]} == {"forbidden"}
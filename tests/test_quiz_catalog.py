@@ -0,0 +1,28 @@
+"""Quiz grading against the encoded answer keys"""
+
+import uuid
+
+def test_grade_many_counts_correct_options(api):
+    quiz_id = str(uuid.uuid4())
+    api.run(api.db.quizzes.insert_one, {
+        "id": quiz_id, "course_type": "theory", "title": "Signs", "is_active": True,
+        "questions": [
+            {"question": "Stop?", "options": ["Red", "Green"], "correct_answer": "Red"},
+            {"question": "Limit?", "options": ["40", "50"], "correct_answer": "50"},
+            # A key outside the options is still matched by value
+            {"question": "Lights?", "options": ["Never"], "correct_answer": "Outside urban areas"},
+            {"question": "No key", "options": ["A", "B"]}
+        ]
+    })
+    catalog = api.server.quiz_catalog
+    api.run(catalog.invalidate)
+
+    counts = api.run(catalog.grade_many, quiz_id, [
+        {"0": "Red", "1": "50", "2": "Outside urban areas", "3": "A"},
+        {"0": "Green", "1": "50"},
+        {},
+        {"0": "Nonsense", "1": ["50"], "9": "Red"}
+    ])
+
+    assert counts.tolist() == [3, 1, 0, 0]
+    assert api.run(catalog.grade, quiz_id, {"0": "Red"}) == (1, 4)
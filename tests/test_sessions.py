@@ -0,0 +1,179 @@
+"""Session lifecycle endpoints"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from availability import WORD_BITS, WORD_MASK
+from scheduling import ScheduleConflictError
+from tests.test_query_budgets import make_user, seed_school
+
+async def seed_session(db, manager: dict) -> dict:
+    """Scheduled session of a teacher of the manager's school, with its users"""
+    school = await db.driving_schools.find_one({"manager_id": manager["id"]})
+    teacher_user, student = make_user("teacher"), make_user("student")
+    teacher = {"id": str(uuid.uuid4()), "user_id": teacher_user["id"], "driving_school_id": school["id"]}
+    await db.users.insert_many([teacher_user, student])
+    await db.teachers.insert_one(teacher)
+    session = {
+        "id": str(uuid.uuid4()),
+        "teacher_id": teacher["id"],
+        "student_id": student["id"],
+        "session_type": "theory",
+        "scheduled_at": datetime.utcnow() + timedelta(days=2),
+        "duration_minutes": 60,
+        "status": "scheduled"
+    }
+    await db.sessions.insert_one(dict(session))
+    return {"session": session, "teacher": teacher_user, "student": student}
+
+@pytest.fixture
+def no_slot_release(api, monkeypatch):
+    """mongomock has no $bit, the bitmap release is covered by its own tests"""
+    async def release(session, since=None):
+        pass
+    monkeypatch.setattr(api.server.availability_service, "release", release)
+
+@pytest.mark.parametrize("canceller", ["teacher", "student", "manager"])
+def test_participants_and_school_manager_cancel(api, no_slot_release, canceller):
+    manager = api.run(seed_school, api.db, 0)
+    seeded = api.run(seed_session, api.db, manager)
+    user = manager if canceller == "manager" else seeded[canceller]
+
+    response = api.client.post(f"/api/sessions/{seeded['session']['id']}/cancel", headers=api.auth_headers(user))
+
+    assert response.status_code == 200
+
+def test_other_schools_cannot_cancel(api, no_slot_release):
+    seeded = api.run(seed_session, api.db, api.run(seed_school, api.db, 0))
+    other_manager = api.run(seed_school, api.db, 0)
+    other_teacher = api.run(seed_session, api.db, other_manager)["teacher"]
+
+    for user in [other_manager, other_teacher]:
+        response = api.client.post(f"/api/sessions/{seeded['session']['id']}/cancel", headers=api.auth_headers(user))
+        assert response.status_code == 403
+
+def test_teacher_lists_own_sessions(api):
+    seeded = api.run(seed_session, api.db, api.run(seed_school, api.db, 0))
+
+    response = api.client.get("/api/sessions/my", headers=api.auth_headers(seeded["teacher"]))
+
+    assert response.status_code == 200
+    assert [session["id"] for session in response.json()] == [seeded["session"]["id"]]
+
+class BitmapWrites:
+    """Records teacher_availability writes, mongomock has no $bit"""
+
+    def __init__(self):
+        self.cleared = {}
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            bits = operation._doc["$bit"]
+            self.cleared[operation._filter["_id"]] = [
+                WORD_MASK ^ bits[field]["and"] for field in ("booked_low", "booked_high")
+            ]
+
+def slots(low_high: list) -> list:
+    bits = low_high[0] | (low_high[1] << WORD_BITS)
+    return [slot for slot in range(2 * WORD_BITS) if bits >> slot & 1]
+
+def test_release_clears_partly_covered_slots(api, monkeypatch):
+    service = api.server.availability_service
+    writes = BitmapWrites()
+    monkeypatch.setattr(api.db, "teacher_availability", writes, raising=False)
+    teacher_id = str(uuid.uuid4())
+    day = datetime(2030, 1, 6)
+    cancelled = {"id": str(uuid.uuid4()), "teacher_id": teacher_id, "scheduled_at": day + timedelta(hours=9, minutes=10),
+                 "duration_minutes": 55}
+    # Shares the 10:00 slot with the cancelled session, which ends at 10:05
+    api.run(api.db.sessions.insert_one, {
+        "id": str(uuid.uuid4()), "teacher_id": teacher_id, "scheduled_at": day + timedelta(hours=10, minutes=5),
+        "duration_minutes": 40, "status": "scheduled"
+    })
+
+    api.run(service.release, cancelled)
+
+    # 09:00 to 09:45 are freed, 10:00 is still booked by the neighbour
+    assert slots(writes.cleared[f"{teacher_id}:2030-01-06"]) == [36, 37, 38, 39]
+
+    writes.cleared.clear()
+    api.run(service.release, cancelled, day + timedelta(hours=9, minutes=20))
+    assert slots(writes.cleared[f"{teacher_id}:2030-01-06"]) == [38, 39]
+
+def test_repeated_completion_counts_once(api, no_slot_release):
+    manager = api.run(seed_school, api.db, 0)
+    seeded = api.run(seed_session, api.db, manager)
+    course_id = str(uuid.uuid4())
+
+    async def attach_course():
+        await api.db.courses.insert_one({
+            "id": course_id, "total_sessions": 2, "completed_sessions": 0, "status": "in_progress", "exam_status": "not_available"
+        })
+        await api.db.sessions.update_one({"id": seeded["session"]["id"]}, {"$set": {"course_id": course_id}})
+    api.run(attach_course)
+
+    for _ in range(2):
+        response = api.client.post(
+            f"/api/sessions/{seeded['session']['id']}/complete", data={"notes": "Done"}, headers=api.auth_headers(seeded["teacher"])
+        )
+        assert response.status_code == 200
+
+    course = api.run(api.db.courses.find_one, {"id": course_id})
+    assert (course["completed_sessions"], course["status"]) == (1, "in_progress")
+
+def test_early_completion_frees_the_rest_of_the_slot(api, no_slot_release):
+    seeded = api.run(seed_session, api.db, api.run(seed_school, api.db, 0))
+    scheduler = api.server.session_scheduler
+    student = make_user("student")
+    course_id = str(uuid.uuid4())
+
+    async def seed_student_and_course():
+        await api.db.users.insert_one(student)
+        await api.db.courses.insert_one({"id": course_id, "total_sessions": 2, "completed_sessions": 0, "status": "in_progress"})
+        await api.db.sessions.update_one({"id": seeded["session"]["id"]}, {"$set": {"course_id": course_id}})
+    api.run(seed_student_and_course)
+
+    def booking():
+        return {
+            "id": str(uuid.uuid4()),
+            "teacher_id": seeded["session"]["teacher_id"],
+            "student_id": student["id"],
+            "scheduled_at": seeded["session"]["scheduled_at"] + timedelta(minutes=30),
+            "duration_minutes": 30,
+            "status": "scheduled"
+        }
+    # Caches the teacher's interval index with the session in it
+    with pytest.raises(ScheduleConflictError):
+        api.run(scheduler.book, booking())
+
+    response = api.client.post(
+        f"/api/sessions/{seeded['session']['id']}/complete", data={"notes": "Done"}, headers=api.auth_headers(seeded["teacher"])
+    )
+    assert response.status_code == 200
+
+    api.run(scheduler.book, booking())
+
+def test_availability_rebuild_replaces_days(api):
+    service = api.server.availability_service
+    teacher_id = str(uuid.uuid4())
+    day = datetime(2031, 3, 2)
+    stale_day = day + timedelta(days=1)
+
+    async def seed():
+        await api.db.sessions.insert_many([
+            {"id": str(uuid.uuid4()), "teacher_id": teacher_id, "scheduled_at": day + timedelta(hours=hour),
+             "duration_minutes": 30, "status": status}
+            for hour, status in [(9, "scheduled"), (10, "in_progress"), (11, "cancelled")]
+        ])
+        await api.db.teacher_availability.insert_many([
+            {"_id": f"{teacher_id}:2031-03-02", "teacher_id": teacher_id, "day": day, "booked_low": 0, "booked_high": WORD_MASK},
+            {"_id": f"{teacher_id}:2031-03-03", "teacher_id": teacher_id, "day": stale_day, "booked_low": 1, "booked_high": 0}
+        ])
+    api.run(seed)
+
+    api.run(service.rebuild, day)
+
+    docs = api.run(lambda: api.db.teacher_availability.find({"teacher_id": teacher_id}).to_list(length=None))
+    assert [(doc["day"], slots([doc["booked_low"], doc["booked_high"]])) for doc in docs] == [(day, [36, 37, 40, 41])]
@@ -0,0 +1,189 @@
+"""Shared cache backends, tag invalidation and single-flight computation"""
+
+import os
+import uuid
+import asyncio
+
+import pytest
+
+from shared_cache import MemoryBackend, RedisBackend, SharedCache
+from tests.test_query_budgets import make_user, school_enrollment_ids, seed_school
+
+TEST_REDIS_URL = os.environ.get("TEST_REDIS_URL")
+
+def memory_backends(workers: int) -> list:
+    backend = MemoryBackend()
+    return [backend] * workers
+
+def fakeredis_backends(workers: int) -> list:
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    return [RedisBackend(client=fakeredis.FakeAsyncRedis(server=server)) for _ in range(workers)]
+
+def redis_backends(workers: int) -> list:
+    return [RedisBackend(TEST_REDIS_URL) for _ in range(workers)]
+
+BACKENDS = {"memory": memory_backends, "fakeredis": fakeredis_backends}
+if TEST_REDIS_URL:
+    BACKENDS["redis"] = redis_backends
+
+@pytest.fixture(params=sorted(BACKENDS))
+def make_caches(request, monkeypatch):
+    """Caches standing in for separate workers, all on the same store"""
+    monkeypatch.setenv("SHARED_CACHE_ENABLED", "true")
+    namespace = f"test_{uuid.uuid4().hex[:8]}"
+
+    def make(workers: int = 1) -> list:
+        return [SharedCache(backend, namespace=namespace) for backend in BACKENDS[request.param](workers)]
+    return make
+
+def test_memory_backend_expires_and_evicts():
+    now = [0.0]
+    backend = MemoryBackend(max_entries=2, clock=lambda: now[0])
+
+    async def scenario():
+        await backend.set("a", b"1", ttl=10)
+        await backend.set("b", b"2")
+        assert await backend.get_many(["a"]) == [b"1"]
+        # "b" is now the least recently used
+        await backend.set("c", b"3")
+        assert await backend.get_many(["a", "b", "c"]) == [b"1", None, b"3"]
+
+        now[0] = 10
+        assert await backend.get_many(["a", "c"]) == [None, b"3"]
+        assert await backend.add("a", b"lock", ttl=5) is True
+        assert await backend.add("a", b"lock", ttl=5) is False
+    asyncio.run(scenario())
+
+def test_tag_invalidation(make_caches):
+    async def scenario():
+        cache, other_worker = make_caches(2)
+        await cache.set("school_overview:1", {"total": 3}, ttl=60, tags=["schools"])
+        await cache.set("reviews:1", [5, 4], ttl=60, tags=["reviews"])
+        assert await other_worker.get("school_overview:1") == {"total": 3}
+
+        await other_worker.invalidate("schools")
+
+        assert await cache.get("school_overview:1") is None
+        assert await cache.get("reviews:1") == [5, 4]
+        await cache.close()
+    asyncio.run(scenario())
+
+def test_evicted_tag_token_does_not_revive_entries():
+    async def scenario():
+        backend = MemoryBackend(max_entries=3)
+        cache = SharedCache(backend, namespace="test")
+        await cache.set("school_overview:1", {"total": 3}, tags=["schools"])
+        await cache.invalidate("schools")
+        value_key, tag_key = cache._key("value", "school_overview:1"), cache._key("tag", "schools")
+        # The stale value is used more recently than the tag token, so churn evicts the token
+        await backend.get_many([value_key])
+        for i in range(2):
+            await cache.set(f"reviews:{i}", [i])
+        assert await backend.get_many([tag_key]) == [None]
+        assert (await backend.get_many([value_key]))[0] is not None
+
+        assert await cache.get("school_overview:1") is None
+    asyncio.run(scenario())
+
+def test_single_flight_across_workers(make_caches):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"total_schools": len(calls)}
+
+    async def scenario():
+        workers = make_caches(2)
+        for worker in workers:
+            worker.lock_poll = 0.01
+        results = await asyncio.gather(*[
+            worker.get_or_compute("filter_stats", compute, ttl=60, tags=["schools"])
+            for worker in workers for _ in range(5)
+        ])
+        assert results == [{"total_schools": 1}] * 10
+        assert len(calls) == 1
+
+        # Served from the cache now, until the tag changes
+        assert await workers[1].get_or_compute("filter_stats", compute, tags=["schools"]) == {"total_schools": 1}
+        await workers[0].invalidate("schools")
+        assert await workers[1].get_or_compute("filter_stats", compute, tags=["schools"]) == {"total_schools": 2}
+
+        stats = [worker.stats.lookups["filter_stats"] for worker in workers]
+        assert sum(counts["miss"] for counts in stats) == 2
+        assert sum(counts["hit"] + counts["coalesced"] for counts in stats) == 10
+        assert workers[1].stats.hit_ratio("filter_stats") > 0
+        await workers[0].close()
+    asyncio.run(scenario())
+
+def test_failed_compute_reaches_waiters_and_releases_lock(make_caches):
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("aggregation failed")
+
+    async def succeed():
+        return 42
+
+    async def scenario():
+        cache, = make_caches()
+        results = await asyncio.gather(
+            *[cache.get_or_compute("teacher_performance:1", fail) for _ in range(3)], return_exceptions=True
+        )
+        assert [str(result) for result in results] == ["aggregation failed"] * 3
+        assert await cache.get_or_compute("teacher_performance:1", succeed) == 42
+        await cache.close()
+    asyncio.run(scenario())
+
+def test_lock_released_only_by_its_owner(make_caches):
+    async def scenario():
+        cache, = make_caches()
+        lock_key = cache._key("lock", "school_overview:1")
+        # Our lock expired and another worker holds it now
+        assert await cache.backend.add(lock_key, b"other-worker", ttl=30)
+
+        assert await cache.backend.delete_if(lock_key, b"expired-token") is False
+        assert await cache.backend.add(lock_key, b"expired-token", ttl=30) is False
+        assert await cache.backend.delete_if(lock_key, b"other-worker") is True
+        assert await cache.backend.add(lock_key, b"next", ttl=30) is True
+        await cache.close()
+    asyncio.run(scenario())
+
+def test_school_overview_refreshed_after_enrollment_decision(api, monkeypatch):
+    monkeypatch.setattr(api.server.shared_cache, "enabled", True)
+    manager = api.run(seed_school, api.db, 2)
+    before = api.client.get("/api/analytics/school-overview", headers=api.auth_headers(manager)).json()
+
+    response = api.client.post(
+        "/api/manager/enrollments/bulk-decision",
+        json={"action": "accept", "enrollment_ids": api.run(school_enrollment_ids, api.db, manager)},
+        headers=api.auth_headers(manager)
+    )
+    assert response.json()["processed"] == 1
+
+    after = api.client.get("/api/analytics/school-overview", headers=api.auth_headers(manager)).json()
+    assert after["active_enrollments"] == before["active_enrollments"] + 1
+
+def test_filter_stats_cached_until_school_created(api, query_budget, monkeypatch):
+    monkeypatch.setattr(api.server.shared_cache, "enabled", True)
+    before = api.client.get("/api/driving-schools/filters/stats").json()
+
+    with query_budget(0):
+        assert api.client.get("/api/driving-schools/filters/stats").json() == before
+
+    guest = make_user("guest")
+    api.run(api.db.users.insert_one, guest)
+    response = api.client.post("/api/driving-schools", json={
+        "name": "Auto Ecole Cache",
+        "address": "2 Rue Larbi Ben M'hidi",
+        "state": "Oran",
+        "phone": "0550000000",
+        "email": "cache@example.com",
+        "description": "Test school",
+        "price": 25000
+    }, headers=api.auth_headers(guest))
+    assert response.status_code == 200
+
+    after = api.client.get("/api/driving-schools/filters/stats").json()
+    assert after["total_schools"] == before["total_schools"] + 1
+    assert api.client.get("/metrics/cache").json()["families"]["filter_stats"]["hit"] >= 1
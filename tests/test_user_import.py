@@ -0,0 +1,128 @@
+"""Bulk CSV import of teachers and students"""
+
+import csv
+import io
+import time
+
+from tests.test_query_budgets import make_user, seed_school
+
+def wait_for_job(api, manager: dict, job_id: str) -> dict:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = api.client.get(f"/api/manager/imports/{job_id}", headers=api.auth_headers(manager)).json()
+        if job["status"] not in ["queued", "running"]:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Import {job_id} did not finish")
+
+def upload(api, manager: dict, role: str, rows: list):
+    return api.client.post(
+        "/api/manager/imports",
+        data={"role": role},
+        files={"file": ("people.csv", "\n".join(rows).encode(), "text/csv")},
+        headers=api.auth_headers(manager)
+    )
+
+def test_teacher_import_reports_bad_rows(api, monkeypatch):
+    monkeypatch.setattr(api.server.user_import_service, "password_hasher", lambda password: f"hashed:{password}")
+    manager = api.run(seed_school, api.db, 0)
+    existing = make_user("student")
+    api.run(api.db.users.insert_one, existing)
+
+    response = upload(api, manager, "teacher", [
+        "email,first_name,last_name,gender,can_teach_female",
+        "amina.import@example.com,Amina,Bensalem,female,yes",
+        "karim.import@example.com,Karim,Haddad,,no",
+        "not-an-email,Bad,Row,,",
+        f"{existing['email']},Already,There,,",
+        "amina.import@example.com,Amina,Again,female,"
+    ])
+    assert response.status_code == 200
+
+    job = wait_for_job(api, manager, response.json()["id"])
+    assert job["status"] == "completed"
+    assert (job["processed"], job["created"], job["failed"]) == (5, 2, 3)
+
+    async def imported_teachers():
+        users = await api.db.users.find({"import_job_id": job["id"]}).to_list(length=None)
+        teachers = await api.db.teachers.find({"user_id": {"$in": [user["id"] for user in users]}}).to_list(length=None)
+        return users, teachers
+    users, teachers = api.run(imported_teachers)
+    assert {user["role"] for user in users} == {"teacher"}
+    assert sorted(teacher["can_teach_female"] for teacher in teachers) == [False, True]
+
+    # Rows without a password get their own, handed to the manager only
+    assert job["generated_passwords"] == 2
+    assert all(user["must_reset_password"] for user in users)
+    credentials = api.client.get(f"/api/manager/imports/{job['id']}/credentials", headers=api.auth_headers(manager))
+    passwords = {row["email"]: row["password"] for row in csv.DictReader(io.StringIO(credentials.text))}
+    assert {user["password_hash"] for user in users} == {f"hashed:{password}" for password in passwords.values()}
+    assert len(set(passwords.values())) == 2
+    # The plaintext passwords are handed out once, then deleted
+    again = api.client.get(f"/api/manager/imports/{job['id']}/credentials", headers=api.auth_headers(manager))
+    assert list(csv.DictReader(io.StringIO(again.text))) == []
+    other_manager = api.run(seed_school, api.db, 0)
+    assert api.client.get(
+        f"/api/manager/imports/{job['id']}/credentials", headers=api.auth_headers(other_manager)
+    ).status_code == 404
+
+    report = api.client.get(f"/api/manager/imports/{job['id']}/errors", headers=api.auth_headers(manager))
+    assert report.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(report.text)))
+    assert [(row["row"], row["error"]) for row in rows] == [
+        ("4", "Invalid email"),
+        ("5", "Email already registered"),
+        ("6", "Duplicate email in file")
+    ]
+
+def test_student_import_enrolls_with_courses(api, monkeypatch):
+    monkeypatch.setattr(api.server.user_import_service, "password_hasher", lambda password: f"hashed:{password}")
+    manager = api.run(seed_school, api.db, 0)
+
+    response = upload(api, manager, "student", [
+        "email,first_name,last_name,password",
+        "yacine.import@example.com,Yacine,Mansouri,secret99"
+    ])
+    job = wait_for_job(api, manager, response.json()["id"])
+    assert job["created"] == 1
+
+    async def enrollment_and_courses():
+        user = await api.db.users.find_one({"email": "yacine.import@example.com"})
+        enrollment = await api.db.enrollments.find_one({"student_id": user["id"]})
+        courses = await api.db.courses.find({"enrollment_id": enrollment["id"]}).to_list(length=None)
+        return user, enrollment, courses
+    user, enrollment, courses = api.run(enrollment_and_courses)
+    assert (user["password_hash"], user["must_reset_password"]) == ("hashed:secret99", False)
+    assert enrollment["enrollment_status"] == "pending_documents"
+    assert sorted(course["status"] for course in courses) == ["available", "locked", "locked"]
+
+def test_import_rejects_missing_columns(api):
+    manager = api.run(seed_school, api.db, 0)
+
+    response = upload(api, manager, "teacher", ["email,name", "a@example.com,A"])
+
+    assert response.status_code == 400
+    assert "first_name" in response.json()["detail"]
+
+def test_generated_password_must_be_changed_first(api, monkeypatch):
+    monkeypatch.setattr(api.server, "hash_password", lambda password: f"hashed:{password}")
+    monkeypatch.setattr(api.server, "verify_password", lambda password, hashed: hashed == f"hashed:{password}")
+    user = make_user("student")
+    user["password_hash"] = "hashed:generated1"
+    user["must_reset_password"] = True
+    api.run(api.db.users.insert_one, user)
+    headers = api.auth_headers(user)
+
+    assert api.client.get("/api/dashboard", headers=headers).status_code == 403
+    assert api.client.get("/api/users/me", headers=headers).json()["must_reset_password"] is True
+    assert api.client.post("/api/auth/change-password", json={
+        "current_password": "wrong", "new_password": "chosen99"
+    }, headers=headers).status_code == 400
+
+    response = api.client.post("/api/auth/change-password", json={
+        "current_password": "generated1", "new_password": "chosen99"
+    }, headers=headers)
+    assert response.status_code == 200
+    assert api.client.get("/api/dashboard", headers=headers).status_code == 200
+    stored = api.run(api.db.users.find_one, {"id": user["id"]})
+    assert (stored["password_hash"], stored["must_reset_password"]) == ("hashed:chosen99", False)
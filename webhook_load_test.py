@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Load test for payment webhook ingestion
+
+Fires signed BaridiMob webhooks at a fixed rate against a local backend
+running in simulation mode and reports acknowledgement latency.
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = os.environ.get("BASE_URL", "http://localhost:8001/api")
+WEBHOOK_SECRET = os.environ.get("BARIDIMOB_SECRET", "test-secret")
+
+_local = threading.local()
+
+def get_session():
+    """One HTTP session per worker thread"""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+def sign_payload(payload):
+    """Sign a payload the same way the backend verifies it"""
+    return hmac.new(
+        WEBHOOK_SECRET.encode(),
+        json.dumps(payload, sort_keys=True).encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+def build_payload(payment_ids):
+    return {
+        "event_id": str(uuid.uuid4()),
+        "order_id": random.choice(payment_ids),
+        "transaction_id": f"TX{uuid.uuid4().hex[:12].upper()}",
+        "status": random.choice(["pending", "completed", "failed"]),
+        "reference": f"BM{uuid.uuid4().hex[:8].upper()}",
+        "fee": 0
+    }
+
+def send_webhook(payload):
+    """Send one webhook and return (status_code, latency_ms, ack_status)"""
+    started = time.perf_counter()
+    try:
+        response = get_session().post(
+            f"{BASE_URL}/payments/webhook/baridimob",
+            json=payload,
+            headers={"X-Signature": sign_payload(payload)},
+            timeout=10
+        )
+        latency_ms = (time.perf_counter() - started) * 1000
+        ack_status = response.json().get("status") if response.status_code == 200 else None
+        return response.status_code, latency_ms, ack_status
+    except Exception:
+        return None, (time.perf_counter() - started) * 1000, None
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+def run_load_test(rate, duration, workers, duplicate_ratio, payments):
+    print(f"🚀 Sending {rate} webhooks/sec for {duration}s to {BASE_URL}")
+
+    payment_ids = [str(uuid.uuid4()) for _ in range(payments)]
+    sent_payloads = []
+    futures = []
+    interval = 1.0 / rate
+    total = int(rate * duration)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        started = time.perf_counter()
+        for i in range(total):
+            # Pace submissions against the wall clock
+            delay = started + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            if sent_payloads and random.random() < duplicate_ratio:
+                payload = random.choice(sent_payloads)  # Simulated provider retry
+            else:
+                payload = build_payload(payment_ids)
+                sent_payloads.append(payload)
+
+            futures.append(executor.submit(send_webhook, payload))
+
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+
+    latencies = [latency for code, latency, _ in results if code == 200]
+    errors = len([r for r in results if r[0] != 200])
+    duplicates = len([r for r in results if r[2] == "duplicate"])
+
+    report = {
+        "target_rate": rate,
+        "achieved_rate": round(len(results) / elapsed, 1),
+        "requests": len(results),
+        "accepted": len([r for r in results if r[2] == "accepted"]),
+        "duplicates": duplicates,
+        "errors": errors,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2) if latencies else 0.0
+        }
+    }
+
+    print(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Payment webhook ingestion load test")
+    parser.add_argument("--rate", type=int, default=500, help="Webhooks per second")
+    parser.add_argument("--duration", type=int, default=30, help="Test duration in seconds")
+    parser.add_argument("--workers", type=int, default=100, help="Concurrent HTTP workers")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1, help="Share of retried events")
+    parser.add_argument("--payments", type=int, default=1000, help="Distinct payment IDs")
+    args = parser.parse_args()
+
+    report = run_load_test(args.rate, args.duration, args.workers, args.duplicate_ratio, args.payments)
+
+    if report["errors"] > 0 or report["achieved_rate"] < args.rate * 0.95:
+        print("❌ Load test did not sustain the target rate without errors")
+        sys.exit(1)
+    print("✅ Load test passed")